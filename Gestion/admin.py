@@ -1,9 +1,65 @@
 from django.contrib import admin
+from django.utils import timezone
+from . import openlibrary
 from .models import *
 
 # Register your models here.
 
 admin.site.register(Autor)
 admin.site.register(Libro)
-admin.site.register(Prestamos)
-admin.site.register(Multa)
\ No newline at end of file
+admin.site.register(Multa)
+
+
+class ConRetrasoFilter(admin.SimpleListFilter):
+    title = 'retraso'
+    parameter_name = 'con_retraso'
+
+    def lookups(self, request, model_admin):
+        return [('si', 'Con retraso'), ('no', 'A tiempo')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'si':
+            return queryset.atrasados()
+        if self.value() == 'no':
+            return queryset.filter(retraso=0)
+        return queryset
+
+
+@admin.register(Prestamos)
+class PrestamosAdmin(admin.ModelAdmin):
+    list_display = ('libro', 'usuario', 'fecha_prestamo', 'fecha_max', 'estado', 'retraso', 'multa_acumulada')
+    list_filter = ('estado', ConRetrasoFilter)
+    list_select_related = ('libro', 'usuario')
+    date_hierarchy = 'fecha_prestamo'
+
+    def get_queryset(self, request):
+        # Anotados en SQL: las columnas se pueden ordenar sin cargar todos los préstamos
+        return super().get_queryset(request).with_multa()
+
+    @admin.display(description='Días de retraso', ordering='retraso')
+    def retraso(self, obj):
+        return obj.retraso
+
+    @admin.display(description='Multa acumulada', ordering='multa_acumulada')
+    def multa_acumulada(self, obj):
+        return obj.multa_acumulada
+
+
+@admin.register(IsbnDesconocido)
+class IsbnDesconocidoAdmin(admin.ModelAdmin):
+    """Caché negativa de Open Library: borrar una fila hace que el ISBN se vuelva a consultar."""
+    list_display = ('isbn', 'consultas', 'ultimo_acceso', 'expira', 'vigente')
+    search_fields = ('isbn',)
+    ordering = ('-ultimo_acceso',)
+    readonly_fields = ('creado', 'ultimo_acceso', 'consultas')
+    actions = ['purgar']
+
+    @admin.display(boolean=True, description='Vigente')
+    def vigente(self, obj):
+        return obj.expira > timezone.now()
+
+    @admin.action(description='Purgar expirados y recortar al tope (toda la caché)')
+    def purgar(self, request, queryset):
+        borradas = openlibrary.obtener_cliente().purgar_cache()
+        self.message_user(request, f"{borradas['negativos']} ISBN desconocidos y "
+                                   f"{borradas['respuestas']} respuestas borrados.")
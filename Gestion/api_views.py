@@ -1,73 +1,272 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.serializers import BaseSerializer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Libro, Autor
-from .serializers import LibroSerializer, AutorSerializer
-import requests
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .models import Libro, Autor, Prestamos
+from .serializers import LibroSerializer, AutorSerializer, LibroLoteSerializer, PrestamoSerializer
+from .roles import tiene_rol, ADMINISTRADOR, BIBLIOTECARIO, BODEGA
+from .paginacion import CursorInvalido, KeysetPaginator
+from . import busqueda, importacion, inventario
+
+
+class PaginacionCursor(CursorPagination):
+    """Por id: estable aunque se inserten filas mientras el cliente sincroniza, y sin COUNT(*)."""
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class PaginacionKeyset(PaginacionCursor):
+    """
+    Cursores de paginacion.KeysetPaginator (los de las vistas HTML) para órdenes
+    compuestos como ('-retraso', '-id'). CursorPagination solo guarda en el cursor
+    el primer campo y resuelve los empates con OFFSET: con miles de préstamos sin
+    retraso (todos a 0) cada página volvería a leer los anteriores. La vista da el
+    orden con `orden_keyset()`.
+    """
+    cursor_query_param = 'despues'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        paginator = KeysetPaginator(queryset, self.get_page_size(request), view.orden_keyset())
+        try:
+            self.pagina = paginator.page(despues=request.query_params.get('despues'),
+                                         antes=request.query_params.get('antes'))
+        except CursorInvalido:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.pagina)
+
+    def _enlace(self, parametro, otro, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(remove_query_param(self.base_url, otro), parametro, cursor)
+
+    def get_next_link(self):
+        return self._enlace('despues', 'antes', self.pagina.cursor_siguiente)
+
+    def get_previous_link(self):
+        return self._enlace('antes', 'despues', self.pagina.cursor_anterior)
+
+
+class CamposSolicitadosMixin:
+    """
+    ?fields=id,titulo devuelve solo esos campos y ?expand=autor_detalle les añade
+    los anidados; sin ?fields= la respuesta es completa. La consulta se ajusta a
+    lo pedido: only() con las columnas necesarias y select_related() solo para
+    los anidados que se van a serializar.
+    """
+
+    def _parametro(self, nombre):
+        valor = self.request.query_params.get(nombre)
+        if valor is None:
+            return None
+        return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+    def get_serializer_context(self):
+        contexto = super().get_serializer_context()
+        contexto['campos'] = self._parametro('fields')
+        contexto['expandir'] = self._parametro('expand')
+        return contexto
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.request.method not in ('GET', 'HEAD'):
+            return qs  # al escribir cargamos el objeto entero
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        modelo = qs.model
+        concretos = {f.name for f in modelo._meta.concrete_fields}
+        columnas, relaciones = {modelo._meta.pk.name, self.lookup_field}, set()
+        for campo in serializer.fields.values():
+            raiz = campo.source.split('.')[0]
+            if campo.source == '*' or raiz not in concretos:
+                return qs  # campo calculado: sin saber qué necesita, no recortamos
+            columnas.add(raiz)
+            if isinstance(campo, BaseSerializer):
+                relaciones.add(raiz)
+        qs = qs.only(*columnas)
+        return qs.select_related(*relaciones) if relaciones else qs
+
+
+class VersionCondicionalMixin:
+    """
+    ETag en listados y detalles (y Last-Modified en los detalles), calculados
+    con los campos `actualizado` (auto_now) sin serializar nada. Si el cliente manda
+    If-None-Match / If-Modified-Since y nada cambió, responde 304 directamente.
+
+    Listado: número de filas + último `actualizado` de cada tabla de
+    `tablas_version` (el número detecta los borrados, que no dejan fecha).
+    Solo lleva ETag: un Last-Modified sacado de esas fechas no cambiaría al
+    borrar y If-Modified-Since daría 304 con el listado ya viejo.
+    Detalle: los `campos_version` de la fila pedida.
+    La URL completa y el Accept entran en el ETag: cada página, ?fields= o formato
+    tiene el suyo.
+    """
+    tablas_version = ()
+    campos_version = ('actualizado',)
+
+    def version_listado(self):
+        marcas = []
+        for modelo in self.tablas_version:
+            datos = modelo.objects.aggregate(n=Count('pk'), ultimo=Max('actualizado'))
+            marcas += [datos['n'], datos['ultimo']]
+        return marcas, None  # sin fecha: ETag y nada más (ver docstring)
 
-class AutorViewSet(viewsets.ModelViewSet):
+    def version_detalle(self):
+        clave = self.lookup_url_kwarg or self.lookup_field
+        fila = (self.queryset.model.objects.filter(**{self.lookup_field: self.kwargs[clave]})
+                .values_list(*self.campos_version).first())
+        if fila is None:
+            return None  # que la vista responda el 404 (o lo que corresponda)
+        return list(fila), max(fila)
+
+    def condicional(self, request, version, vista, *args, **kwargs):
+        if version is None:
+            return vista(request, *args, **kwargs)
+        marcas, ultimo = version
+        crudo = json.dumps([request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), marcas], default=str)
+        etag = quote_etag(hashlib.sha256(crudo.encode()).hexdigest()[:32])
+        ultima_modificacion = int(ultimo.timestamp()) if ultimo else None
+
+        respuesta = get_conditional_response(request._request, etag=etag, last_modified=ultima_modificacion)
+        if respuesta is None:
+            respuesta = vista(request, *args, **kwargs)
+        if respuesta.status_code in (200, 304):
+            respuesta['ETag'] = etag
+            if ultima_modificacion:
+                respuesta['Last-Modified'] = http_date(ultima_modificacion)
+        return respuesta
+
+    def list(self, request, *args, **kwargs):
+        return self.condicional(request, self.version_listado(), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.condicional(request, self.version_detalle(), super().retrieve, *args, **kwargs)
+
+
+class AutorViewSet(VersionCondicionalMixin, CamposSolicitadosMixin, viewsets.ModelViewSet):
     queryset = Autor.objects.all()
     serializer_class = AutorSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
+    tablas_version = (Autor,)
 
-class LibroViewSet(viewsets.ModelViewSet):
+class LibroViewSet(VersionCondicionalMixin, CamposSolicitadosMixin, viewsets.ModelViewSet):
     queryset = Libro.objects.all()
     serializer_class = LibroSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
     lookup_field = 'isbn'
+    # autor_detalle va dentro del libro: renombrar al autor también cambia la respuesta
+    tablas_version = (Libro, Autor)
+    campos_version = ('actualizado', 'autor__actualizado')
+
+    def _busqueda(self):
+        return self.request.query_params.get('q', '').strip() if self.action == 'list' else ''
+
+    def filter_queryset(self, queryset):
+        # ?q= devuelve los libros ordenados por relevancia (índice de texto completo)
+        q = self._busqueda()
+        if q:
+            return busqueda.en_orden(queryset, busqueda.ids_libros(q))
+        return super().filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        # La búsqueda ya viene acotada por busqueda.LIMITE_RESULTADOS, así que no se pagina
+        if self._busqueda():
+            return None
+        return super().paginate_queryset(queryset)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Altas y ajustes de stock en bloque: recibe una lista de filas
+        {isbn, titulo?, descripcion?, autor?, cantidad} (ver LibroLoteSerializer)
+        y devuelve cuántos libros se crearon/actualizaron y los errores por fila.
+        """
+        # El inventario es cosa de Bodega, igual que la edición de libros en las vistas HTML
+        if not tiene_rol(request.user, ADMINISTRADOR, BODEGA):
+            return Response({"error": "Solo el personal de bodega puede cargar inventario."},
+                            status=status.HTTP_403_FORBIDDEN)
+        filas = request.data
+        if not isinstance(filas, list) or not filas:
+            return Response({"error": "Se esperaba una lista de libros."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(filas) > inventario.MAX_FILAS:
+            return Response({"error": f"Como máximo {inventario.MAX_FILAS} libros por petición."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        validas, errores = [], []
+        for indice, fila in enumerate(filas):
+            serializer = LibroLoteSerializer(data=fila)
+            if serializer.is_valid():
+                validas.append((indice, serializer.validated_data))
+            else:
+                isbn = fila.get('isbn') if isinstance(fila, dict) else None
+                errores.append({'indice': indice, 'isbn': isbn, 'errores': serializer.errors})
+
+        resultado = inventario.aplicar_lote(validas)
+        resultado['errores'] = sorted(errores + resultado['errores'], key=lambda e: e['indice'])
+        return Response(resultado)
 
     def retrieve(self, request, *args, **kwargs):
-        isbn = kwargs.get('isbn')
-        instance = Libro.objects.filter(isbn=isbn).first()
-        
-        if instance:
-            serializer = self.get_serializer(instance)
-            return Response(serializer.data)
-
-        ol_url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
         try:
-            res = requests.get(ol_url, timeout=10)
-            data = res.json()
-            key = f"ISBN:{isbn}"
-
-            if key in data:
-                info = data[key]
-                author_name = "Autor Desconocido"
-                bio_texto = ""
-                
-                if info.get('authors'):
-                    auth_data = info['authors'][0]
-                    author_name = auth_data.get('name')
-                    ol_auth_id = auth_data.get('url', '').split('/')[-2] if 'url' in auth_data else None
-                    if ol_auth_id:
-                        res_bio = requests.get(f"https://openlibrary.org/authors/{ol_auth_id}.json", timeout=5)
-                        if res_bio.status_code == 200:
-                            raw_bio = res_bio.json().get('bio', '')
-                            bio_texto = raw_bio.get('value', raw_bio) if isinstance(raw_bio, dict) else raw_bio
-
-                parts = author_name.split(' ', 1)
-                nom = parts[0]
-                ape = parts[1] if len(parts) > 1 else '.'
-                
-                autor_obj, created = Autor.objects.get_or_create(
-                    nombre=nom, 
-                    apellido=ape,
-                    defaults={'bibliografia': bio_texto}
-                )
-
-                nuevo_libro = Libro.objects.create(
-                    titulo=info.get('title', 'Sin Título'),
-                    isbn=isbn,
-                    descripcion=str(info.get('description', info.get('notes', ''))),
-                    autor=autor_obj,
-                    cantidad_total=1,
-                    ejemplares_disponibles=1
-                )
-                
-                serializer = self.get_serializer(nuevo_libro)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            pass  # no está en el catálogo: lo buscamos en Open Library
 
+        # Varias peticiones a la vez por el mismo ISBN: solo una sale a Open Library (ver importacion.py)
+        try:
+            libro, creado = importacion.importar(kwargs.get('isbn'))
         except Exception as e:
             return Response({"error": f"Error en el servidor: {str(e)}"}, status=500)
 
-        return Response({"error": "No encontrado"}, status=404)
\ No newline at end of file
+        if libro is not None:
+            serializer = self.get_serializer(libro)
+            return Response(serializer.data, status=status.HTTP_201_CREATED if creado else status.HTTP_200_OK)
+        return Response({"error": "No encontrado"}, status=404)
+
+class PrestamoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Préstamos con su retraso y multa calculados en SQL.
+    ?atrasados=1, ?retraso_min=N y ?ordering=retraso|-retraso|multa|-multa|fecha|-fecha.
+    """
+    serializer_class = PrestamoSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionKeyset
+    ORDENES = {
+        'retraso': 'retraso', 'multa': 'multa_acumulada', 'fecha': 'fecha_prestamo',
+    }
+
+    def get_queryset(self):
+        qs = Prestamos.objects.select_related('libro', 'usuario').with_multa()
+        user = self.request.user
+        if not tiene_rol(user, ADMINISTRADOR, BIBLIOTECARIO):
+            qs = qs.filter(usuario=user)
+
+        params = self.request.query_params
+        if params.get('estado'):
+            qs = qs.filter(estado=params['estado'])
+        retraso_min = int(params['retraso_min']) if params.get('retraso_min', '').isdigit() else 0
+        if params.get('atrasados') or retraso_min:
+            qs = qs.atrasados()
+        if retraso_min > 1:
+            # Sobre lo que ya dejó atrasados(); retraso solo se calcula para esas filas
+            qs = qs.filter(retraso__gte=retraso_min)
+        return qs.order_by(*self.orden_keyset())
+
+    def orden_keyset(self):
+        orden = self.request.query_params.get('ordering', '-fecha')
+        campo = self.ORDENES.get(orden.lstrip('-'), 'fecha_prestamo')
+        signo = '-' if orden.startswith('-') else ''
+        return (f'{signo}{campo}', f'{signo}id')
@@ -5,8 +5,5 @@ class GestionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Gestion'
 
-
-"""
     def ready(self):
         import Gestion.signals
-"""
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Búsquedas en Open Library como vistas asíncronas.
+
+Servidas con ASGI (Tienda_Online/asgi.py), una respuesta lenta de Open Library
+se espera en el bucle de eventos sin ocupar un hilo, así que no frena al resto
+de peticiones. Las lecturas usan el ORM asíncrono (afirst, aexists...); solo
+las escrituras (alta del autor y del libro) pasan por sync_to_async. Con WSGI
+también funcionan: Django ejecuta cada una en su propio bucle. El alta en sí
+está en importacion.aimportar.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+
+from . import importacion, openlibrary
+from .models import Autor, Libro
+from .serializers import LibroSerializer, limpiar_isbn
+from .views import es_admin_o_bodega
+
+
+async def _usuario_api(request):
+    """El usuario de la sesión o del token (Authorization: Token <clave>), como en las vistas de DRF."""
+    usuario = await request.auser()
+    if usuario.is_authenticated:
+        return usuario
+    tipo, _, clave = request.headers.get('Authorization', '').partition(' ')
+    if tipo.lower() == 'token' and clave.strip():
+        token = await Token.objects.select_related('user').filter(key=clave.strip()).afirst()
+        if token and token.user.is_active:
+            return token.user
+    return None
+
+
+@require_GET
+async def libro_openlibrary_api(request, isbn):
+    """
+    Como GET /api/libros-api/<isbn>/, pero asíncrona: 200 si el libro ya está en
+    el catálogo, 201 si se acaba de importar de Open Library y 404 si no existe.
+    """
+    if await _usuario_api(request) is None:
+        respuesta = JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron.'}, status=401)
+        respuesta['WWW-Authenticate'] = 'Token'
+        return respuesta
+
+    libro = await Libro.objects.select_related('autor').filter(isbn=isbn).afirst()
+    if libro is not None:
+        return JsonResponse(LibroSerializer(libro).data)
+
+    try:
+        libro, creado = await importacion.aimportar(isbn)
+    except Exception as e:
+        return JsonResponse({'error': f'Error consultando Open Library: {e}'}, status=502)
+    if libro is None:
+        return JsonResponse({'error': 'No encontrado'}, status=404)
+    if not creado:
+        # Lo importó otro proceso mientras esperábamos: puede no venir con el autor
+        libro = await Libro.objects.select_related('autor').aget(pk=libro.pk)
+    return JsonResponse(LibroSerializer(libro).data, status=201 if creado else 200)
+
+
+@login_required
+@user_passes_test(es_admin_o_bodega)
+@require_GET
+async def buscar_openlibrary(request):
+    """
+    ?isbn= -> datos para rellenar el formulario de crear_libro (lo pide su
+    JavaScript). Igual que el botón "Buscar" sin JavaScript, registra al autor
+    si no existía para poder seleccionarlo.
+    """
+    try:
+        isbn = limpiar_isbn(request.GET.get('isbn', ''))
+    except ValidationError as e:
+        return JsonResponse({'error': e.detail[0]}, status=400)
+
+    cliente = openlibrary.obtener_cliente_asincrono()
+    try:
+        info = await cliente.libro(isbn)
+    except Exception as e:
+        return JsonResponse({'error': f'Error de conexión con la API: {e}'}, status=502)
+    if not info:
+        return JsonResponse({'error': 'El ISBN no devolvió resultados en Open Library.'}, status=404)
+
+    autor, creado, nombre_completo = None, False, None
+    if info.get('authors'):
+        nombre_completo = openlibrary.autor_principal(info)[0]
+        nombre, apellido = openlibrary.separar_nombre(nombre_completo)
+        autor, creado = await sync_to_async(Autor.objects.obtener_o_crear)(nombre, apellido)
+
+    return JsonResponse({
+        'titulo': info.get('title'),
+        'descripcion': info.get('notes') or info.get('description') or "Sin sinopsis.",
+        'isbn': isbn,
+        'autor_id': autor.pk if autor else None,
+        'autor': str(autor) if autor else nombre_completo,
+        'autor_creado': creado,
+        'portada_url': cliente.url_portada(isbn),
+    })
@@ -0,0 +1,106 @@
+"""
+Búsqueda de texto completo sobre el catálogo.
+
+En SQLite usamos tablas virtuales FTS5 (índice invertido) que se mantienen
+sincronizadas con Gestion_libro y Gestion_autor mediante triggers creados en la
+migración 0028, así también cubren bulk_create/update() que no disparan señales.
+En otros motores se cae a un icontains, que es lento pero correcto.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Autor, Libro
+
+LIMITE_RESULTADOS = 500
+MAX_TERMINOS = 8
+
+TABLA_LIBROS = 'Gestion_libro_fts'
+TABLA_AUTORES = 'Gestion_autor_fts'
+
+# Pesos de bm25 por columna: (titulo, descripcion, autor) y (nombre, apellido, bibliografia)
+PESOS_LIBROS = (10.0, 1.0, 5.0)
+PESOS_AUTORES = (5.0, 5.0, 1.0)
+
+
+def usa_fts():
+    return connection.vendor == 'sqlite'
+
+
+def terminos(texto):
+    return re.findall(r'\w+', (texto or '').lower())[:MAX_TERMINOS]
+
+
+def consulta_fts(texto):
+    # Cada palabra entre comillas (así el usuario no puede romper la sintaxis
+    # de MATCH) y con * para que "cerv" encuentre "Cervantes".
+    return ' '.join(f'"{t}"*' for t in terminos(texto))
+
+
+def _buscar_ids(tabla, pesos, texto, limite):
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    pesos_sql = ', '.join(str(p) for p in pesos)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s "
+            f"ORDER BY bm25({tabla}, {pesos_sql}) LIMIT %s",
+            [consulta, limite],
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def ids_libros(texto, limite=LIMITE_RESULTADOS):
+    """IDs de libros que coinciden con `texto`, del más al menos relevante."""
+    if usa_fts():
+        return _buscar_ids(TABLA_LIBROS, PESOS_LIBROS, texto, limite)
+    filtro = Q()
+    for t in terminos(texto):
+        filtro &= (Q(titulo__icontains=t) | Q(descripcion__icontains=t)
+                   | Q(autor__nombre__icontains=t) | Q(autor__apellido__icontains=t))
+    if not filtro:
+        return []
+    return list(Libro.objects.filter(filtro).order_by('titulo', 'id').values_list('id', flat=True)[:limite])
+
+
+def ids_autores(texto, limite=LIMITE_RESULTADOS):
+    """IDs de autores que coinciden con `texto`, del más al menos relevante."""
+    if usa_fts():
+        return _buscar_ids(TABLA_AUTORES, PESOS_AUTORES, texto, limite)
+    filtro = Q()
+    for t in terminos(texto):
+        filtro &= Q(nombre__icontains=t) | Q(apellido__icontains=t) | Q(bibliografia__icontains=t)
+    if not filtro:
+        return []
+    return list(Autor.objects.filter(filtro).order_by('apellido', 'id').values_list('id', flat=True)[:limite])
+
+
+def en_orden(queryset, ids):
+    """Carga los objetos de `ids` respetando el orden de relevancia."""
+    posicion = {pk: i for i, pk in enumerate(ids)}
+    objetos = list(queryset.filter(pk__in=ids))
+    objetos.sort(key=lambda obj: posicion[obj.pk])
+    return objetos
+
+
+def reconstruir_indices():
+    """Vacía y vuelve a llenar las tablas FTS desde cero."""
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_LIBROS}")
+        cursor.execute(
+            f"INSERT INTO {TABLA_LIBROS}(rowid, titulo, descripcion, autor) "
+            "SELECT l.id, l.titulo, COALESCE(l.descripcion, ''), a.nombre || ' ' || a.apellido "
+            "FROM Gestion_libro l JOIN Gestion_autor a ON a.id = l.autor_id"
+        )
+        cursor.execute(f"DELETE FROM {TABLA_AUTORES}")
+        cursor.execute(
+            f"INSERT INTO {TABLA_AUTORES}(rowid, nombre, apellido, bibliografia) "
+            "SELECT id, nombre, apellido, COALESCE(bibliografia, '') FROM Gestion_autor"
+        )
+        # Fusiona los segmentos del índice para que las consultas lean menos
+        cursor.execute(f"INSERT INTO {TABLA_LIBROS}({TABLA_LIBROS}) VALUES ('optimize')")
+        cursor.execute(f"INSERT INTO {TABLA_AUTORES}({TABLA_AUTORES}) VALUES ('optimize')")
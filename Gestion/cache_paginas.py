@@ -0,0 +1,93 @@
+"""
+Caché de fragmentos HTML del catálogo (listado y detalle de libros, autores).
+
+Cada fragmento se guarda bajo una clave que incluye la "versión" de los datos
+de los que depende (grupos como 'libros', 'autores' o 'libro:<id>') y la
+variante del usuario (sus roles y permisos), porque lo que se ve (botones de
+editar, prestar...) depende de ellos. Invalidar un grupo es borrar su versión: la siguiente
+lectura crea una nueva y las entradas viejas quedan inalcanzables hasta que
+caducan. Así no hace falta saber qué claves concretas había.
+
+Gestion/signals.py invalida con los post_save/post_delete de Libro, Autor y
+Prestamos; los cambios hechos con update()/bulk_* (stock.py, inventario.py,
+portadas.py, import_isbns) llaman a invalidar() explícitamente.
+
+Usa el alias 'paginas' de CACHES: memoria local basta con un solo proceso; con
+varios workers tiene que ser un backend compartido (archivos, Redis, memcached)
+o cada proceso invalidará solo su copia.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from .roles import roles_de
+
+ALIAS = 'paginas'
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _clave_version(grupo):
+    return f'paginas:version:{grupo}'
+
+
+def versiones(*grupos):
+    """Versión actual de cada grupo, creando las que falten (o hayan sido desalojadas)."""
+    cache = _cache()
+    claves = [_clave_version(g) for g in grupos]
+    actuales = cache.get_many(claves)
+    nuevas = {clave: uuid.uuid4().hex[:12] for clave in claves if clave not in actuales}
+    if nuevas:
+        cache.set_many(nuevas, None)
+        actuales.update(nuevas)
+    return [actuales[clave] for clave in claves]
+
+
+def invalidar(*grupos):
+    if not grupos:
+        return
+    claves = [_clave_version(g) for g in grupos]
+    _cache().delete_many(claves)
+    # Otra vez al confirmar: si otra petición regeneró el fragmento con los datos
+    # de antes mientras la transacción seguía abierta, esa copia también se descarta
+    transaction.on_commit(lambda: _cache().delete_many(claves))
+
+
+def variante(user):
+    """
+    Roles más permisos de Gestion: los fragmentos miran perms.Gestion.*, y un
+    permiso se puede dar a un usuario suelto además de a su grupo.
+    """
+    if user is None or not user.is_authenticated:
+        return 'anonimo'
+    if user.is_superuser:
+        return 'superusuario'
+    roles = '+'.join(sorted(roles_de(user))) or 'sin-rol'
+    # get_all_permissions() queda guardado en el usuario: el {% if perms... %} de la plantilla no repite consultas
+    permisos = sorted(p for p in user.get_all_permissions() if p.startswith('Gestion.'))
+    return ':'.join([roles, *permisos])
+
+
+def fragmento(request, nombre, grupos, partes, generar):
+    """
+    HTML del fragmento `nombre` para esta petición. `partes` son los valores que
+    cambian el contenido (página, búsqueda, pk...). Si no está en caché se llama
+    a `generar()`, que debe devolver el HTML ya renderizado.
+    """
+    # 'permisos' entra siempre: cambiar los permisos de un grupo cambia lo que ve cada rol
+    grupos = (*grupos, 'permisos')
+    crudo = '|'.join([nombre, variante(request.user), *versiones(*grupos), *map(str, partes)])
+    clave = f'paginas:{nombre}:{hashlib.sha256(crudo.encode()).hexdigest()[:32]}'
+
+    cache = _cache()
+    html = cache.get(clave)
+    if html is None:
+        html = generar()
+        cache.set(clave, str(html), getattr(settings, 'PAGINAS_CACHE_TIMEOUT', 300))
+    return mark_safe(html)
@@ -0,0 +1,9 @@
+from . import roles as r
+
+
+def roles(request):
+    user = getattr(request, 'user', None)
+    return {
+        'roles': getattr(request, 'roles', None) or r.roles_de(user),
+        'es_gestion': r.tiene_rol(user, r.ADMINISTRADOR, r.BIBLIOTECARIO),
+    }
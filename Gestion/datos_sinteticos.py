@@ -0,0 +1,228 @@
+"""
+Datos sintéticos para pruebas de rendimiento y de carga.
+
+Todo se inserta con bulk_create por lotes, cada lote en su transacción, así que
+no pasa por los save() ni por las señales: el stock de los libros, los saldos
+de multas y las estadísticas se recalculan al final con operaciones por
+conjuntos. Con la misma semilla se generan exactamente los mismos datos.
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache_paginas, estadisticas, saldos
+from .models import TARIFA_RETRASO, Autor, Libro, Multa, Prestamos, clave_autor
+
+NOMBRES = ['Ana', 'Luis', 'Carmen', 'Jorge', 'Elena', 'Pablo', 'Rosa', 'Mario', 'Lucía', 'Andrés', 'Teresa', 'Julio']
+APELLIDOS = ['García', 'Pérez', 'Rulfo', 'Matute', 'Onetti', 'Storni', 'Borges', 'Allende', 'Vallejo', 'Mistral']
+PALABRAS = ['sombra', 'río', 'casa', 'tiempo', 'noche', 'ciudad', 'memoria', 'viento', 'jardín', 'silencio',
+            'fuego', 'mar', 'camino', 'espejo', 'invierno', 'isla', 'lluvia', 'puerta', 'sueño', 'piedra']
+
+# Préstamos con un ejemplar fuera de la biblioteca ('m' ya está devuelto, con multa)
+ACTIVOS = ('p',)
+DIAS_PRESTAMO = 14
+
+# Peso de cada estado al crear un préstamo. 'm' no está: es un 'd' devuelto
+# fuera de plazo, igual que en devolver_libro.
+ESTADOS = {'d': 84, 'p': 8, 's': 3, 'r': 5}
+
+
+def _lotes(total, tamano):
+    for inicio in range(0, total, tamano):
+        yield inicio, min(tamano, total - inicio)
+
+
+class Generador:
+    """
+    generar() crea `autores`, `libros`, `usuarios`, `prestamos` y `multas`.
+
+    Los préstamos se reparten entre los libros con una ley de Zipf: el libro
+    k-ésimo en popularidad sale con probabilidad proporcional a 1/k**sesgo
+    (0 = todos igual). `vencidos` es la fracción de préstamos en curso que ya
+    pasaron su fecha_max y `tarde` la de devoluciones fuera de plazo.
+    multas=None crea una multa por cada préstamo con retraso, como harían
+    devolver_libro y generar_multas; un número limita cuántas.
+    """
+
+    def __init__(self, autores=200, libros=1000, usuarios=100, prestamos=10000, multas=None,
+                 semilla=0, sesgo=0.0, vencidos=0.25, tarde=0.15, lote=5000, hoy=None, progreso=None):
+        self.cantidades = {'autores': autores, 'libros': libros, 'usuarios': usuarios,
+                           'prestamos': prestamos, 'multas': multas}
+        self.semilla = semilla
+        self.azar = random.Random(semilla)
+        self.sesgo = sesgo
+        self.vencidos = vencidos
+        self.tarde = tarde
+        self.lote = lote
+        self.hoy = hoy or timezone.now().date()
+        self.progreso = progreso or (lambda mensaje: None)
+        # Los nombres únicos llevan la semilla: dos cargas distintas pueden convivir
+        self.prefijo = f's{semilla}'
+
+    def generar(self):
+        self.autores = self.crear_autores()
+        self.libros = self.crear_libros()
+        self.usuarios = self.crear_usuarios()
+        self.crear_prestamos()
+        self.crear_multas()
+        self.recalcular()
+        return dict(self.cantidades)
+
+    # --- Catálogo ---
+    def crear_autores(self):
+        ids = []
+        for inicio, n in _lotes(self.cantidades['autores'], self.lote):
+            autores = []
+            for i in range(inicio, inicio + n):
+                nombre = f"{self.azar.choice(NOMBRES)} {self.prefijo}-{i}"
+                apellido = self.azar.choice(APELLIDOS)
+                autores.append(Autor(nombre=nombre, apellido=apellido, clave=clave_autor(nombre, apellido),
+                                     bibliografia=' '.join(self.azar.choices(PALABRAS, k=30))))
+            with transaction.atomic():
+                ids += [a.pk for a in Autor.objects.bulk_create(autores)]
+        self.progreso(f"{len(ids)} autores")
+        return ids
+
+    def isbn(self, i):
+        # 979 + 2 dígitos de semilla + 8 de índice: 13 dígitos sin chocar entre semillas
+        return f"979{self.semilla % 100:02d}{i:08d}"
+
+    def crear_libros(self):
+        ids, stock = [], {}
+        for inicio, n in _lotes(self.cantidades['libros'], self.lote):
+            libros = []
+            for i in range(inicio, inicio + n):
+                total = self.azar.randint(1, 5)
+                libros.append(Libro(
+                    titulo=' '.join(self.azar.choices(PALABRAS, k=3)).capitalize() + f" {i}",
+                    isbn=self.isbn(i),
+                    descripcion=' '.join(self.azar.choices(PALABRAS, k=60)),
+                    autor_id=self.azar.choice(self.autores),
+                    cantidad_total=total,
+                    ejemplares_disponibles=total,  # se ajusta en recalcular()
+                    disponible=True,
+                ))
+            with transaction.atomic():
+                for libro in Libro.objects.bulk_create(libros):
+                    ids.append(libro.pk)
+                    stock[libro.pk] = libro.cantidad_total
+        self.stock = stock
+        self.popularidad(ids)
+        self.progreso(f"{len(ids)} libros")
+        return ids
+
+    def popularidad(self, libros):
+        """Orden de popularidad al azar y pesos acumulados de Zipf para elegir_libros()."""
+        self.ranking = list(libros)
+        self.azar.shuffle(self.ranking)
+        self.acumulado = list(itertools.accumulate(1 / (k + 1) ** self.sesgo for k in range(len(self.ranking))))
+
+    def crear_usuarios(self):
+        # Un único hash inutilizable para todos: hashear miles de contraseñas tardaría minutos
+        clave = make_password(None)
+        ids = []
+        for inicio, n in _lotes(self.cantidades['usuarios'], self.lote):
+            usuarios = [User(username=f"socio_{self.prefijo}_{i}", password=clave) for i in range(inicio, inicio + n)]
+            with transaction.atomic():
+                ids += [u.pk for u in User.objects.bulk_create(usuarios)]
+        self.progreso(f"{len(ids)} usuarios")
+        return ids
+
+    # --- Circulación ---
+    def elegir_libros(self, n):
+        return self.azar.choices(self.ranking, cum_weights=self.acumulado, k=n)
+
+    def lote_prestamos(self, n):
+        """`n` préstamos sin guardar; se sortean de golpe libros, socios y estados del lote."""
+        libros = self.elegir_libros(n)
+        usuarios = self.azar.choices(self.usuarios, k=n)
+        estados = self.azar.choices(list(ESTADOS), weights=list(ESTADOS.values()), k=n)
+        return [self.prestamo(*fila) for fila in zip(libros, usuarios, estados)]
+
+    def prestamo(self, libro_id, usuario_id, estado):
+        azar, hoy = self.azar, self.hoy
+        if estado == 'p':
+            # Nunca más préstamos en curso que ejemplares: si no queda, ya se devolvió
+            if self.stock[libro_id]:
+                self.stock[libro_id] -= 1
+            else:
+                estado = 'd'
+
+        if estado == 'p':
+            fuera = azar.randint(DIAS_PRESTAMO + 1, DIAS_PRESTAMO + 60) if azar.random() < self.vencidos \
+                else azar.randint(0, DIAS_PRESTAMO)
+        elif estado == 's':
+            fuera = azar.randint(0, 7)  # las solicitudes se atienden en días
+        else:
+            fuera = azar.randint(1, 364)
+        fecha = hoy - timedelta(days=fuera)
+
+        fecha_max = None if estado in ('s', 'r') else fecha + timedelta(days=DIAS_PRESTAMO)
+        devolucion = None
+        if estado == 'd':
+            dias = azar.randint(DIAS_PRESTAMO + 1, DIAS_PRESTAMO + 30) if azar.random() < self.tarde \
+                else azar.randint(1, DIAS_PRESTAMO)
+            devolucion = min(fecha + timedelta(days=dias), hoy)
+            if devolucion > fecha_max:
+                estado = 'm'
+        return Prestamos(libro_id=libro_id, usuario_id=usuario_id, fecha_prestamo=fecha,
+                         fecha_max=fecha_max, fecha_devolucion=devolucion, estado=estado)
+
+    def crear_prestamos(self):
+        # Candidatos a multa por retraso (devueltos tarde o vencidos): (prestamo_id, dias, fecha, en curso)
+        self.con_retraso = []
+        creados = 0
+        for _, n in _lotes(self.cantidades['prestamos'], self.lote):
+            with transaction.atomic():
+                for p in Prestamos.objects.bulk_create(self.lote_prestamos(n)):
+                    referencia = p.fecha_devolucion or self.hoy
+                    if p.fecha_max and referencia > p.fecha_max:
+                        self.con_retraso.append((p.pk, (referencia - p.fecha_max).days, referencia, p.estado == 'p'))
+            creados += n
+            self.progreso(f"{creados} préstamos")
+
+    def crear_multas(self):
+        elegidos = self.con_retraso
+        if self.cantidades['multas'] is not None and self.cantidades['multas'] < len(elegidos):
+            elegidos = sorted(self.azar.sample(elegidos, self.cantidades['multas']))
+        self.cantidades['multas'] = len(elegidos)
+        for inicio, n in _lotes(len(elegidos), self.lote):
+            multas = [
+                # Las de préstamos aún en curso las acaba de calcular generar_multas: sin pagar
+                Multa(prestamo_id=prestamo_id, tipo_multa='retraso', monto=dias * TARIFA_RETRASO,
+                      pagada=not en_curso and self.azar.random() < 0.6, fecha=fecha)
+                for prestamo_id, dias, fecha, en_curso in elegidos[inicio:inicio + n]
+            ]
+            with transaction.atomic():
+                Multa.objects.bulk_create(multas)
+        self.progreso(f"{len(elegidos)} multas")
+
+    # --- Derivados ---
+    def recalcular(self):
+        """Stock, saldos y estadísticas a partir de las filas, como harían los save()."""
+        activos = (Prestamos.objects.filter(libro_id=OuterRef('pk'), estado__in=ACTIVOS)
+                   .order_by().values('libro_id').annotate(n=Count('id')).values('n'))
+        disponibles = F('cantidad_total') - Coalesce(Subquery(activos, output_field=IntegerField()), Value(0))
+        with transaction.atomic():
+            # Por rango y no con IN: con cientos de miles de ids se pasaría del límite de parámetros.
+            # Recalcular un libro ajeno que caiga en el rango no lo estropea.
+            Libro.objects.filter(pk__range=(min(self.libros, default=0), max(self.libros, default=0))).annotate(quedan=disponibles).update(
+                ejemplares_disponibles=disponibles,
+                disponible=Case(When(quedan__gt=0, then=Value(True)), default=Value(False)),
+                actualizado=timezone.now(),
+            )
+        saldos.reconstruir()
+        estadisticas.reconstruir()
+        cache_paginas.invalidar('libros', 'autores')
+        self.progreso("stock, saldos y estadísticas recalculados")
+
+
+def generar(**opciones):
+    return Generador(**opciones).generar()
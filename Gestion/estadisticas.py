@@ -0,0 +1,179 @@
+"""
+Resúmenes diarios de circulación.
+
+EstadisticaLibroDia y EstadisticaMultasDia se mantienen al día de forma
+incremental: cuando cambia un préstamo o una multa se recalcula solo el
+"cubo" afectado (libro + día, o día) a partir de las filas reales, con una
+consulta indexada. Recalcular en vez de sumar/restar hace que repetir la
+operación no descuadre nada. Los cambios hechos con save()/delete() llegan por
+señales (Gestion/signals.py); los que usan update() o bulk_create() deben llamar
+aquí explícitamente.
+
+El panel y el endpoint JSON solo leen de estas tablas, así su coste depende del
+rango de días pedido y no del tamaño del historial.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import EstadisticaLibroDia, EstadisticaMultasDia, Libro, Multa, Prestamos
+
+# Un préstamo cuenta el día en que sale el libro; solicitudes y rechazos no
+NO_PRESTADOS = ('s', 'r')
+
+# Alias distintos de los campos de Multa: Django no deja llamar 'monto' a un agregado sobre 'monto'
+TOTALES_MULTAS = {
+    'cantidad': Count('id'),
+    'suma': Coalesce(Sum('monto'), Decimal('0')),
+    'pagado': Coalesce(Sum('monto', filter=Q(pagada=True)), Decimal('0')),
+}
+
+
+def _fechas(fechas):
+    """Normaliza a date (admite datetime y 'AAAA-MM-DD') y quita vacíos y repetidos."""
+    resultado = set()
+    for fecha in fechas:
+        if isinstance(fecha, datetime):
+            fecha = fecha.date()
+        elif isinstance(fecha, str):
+            fecha = parse_date(fecha)
+        if fecha:
+            resultado.add(fecha)
+    return resultado
+
+
+def _guardar(modelo, claves, valores):
+    """Upsert del cubo; si se queda a cero lo borramos para que la tabla no crezca con vacíos."""
+    if not any(valores.values()):
+        modelo.objects.filter(**claves).delete()
+        return
+    modelo.objects.bulk_create(
+        [modelo(**claves, **valores)],
+        update_conflicts=True,
+        unique_fields=list(claves),
+        update_fields=list(valores),
+    )
+
+
+# --- Mantenimiento incremental ---
+def recalcular_libro(libro_id, *fechas):
+    for fecha in _fechas(fechas):
+        totales = Prestamos.objects.filter(libro_id=libro_id).aggregate(
+            prestamos=Count('id', filter=Q(fecha_prestamo=fecha) & ~Q(estado__in=NO_PRESTADOS)),
+            devoluciones=Count('id', filter=Q(fecha_devolucion=fecha)),
+        )
+        _guardar(EstadisticaLibroDia, {'libro_id': libro_id, 'fecha': fecha}, totales)
+
+
+def recalcular_multas(*fechas):
+    for fecha in _fechas(fechas):
+        totales = Multa.objects.filter(fecha=fecha).aggregate(**TOTALES_MULTAS)
+        _guardar(EstadisticaMultasDia, {'fecha': fecha}, {
+            'cantidad': totales['cantidad'], 'monto': totales['suma'], 'monto_pagado': totales['pagado'],
+        })
+
+
+# --- Reconstrucción completa ---
+def _sql_circulacion():
+    """
+    INSERT ... SELECT de EstadisticaLibroDia: salidas y devoluciones de cada
+    libro por día agrupadas dentro de la base de datos, sin pasar las filas
+    por Python (con millones de préstamos es lo que más tarda).
+    """
+    qn = connection.ops.quote_name
+    destino, origen = EstadisticaLibroDia._meta, Prestamos._meta
+
+    def col(meta, campo):
+        return qn(meta.get_field(campo).column)
+
+    libro, estado = col(origen, 'libro'), col(origen, 'estado')
+    prestado, devuelto = col(origen, 'fecha_prestamo'), col(origen, 'fecha_devolucion')
+    marcas = ', '.join(['%s'] * len(NO_PRESTADOS))
+    return f"""
+        INSERT INTO {qn(destino.db_table)}
+            ({col(destino, 'libro')}, {col(destino, 'fecha')}, {col(destino, 'prestamos')}, {col(destino, 'devoluciones')})
+        SELECT libro, fecha, SUM(salidas), SUM(entradas) FROM (
+            SELECT {libro} AS libro, {prestado} AS fecha, 1 AS salidas, 0 AS entradas
+            FROM {qn(origen.db_table)} WHERE {estado} NOT IN ({marcas})
+            UNION ALL
+            SELECT {libro}, {devuelto}, 0, 1
+            FROM {qn(origen.db_table)} WHERE {devuelto} IS NOT NULL
+        ) movimientos
+        GROUP BY libro, fecha
+    """, list(NO_PRESTADOS)
+
+
+def reconstruir():
+    """Vuelve a calcular todos los resúmenes desde cero con unas pocas consultas agrupadas."""
+    multas = Multa.objects.values('fecha').annotate(**TOTALES_MULTAS).order_by()
+
+    with transaction.atomic():
+        EstadisticaLibroDia.objects.all().delete()
+        EstadisticaMultasDia.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(*_sql_circulacion())
+        EstadisticaMultasDia.objects.bulk_create(
+            [EstadisticaMultasDia(fecha=f['fecha'], cantidad=f['cantidad'], monto=f['suma'], monto_pagado=f['pagado'])
+             for f in multas.iterator()],
+            batch_size=1000,
+        )
+    return EstadisticaLibroDia.objects.count(), EstadisticaMultasDia.objects.count()
+
+
+# --- Lectura ---
+def resumen(dias=30, hoy=None, top=10):
+    """Datos del panel para los últimos `dias` días (incluido hoy)."""
+    hoy = hoy or timezone.now().date()
+    desde = hoy - timedelta(days=dias - 1)
+
+    circulacion = {
+        fila['fecha']: fila
+        for fila in EstadisticaLibroDia.objects.filter(fecha__range=(desde, hoy))
+        .values('fecha').annotate(prestamos=Sum('prestamos'), devoluciones=Sum('devoluciones')).order_by()
+    }
+    multas = {
+        fila['fecha']: fila
+        for fila in EstadisticaMultasDia.objects.filter(fecha__range=(desde, hoy)).values()
+    }
+
+    por_dia = []
+    for i in range(dias):
+        fecha = desde + timedelta(days=i)
+        c, m = circulacion.get(fecha, {}), multas.get(fecha, {})
+        por_dia.append({
+            'fecha': fecha,
+            'prestamos': c.get('prestamos', 0),
+            'devoluciones': c.get('devoluciones', 0),
+            'multas': m.get('cantidad', 0),
+            'monto_multas': m.get('monto', Decimal('0')),
+        })
+
+    mas_prestados = list(
+        EstadisticaLibroDia.objects.filter(fecha__range=(desde, hoy))
+        .values('libro_id').annotate(prestamos=Sum('prestamos'))
+        .filter(prestamos__gt=0).order_by('-prestamos', 'libro_id')[:top]
+    )
+    titulos = dict(Libro.objects.filter(pk__in=[f['libro_id'] for f in mas_prestados]).values_list('id', 'titulo'))
+    for fila in mas_prestados:
+        fila['titulo'] = titulos.get(fila['libro_id'], '')
+
+    # Lo pendiente de cobrar es histórico: una fila por día con multas, no por multa
+    totales_multas = EstadisticaMultasDia.objects.aggregate(
+        monto=Coalesce(Sum('monto'), Decimal('0')),
+        pagado=Coalesce(Sum('monto_pagado'), Decimal('0')),
+    )
+
+    return {
+        'desde': desde,
+        'hasta': hoy,
+        'por_dia': por_dia,
+        'mas_prestados': mas_prestados,
+        'total_prestamos': sum(d['prestamos'] for d in por_dia),
+        'total_devoluciones': sum(d['devoluciones'] for d in por_dia),
+        'multas_pendientes': totales_multas['monto'] - totales_multas['pagado'],
+    }
@@ -0,0 +1,173 @@
+"""
+Exportación en streaming de préstamos, multas y catálogo (CSV o JSON Lines,
+opcionalmente comprimida con gzip), para auditorías.
+
+Las filas salen de values_list().iterator(chunk_size=TAMANO_LOTE): la base de
+datos las entrega por lotes y nunca se construyen instancias de modelo ni se
+guarda la exportación entera en memoria. Las líneas se agrupan en trozos de
+unos TAMANO_TROZO bytes antes de enviarlas, así que la memoria usada no
+depende del número de filas. Lo usan la vista `exportar` y el comando
+`manage.py exportar`.
+
+Con ASGI la vista entrega los trozos con en_asincrono(): a StreamingHttpResponse
+con un iterador síncrono Django lo lee entero (sync_to_async(list)) antes de
+enviar el primer byte.
+"""
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Libro, Multa, Prestamos
+from .roles import ADMINISTRADOR, BIBLIOTECARIO, BODEGA
+
+TAMANO_LOTE = 2000           # filas por viaje a la base de datos
+TAMANO_TROZO = 64 * 1024     # bytes por trozo de la respuesta
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Exportacion:
+    """
+    `columnas` es {nombre en el archivo: lookup de values_list()}; `fecha` el
+    lookup que filtran desde/hasta y `estados` los valores de ?estado= con su
+    condición. `roles` son los grupos que pueden descargarla.
+    """
+
+    def __init__(self, modelo, columnas, fecha, estados, roles, anotar=None):
+        self.modelo = modelo
+        self.columnas = columnas
+        self.fecha = fecha
+        self.estados = estados
+        self.roles = roles
+        self.anotar = anotar or (lambda qs: qs)
+
+    def consulta(self, desde=None, hasta=None, estado=None):
+        qs = self.anotar(self.modelo.objects.all())
+        if estado:
+            qs = qs.filter(self.estados[estado])
+        if desde:
+            qs = qs.filter(**{f'{self.fecha}__gte': desde})
+        if hasta:
+            qs = qs.filter(**{f'{self.fecha}__lte': hasta})
+        # Por clave primaria: el orden más barato y estable para recorrer la tabla entera
+        return qs.order_by('pk').values_list(*self.columnas.values())
+
+    def filas(self, **filtros):
+        return self.consulta(**filtros).iterator(chunk_size=TAMANO_LOTE)
+
+
+EXPORTACIONES = {
+    'prestamos': Exportacion(
+        Prestamos,
+        {
+            'id': 'id', 'fecha_prestamo': 'fecha_prestamo', 'fecha_max': 'fecha_max',
+            'fecha_devolucion': 'fecha_devolucion', 'estado': 'estado', 'retraso': 'retraso',
+            'multa_fija': 'multa_fija', 'multa_acumulada': 'multa_acumulada',
+            'libro_id': 'libro_id', 'isbn': 'libro__isbn', 'titulo': 'libro__titulo',
+            'usuario_id': 'usuario_id', 'usuario': 'usuario__username',
+        },
+        fecha='fecha_prestamo',
+        estados={codigo: Q(estado=codigo) for codigo, _ in Prestamos.ESTADOS},
+        roles=(ADMINISTRADOR, BIBLIOTECARIO),
+        anotar=lambda qs: qs.with_multa(),
+    ),
+    'multas': Exportacion(
+        Multa,
+        {
+            'id': 'id', 'fecha': 'fecha', 'tipo_multa': 'tipo_multa', 'monto': 'monto', 'pagada': 'pagada',
+            'prestamo_id': 'prestamo_id', 'isbn': 'prestamo__libro__isbn',
+            'usuario_id': 'prestamo__usuario_id', 'usuario': 'prestamo__usuario__username',
+        },
+        fecha='fecha',
+        estados={'pendiente': Q(pagada=False), 'pagada': Q(pagada=True)},
+        roles=(ADMINISTRADOR, BIBLIOTECARIO),
+    ),
+    'libros': Exportacion(
+        Libro,
+        {
+            'id': 'id', 'isbn': 'isbn', 'titulo': 'titulo', 'autor_id': 'autor_id',
+            'autor_nombre': 'autor__nombre', 'autor_apellido': 'autor__apellido',
+            'cantidad_total': 'cantidad_total', 'ejemplares_disponibles': 'ejemplares_disponibles',
+            'disponible': 'disponible', 'actualizado': 'actualizado',
+        },
+        fecha='actualizado__date',
+        estados={'disponible': Q(disponible=True), 'agotado': Q(disponible=False)},
+        roles=(ADMINISTRADOR, BIBLIOTECARIO, BODEGA),
+    ),
+}
+
+
+class _Eco:
+    """csv.writer escribe aquí y write() devuelve la línea, sin buffer intermedio."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(columnas, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(columnas)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def lineas_jsonl(columnas, filas):
+    for fila in filas:
+        yield json.dumps(dict(zip(columnas, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _trozos(lineas):
+    """Agrupa las líneas en bloques de bytes de ~TAMANO_TROZO."""
+    pendiente, tamano = [], 0
+    for linea in lineas:
+        datos = linea.encode()
+        pendiente.append(datos)
+        tamano += len(datos)
+        if tamano >= TAMANO_TROZO:
+            yield b''.join(pendiente)
+            pendiente, tamano = [], 0
+    if pendiente:
+        yield b''.join(pendiente)
+
+
+def _gzip(trozos):
+    compresor = zlib.compressobj(wbits=31)  # 31 = cabecera y cola gzip
+    for trozo in trozos:
+        datos = compresor.compress(trozo)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def generar(nombre, formato='csv', comprimir=False, **filtros):
+    """Bytes del archivo `nombre` (ver EXPORTACIONES) a medida que salen de la base de datos."""
+    exportacion = EXPORTACIONES[nombre]
+    lineas = lineas_jsonl if formato == 'jsonl' else lineas_csv
+    trozos = _trozos(lineas(list(exportacion.columnas), exportacion.filas(**filtros)))
+    return _gzip(trozos) if comprimir else trozos
+
+
+async def en_asincrono(trozos):
+    """
+    Los trozos de generar() como iterador asíncrono, uno por viaje al hilo
+    síncrono de la petición (thread_sensitive): el cursor abierto de iterator()
+    no cambia de hilo y la memoria sigue siendo la de un trozo.
+    """
+    siguiente = sync_to_async(next)
+    try:
+        while (trozo := await siguiente(trozos, None)) is not None:
+            yield trozo
+    finally:
+        # Cliente desconectado o fin: el cursor se cierra en su hilo
+        await sync_to_async(trozos.close)()
+
+
+def nombre_archivo(nombre, formato='csv', comprimir=False, **filtros):
+    partes = [nombre] + [str(filtros[f]) for f in ('estado', 'desde', 'hasta') if filtros.get(f)]
+    return '_'.join(partes) + f'.{formato}' + ('.gz' if comprimir else '')
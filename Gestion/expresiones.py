@@ -0,0 +1,66 @@
+"""
+Expresiones SQL propias que Django no trae de serie.
+"""
+from django.db.models import BooleanField, Expression, F, Func, IntegerField
+
+
+class DiasEntre(Func):
+    """
+    Días enteros de `desde` a `hasta` (negativo si `hasta` es anterior), calculado
+    en la base de datos. Ej: DiasEntre(Value(hoy), 'fecha_max').
+    """
+    output_field = IntegerField()
+    arity = 2
+
+    def __init__(self, hasta, desde, **extra):
+        super().__init__(hasta, desde, **extra)
+
+    # Por defecto (PostgreSQL): date - date ya devuelve un entero de días
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template='CAST(julianday(%(expressions)s) AS INTEGER)',
+                           arg_joiner=') - julianday(', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='DATEDIFF(%(expressions)s)',
+                           arg_joiner=', ', **extra_context)
+
+
+class ComparacionFilas(Expression):
+    """
+    (a, b, ...) > (x, y, ...) como comparación de filas de SQL. SQLite (3.15+),
+    PostgreSQL y MySQL la resuelven con una búsqueda en el índice (a, b) que
+    empieza justo después del cursor, en lugar de leer y ordenar todo lo que
+    queda detrás como con la versión expandida en OR.
+    Ej: ComparacionFilas(('titulo', 'id'), ('Dune', 7), '>').
+    """
+    conditional = True
+    output_field = BooleanField()
+
+    def __init__(self, campos, valores, operador):
+        super().__init__()
+        self.columnas = [F(campo) for campo in campos]
+        self.valores = list(valores)
+        self.operador = operador
+
+    def get_source_expressions(self):
+        return self.columnas
+
+    def set_source_expressions(self, exprs):
+        self.columnas = list(exprs)
+
+    def as_sql(self, compiler, connection):
+        sql, params = [], []
+        for columna in self.columnas:
+            sql_columna, params_columna = compiler.compile(columna)
+            sql.append(sql_columna)
+            params.extend(params_columna)
+        for columna, valor in zip(self.columnas, self.valores):
+            # Los valores del cursor llegan como texto JSON: los convierte el propio campo
+            campo = columna.output_field
+            params.append(campo.get_db_prep_value(campo.to_python(valor), connection))
+        marcadores = ', '.join(['%s'] * len(self.valores))
+        return f"({', '.join(sql)}) {self.operador} ({marcadores})", params
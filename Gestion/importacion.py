@@ -0,0 +1,211 @@
+"""
+Alta de un ISBN desde Open Library con "vuelo único".
+
+Cuando varias peticiones piden a la vez el mismo ISBN que aún no está en el
+catálogo, solo una consulta Open Library y da de alta el libro; las demás
+esperan y se quedan con su resultado:
+
+- dentro del proceso, con VueloUnico (hilos de las vistas síncronas) y
+  VueloUnicoAsincrono (corrutinas de las vistas async);
+- entre procesos, con un candado en la base de datos (CandadoImportacion):
+  la fila del ISBN solo la puede insertar uno, así que sirve para todos los
+  workers sin configurar nada más. Quien no lo consigue espera a que aparezca
+  el libro o a que se suelte el candado, como mucho
+  OPENLIBRARY['PLAZO_IMPORTACION'] segundos; pasado ese plazo el candado
+  caduca (el proceso que lo tenía pudo morir sin soltarlo).
+  Para que los demás vean el candado, importar() debe llamarse fuera de una
+  transacción, como hacen las vistas.
+
+Si aun así dos procesos insertan el mismo ISBN, guardar_libro usa
+get_or_create: el segundo se queda con la fila del primero en lugar de
+fallar con IntegrityError.
+"""
+import asyncio
+import threading
+import time
+import uuid
+import weakref
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import openlibrary
+from .models import Autor, CandadoImportacion, Libro
+
+ESPERA = 0.1  # segundos entre comprobaciones mientras otro proceso importa el ISBN
+
+
+class _Vuelo:
+    def __init__(self):
+        self.terminado = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class VueloUnico:
+    """Agrupa las llamadas simultáneas con la misma clave: solo la primera ejecuta `funcion`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vuelos = {}
+
+    def hacer(self, clave, funcion):
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+
+        if not lider:
+            vuelo.terminado.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = funcion()
+            return vuelo.resultado
+        except Exception as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._vuelos[clave]
+            vuelo.terminado.set()
+
+
+class VueloUnicoAsincrono:
+    """
+    Lo mismo para corrutinas: la primera crea una tarea y las que llegan
+    mientras sigue en curso la esperan. shield() evita que un cliente que
+    se desconecta cancele la importación de los demás.
+    """
+
+    def __init__(self):
+        self._tareas = weakref.WeakKeyDictionary()  # {bucle de eventos: {clave: tarea}}
+
+    async def hacer(self, clave, fabrica):
+        tareas = self._tareas.setdefault(asyncio.get_running_loop(), {})
+        tarea = tareas.get(clave)
+        if tarea is None:
+            tarea = tareas[clave] = asyncio.ensure_future(fabrica())
+            tarea.add_done_callback(lambda _: tareas.pop(clave, None))
+        return await asyncio.shield(tarea)
+
+
+_vuelos = VueloUnico()
+_vuelos_asincronos = VueloUnicoAsincrono()
+
+
+def _tomar_candado(isbn, ficha, plazo):
+    """True si esta petición se queda con el candado del ISBN durante `plazo` segundos."""
+    ahora = timezone.now()
+    # Uno caducado es de un proceso que no llegó a soltarlo: se puede reclamar
+    CandadoImportacion.objects.filter(isbn=isbn, expira__lte=ahora).delete()
+    try:
+        with transaction.atomic():
+            CandadoImportacion.objects.create(isbn=isbn, ficha=ficha, expira=ahora + timedelta(seconds=plazo))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _soltar_candado(isbn, ficha):
+    # Con la ficha: si caducó y ya es de otro, no se lo quitamos
+    CandadoImportacion.objects.filter(isbn=isbn, ficha=ficha).delete()
+
+
+def _libro(isbn):
+    return Libro.objects.select_related('autor').filter(isbn=isbn)
+
+
+# --- Vistas síncronas ---
+def importar(isbn, cliente=None):
+    """
+    (libro, creado) con el libro de Open Library ya en el catálogo, o
+    (None, False) si Open Library no conoce el ISBN. creado es False si lo
+    dio de alta otro proceso mientras esperábamos.
+    """
+    cliente = cliente or openlibrary.obtener_cliente()
+    return _vuelos.hacer(isbn, lambda: _importar_con_candado(isbn, cliente))
+
+
+def _importar_con_candado(isbn, cliente):
+    ficha = uuid.uuid4().hex
+    plazo = cliente.config['PLAZO_IMPORTACION']
+    limite = time.monotonic() + plazo
+    propio = _tomar_candado(isbn, ficha, plazo)
+    while not propio:
+        libro = _libro(isbn).first()
+        if libro is not None:
+            return libro, False
+        if time.monotonic() >= limite:
+            break  # quien tenía el candado no terminó a tiempo: lo intentamos nosotros
+        time.sleep(ESPERA)
+        propio = _tomar_candado(isbn, ficha, plazo)
+
+    try:
+        # Con el candado recién soltado por otro proceso, el libro puede estar ya guardado
+        libro = _libro(isbn).first()
+        if libro is not None:
+            return libro, False
+        return _traer_y_guardar(isbn, cliente)
+    finally:
+        if propio:
+            _soltar_candado(isbn, ficha)
+
+
+def _traer_y_guardar(isbn, cliente):
+    info = cliente.libro(isbn)
+    if not info:
+        return None, False
+    nombre_completo, ol_id = openlibrary.autor_principal(info)
+    bio = ''
+    # La biografía solo se guarda al crear al autor: si ya lo tenemos, esa petición sobra
+    if ol_id and not Autor.objects.por_nombre(*openlibrary.separar_nombre(nombre_completo)).exists():
+        bio = cliente.biografia(ol_id)
+    return openlibrary.guardar_libro(isbn, info, bio)
+
+
+# --- Vistas asíncronas (mismo recorrido; las escrituras pasan por sync_to_async) ---
+async def aimportar(isbn, cliente=None):
+    """Versión asíncrona de importar()."""
+    cliente = cliente or openlibrary.obtener_cliente_asincrono()
+    return await _vuelos_asincronos.hacer(isbn, lambda: _aimportar_con_candado(isbn, cliente))
+
+
+async def _aimportar_con_candado(isbn, cliente):
+    ficha = uuid.uuid4().hex
+    plazo = cliente.config['PLAZO_IMPORTACION']
+    limite = time.monotonic() + plazo
+    propio = await sync_to_async(_tomar_candado)(isbn, ficha, plazo)
+    while not propio:
+        libro = await _libro(isbn).afirst()
+        if libro is not None:
+            return libro, False
+        if time.monotonic() >= limite:
+            break
+        await asyncio.sleep(ESPERA)
+        propio = await sync_to_async(_tomar_candado)(isbn, ficha, plazo)
+
+    try:
+        libro = await _libro(isbn).afirst()
+        if libro is not None:
+            return libro, False
+        return await _atraer_y_guardar(isbn, cliente)
+    finally:
+        if propio:
+            await sync_to_async(_soltar_candado)(isbn, ficha)
+
+
+async def _atraer_y_guardar(isbn, cliente):
+    info = await cliente.libro(isbn)
+    if not info:
+        return None, False
+    nombre_completo, ol_id = openlibrary.autor_principal(info)
+    bio = ''
+    if ol_id and not await Autor.objects.por_nombre(*openlibrary.separar_nombre(nombre_completo)).aexists():
+        bio = await cliente.biografia(ol_id)
+    return await sync_to_async(openlibrary.guardar_libro)(isbn, info, bio)
@@ -0,0 +1,146 @@
+"""
+Instrumentación SQL por petición.
+
+InstrumentacionSQLMiddleware envuelve todas las conexiones con
+connection.execute_wrapper() mientras dura la petición y anota cuántas
+consultas se hicieron, cuánto tiempo pasó en la base de datos y cuántas veces
+se repitió cada "huella" (la consulta sin sus valores concretos). Con eso:
+
+- añade una cabecera Server-Timing (la ven las herramientas del navegador),
+- escribe una línea de log estructurada en el logger 'Gestion.sql',
+- avisa (nivel WARNING) de un posible N+1: la misma lectura repetida muchas
+  veces en una petición casi siempre es una plantilla que consulta fila a fila.
+
+Los tests fijan presupuestos de consultas por vista con
+Gestion/test/presupuesto.py, que usa las mismas huellas para explicar el fallo.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('Gestion.sql')
+
+# A partir de cuántas repeticiones de una misma lectura sospechamos de un N+1
+UMBRAL_N_MAS_1 = 5
+
+_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r'\s+')
+
+
+def huella(sql):
+    """La consulta sin valores: dos consultas con la misma huella solo difieren en sus parámetros."""
+    sql = _LISTA_IN.sub('IN (...)', sql)
+    sql = _LITERALES.sub('?', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+class RegistroConsultas:
+    """Se instala con execute_wrapper(); cuenta consultas, tiempo y huellas."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.huellas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+            self.huellas[huella(sql)] += 1
+
+    @contextmanager
+    def activo(self):
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    def repetidas(self):
+        """Consultas de más: las que repiten una huella ya vista."""
+        return sum(n - 1 for n in self.huellas.values())
+
+    def sospechas_n_mas_1(self, umbral=UMBRAL_N_MAS_1):
+        """[(huella, veces)] de las lecturas repetidas `umbral` veces o más, de más a menos."""
+        return [(h, n) for h, n in self.huellas.most_common() if n >= umbral and h.startswith('SELECT')]
+
+
+class InstrumentacionSQLMiddleware:
+    """
+    Va al principio de MIDDLEWARE para contar también las consultas de sesión y
+    autenticación. SQL_SERVER_TIMING (por defecto DEBUG) decide si se envía la
+    cabecera: en producción revela cuánto tarda la base de datos.
+
+    También funciona con vistas asíncronas (ASGI). Las conexiones son por hilo,
+    así que el registro se instala en el hilo donde el ORM asíncrono de la
+    petición ejecuta sus consultas (el de sync_to_async).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.umbral = getattr(settings, 'SQL_UMBRAL_N_MAS_1', UMBRAL_N_MAS_1)
+        self.server_timing = getattr(settings, 'SQL_SERVER_TIMING', settings.DEBUG)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        with registro.activo():
+            response = self.get_response(request)
+        return self.registrar(request, response, registro, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        pila = ExitStack()
+        await sync_to_async(pila.enter_context)(registro.activo())
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self.registrar(request, response, registro, time.perf_counter() - inicio)
+
+    def registrar(self, request, response, registro, total):
+        """Log estructurado y cabecera Server-Timing de una petición ya respondida."""
+        sospechas = registro.sospechas_n_mas_1(self.umbral)
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': getattr(request.resolver_match, 'view_name', None),
+            'estado': response.status_code,
+            'consultas': registro.consultas,
+            'repetidas': registro.repetidas(),
+            'sql_ms': round(registro.tiempo * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'n_mas_1': [{'huella': h, 'veces': n} for h, n in sospechas],
+        }
+        if sospechas:
+            logger.warning('Posible N+1 en %s: %s (%d veces)', request.path, sospechas[0][0], sospechas[0][1],
+                           extra={'sql': datos})
+        else:
+            logger.info('%s %s: %d consultas en %.1f ms', request.method, request.path, registro.consultas,
+                        datos['sql_ms'], extra={'sql': datos})
+
+        if self.server_timing:
+            metricas = [
+                f'sql;dur={datos["sql_ms"]};desc="{registro.consultas} consultas, {datos["repetidas"]} repetidas"',
+                f'total;dur={datos["total_ms"]}',
+            ]
+            if response.has_header('Server-Timing'):
+                metricas.insert(0, response['Server-Timing'])
+            response['Server-Timing'] = ', '.join(metricas)
+        return response
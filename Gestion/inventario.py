@@ -0,0 +1,99 @@
+"""
+Altas y ajustes de inventario en bloque (POST libros-api/bulk/).
+
+Un lote de miles de filas cuesta un puñado de consultas en vez de miles de
+peticiones: un IN para saber qué ISBNs existen, otro para los autores, un
+bulk_create para los nuevos y un bulk_update para los ajustes, todo en una
+transacción. Las filas con errores se informan y no se aplican; el resto sí.
+
+Los ajustes de cantidad se escriben como F('campo') + delta, igual que en
+stock.py: un préstamo que ocurra a la vez no se pierde.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import cache_paginas
+from .models import Autor, Libro
+
+MAX_FILAS = 5000
+
+
+def _ajuste(delta):
+    """Expresiones de un ajuste de `delta` ejemplares (positivo o negativo)."""
+    return {
+        'cantidad_total': F('cantidad_total') + delta,
+        'ejemplares_disponibles': F('ejemplares_disponibles') + delta,
+        # Como en stock.py, dentro del UPDATE se ven los valores anteriores
+        'disponible': Case(When(ejemplares_disponibles__gt=-delta, then=Value(True)), default=Value(False)),
+    }
+
+
+def aplicar_lote(filas):
+    """
+    `filas` son pares (indice, datos) ya validados por LibroLoteSerializer.
+    Devuelve {'creados', 'actualizados', 'errores'}; cada error lleva el índice
+    de la fila en la petición.
+    """
+    errores = []
+    por_isbn = {}
+    for indice, datos in filas:
+        if datos['isbn'] in por_isbn:
+            errores.append({'indice': indice, 'isbn': datos['isbn'], 'errores': ['ISBN repetido en el lote.']})
+        else:
+            por_isbn[datos['isbn']] = (indice, datos)
+
+    with transaction.atomic():
+        existentes = Libro.objects.select_for_update().in_bulk(list(por_isbn), field_name='isbn')
+        autores_pedidos = {datos['autor'] for _, datos in por_isbn.values() if 'autor' in datos}
+        autores = set(Autor.objects.filter(pk__in=autores_pedidos).values_list('pk', flat=True))
+
+        nuevos, ajustes, campos_texto = [], [], set()
+        ahora = timezone.now()
+        for isbn, (indice, datos) in por_isbn.items():
+            fallos = []
+            if 'autor' in datos and datos['autor'] not in autores:
+                fallos.append(f"No existe el autor {datos['autor']}.")
+            libro = existentes.get(isbn)
+            if libro is None:
+                if not datos.get('titulo') or 'autor' not in datos:
+                    fallos.append('Para crear un libro hacen falta titulo y autor.')
+                if datos['cantidad'] < 1:
+                    fallos.append('Un libro nuevo necesita al menos un ejemplar.')
+            elif libro.ejemplares_disponibles + datos['cantidad'] < 0:
+                fallos.append(f'Solo hay {libro.ejemplares_disponibles} ejemplares disponibles para retirar.')
+            if fallos:
+                errores.append({'indice': indice, 'isbn': isbn, 'errores': fallos})
+                continue
+
+            if libro is None:
+                nuevos.append(Libro(
+                    isbn=isbn,
+                    titulo=datos['titulo'],
+                    descripcion=datos.get('descripcion', ''),
+                    autor_id=datos['autor'],
+                    cantidad_total=datos['cantidad'],
+                    ejemplares_disponibles=datos['cantidad'],  # bulk_create no pasa por Libro.save()
+                    disponible=True,
+                ))
+                continue
+            for campo, origen in (('titulo', 'titulo'), ('descripcion', 'descripcion'), ('autor_id', 'autor')):
+                if origen in datos:
+                    setattr(libro, campo, datos[origen])
+                    campos_texto.add(campo)
+            for campo, expresion in _ajuste(datos['cantidad']).items():
+                setattr(libro, campo, expresion)
+            libro.actualizado = ahora  # bulk_update no toca los auto_now
+            ajustes.append(libro)
+
+        Libro.objects.bulk_create(nuevos, batch_size=500)
+        if ajustes:
+            Libro.objects.bulk_update(
+                ajustes,
+                ['cantidad_total', 'ejemplares_disponibles', 'disponible', 'actualizado', *sorted(campos_texto)],
+                batch_size=500,
+            )
+        cache_paginas.invalidar('libros', *(f'libro:{libro.pk}' for libro in ajustes))
+
+    errores.sort(key=lambda e: e['indice'])
+    return {'creados': len(nuevos), 'actualizados': len(ajustes), 'errores': errores}
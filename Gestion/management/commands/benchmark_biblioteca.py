@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from Gestion import datos_sinteticos, rendimiento
+from Gestion.roles import BIBLIOTECARIO
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+TAMANOS = ('autores', 'libros', 'usuarios', 'prestamos', 'multas')
+
+
+class Command(BaseCommand):
+    help = ('Benchmark de extremo a extremo: crea una base temporal con datos sintéticos, recorre las '
+            'vistas y endpoints principales midiendo latencias p50/p95/p99 y consultas SQL, y compara '
+            'con la línea base guardada. Termina con error si hay regresiones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--autores', type=int, default=20000)
+        parser.add_argument('--libros', type=int, default=100000)
+        parser.add_argument('--usuarios', type=int, default=20000)
+        parser.add_argument('--prestamos', type=int, default=2000000)
+        parser.add_argument('--multas', type=int, default=200000)
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla de los datos sintéticos')
+        parser.add_argument('--repeticiones', type=int, default=30, help='Peticiones medidas por escenario')
+        parser.add_argument('--baseline', default=BASELINE, help='Archivo JSON con la línea base')
+        parser.add_argument('--guardar-baseline', action='store_true',
+                            help='Guarda los resultados como nueva línea base en lugar de comparar')
+        parser.add_argument('--umbral', type=float, default=rendimiento.UMBRAL,
+                            help='Regresión si el p95 supera la base multiplicada por esto (más el margen)')
+        parser.add_argument('--margen-ms', type=float, default=rendimiento.MARGEN_MS)
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en este archivo JSON')
+
+    def handle(self, *args, **options):
+        if options['libros'] < 1 or options['autores'] < 1 or options['usuarios'] < 1:
+            raise CommandError('--libros, --autores y --usuarios deben ser mayores que cero')
+        if options['prestamos'] < 0 or options['multas'] < 0 or options['repeticiones'] < 1:
+            raise CommandError('--prestamos y --multas no pueden ser negativos y --repeticiones debe ser mayor que cero')
+
+        # Una base de pruebas en un archivo temporal: nunca se tocan los datos reales
+        directorio = tempfile.mkdtemp(prefix='benchmark_biblioteca_')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directorio, 'benchmark.sqlite3')
+        original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            medicion = self.ejecutar(options)
+        finally:
+            connection.creation.destroy_test_db(original, verbosity=0)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self.mostrar(medicion['resultados'])
+        if options['salida_json']:
+            self.escribir(options['salida_json'], medicion)
+        if options['guardar_baseline']:
+            self.escribir(options['baseline'], medicion)
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING('No hay línea base; usa --guardar-baseline para crearla.'))
+            return
+        with open(options['baseline'], encoding='utf-8') as f:
+            base = json.load(f)
+        if base.get('tamanos') != medicion['tamanos']:
+            self.stdout.write(self.style.WARNING(
+                f"La línea base se midió con otros tamaños ({base.get('tamanos')}); no se compara."))
+            return
+        regresiones = rendimiento.comparar(medicion['resultados'], base['resultados'],
+                                           options['umbral'], options['margen_ms'])
+        if regresiones:
+            raise CommandError('Regresiones de rendimiento:\n  ' + '\n  '.join(regresiones))
+        self.stdout.write(self.style.SUCCESS('Sin regresiones respecto a la línea base.'))
+
+    def ejecutar(self, options):
+        call_command('setup_roles', stdout=StringIO())
+        progreso = self.stdout.write if options['verbosity'] > 1 else None
+        inicio = time.perf_counter()
+        tamanos = datos_sinteticos.generar(**{t: options[t] for t in TAMANOS},
+                                           semilla=options['semilla'], progreso=progreso)
+        self.stdout.write(f"Datos generados en {time.perf_counter() - inicio:.1f} s: "
+                          + ', '.join(f"{n} {t}" for t, n in tamanos.items()))
+
+        personal = User.objects.create_user('benchmark_bibliotecario')
+        personal.groups.add(Group.objects.get(name=BIBLIOTECARIO))
+        socio = User.objects.create_user('benchmark_socio')
+        cliente = Client(SERVER_NAME='localhost')  # ALLOWED_HOSTS no incluye 'testserver'
+        cliente.force_login(personal)
+
+        try:
+            resultados = rendimiento.medir(cliente, rendimiento.escenarios(socio.pk), options['repeticiones'])
+        except AssertionError as e:
+            raise CommandError(str(e))
+        return {'tamanos': tamanos, 'entorno': rendimiento.entorno(), 'resultados': resultados}
+
+    def mostrar(self, resultados):
+        self.stdout.write(f"{'escenario':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'consultas':>11}")
+        for nombre, r in resultados.items():
+            self.stdout.write(f"{nombre:<28}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                              f"{r['max_ms']:>10.2f}{r['consultas']:>11}")
+
+    @staticmethod
+    def escribir(ruta, medicion):
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(medicion, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Gestion.rendimiento import percentil
+
+ESQUEMA = [
+    "CREATE TABLE libro (id INTEGER PRIMARY KEY, titulo TEXT, ejemplares INTEGER NOT NULL, disponible INTEGER NOT NULL)",
+    "CREATE TABLE prestamo (id INTEGER PRIMARY KEY, libro_id INTEGER NOT NULL REFERENCES libro(id), "
+    "usuario_id INTEGER NOT NULL, fecha TEXT NOT NULL, estado TEXT NOT NULL)",
+    "CREATE INDEX prestamo_libro ON prestamo(libro_id)",
+]
+
+
+class Perfil:
+    """Cómo abre y usa las conexiones cada worker simulado."""
+
+    def __init__(self, nombre, pragmas, inicio_transaccion, persistente):
+        self.nombre = nombre
+        self.pragmas = pragmas
+        self.inicio_transaccion = inicio_transaccion
+        self.persistente = persistente
+
+    def conectar(self, ruta):
+        # isolation_level=None: controlamos BEGIN/COMMIT a mano, como hace Django
+        conexion = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False)
+        for nombre, valor in self.pragmas.items():
+            conexion.execute(f"PRAGMA {nombre}={valor}")
+        return conexion
+
+
+def perfiles():
+    opciones = settings.DATABASES['default'].get('OPTIONS', {})
+    return [
+        # Lo que hacía Django antes: journal por defecto, BEGIN diferido y una
+        # conexión por petición (el timeout de 5 s de Python sí está).
+        Perfil('por_defecto', {}, 'BEGIN', persistente=False),
+        Perfil(
+            'produccion',
+            getattr(settings, 'SQLITE_PRAGMAS', {}),
+            f"BEGIN {opciones.get('transaction_mode') or ''}".strip(),
+            persistente=bool(settings.DATABASES['default'].get('CONN_MAX_AGE')),
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Mide el rendimiento de escritura de SQLite con varios workers concurrentes '
+            '(préstamos y devoluciones) con la configuración por defecto y con el perfil '
+            'de producción de settings.py: operaciones/s, latencias p50/p99 y errores "locked".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Workers escribiendo a la vez')
+        parser.add_argument('--operaciones', type=int, default=200, help='Operaciones por worker')
+        parser.add_argument('--libros', type=int, default=50, help='Libros distintos sobre los que se reparte la carga')
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en este archivo JSON')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['operaciones'] < 1 or options['libros'] < 1:
+            raise CommandError('--workers, --operaciones y --libros deben ser mayores que cero')
+
+        directorio = tempfile.mkdtemp(prefix='benchmark_sqlite_')
+        try:
+            resultados = [self.medir(perfil, directorio, options) for perfil in perfiles()]
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self.stdout.write(f"{'perfil':<14}{'ok':>8}{'errores':>9}{'op/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for r in resultados:
+            self.stdout.write(f"{r['perfil']:<14}{r['ok']:>8}{r['errores']:>9}{r['ops_por_segundo']:>10.0f}"
+                              f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+        if options['salida_json']:
+            with open(options['salida_json'], 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2)
+
+    # --- Medición ---
+    def preparar(self, ruta, libros):
+        conexion = sqlite3.connect(ruta, isolation_level=None)
+        for sentencia in ESQUEMA:
+            conexion.execute(sentencia)
+        conexion.executemany("INSERT INTO libro (id, titulo, ejemplares, disponible) VALUES (?, ?, ?, 1)",
+                             [(i, f"Libro {i}", 10 ** 6) for i in range(1, libros + 1)])
+        conexion.close()
+
+    def operacion(self, conexion, perfil, libro_id, usuario_id, devolver):
+        # El mismo patrón que crear_prestamo/devolver_libro: leer, UPDATE condicional del stock e INSERT/UPDATE del préstamo
+        conexion.execute(perfil.inicio_transaccion)
+        try:
+            conexion.execute("SELECT ejemplares FROM libro WHERE id = ?", (libro_id,)).fetchone()
+            if devolver:
+                conexion.execute("UPDATE libro SET ejemplares = ejemplares + 1, disponible = 1 WHERE id = ?", (libro_id,))
+                conexion.execute("UPDATE prestamo SET estado = 'd' WHERE id = (SELECT MAX(id) FROM prestamo "
+                                 "WHERE libro_id = ? AND estado = 'p')", (libro_id,))
+            else:
+                conexion.execute("UPDATE libro SET ejemplares = ejemplares - 1, disponible = ejemplares > 1 "
+                                 "WHERE id = ? AND ejemplares > 0", (libro_id,))
+                conexion.execute("INSERT INTO prestamo (libro_id, usuario_id, fecha, estado) "
+                                 "VALUES (?, ?, date('now'), 'p')", (libro_id, usuario_id))
+            conexion.execute("COMMIT")
+        except sqlite3.OperationalError:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            raise
+
+    def medir(self, perfil, directorio, options):
+        ruta = os.path.join(directorio, f'{perfil.nombre}.sqlite3')
+        self.preparar(ruta, options['libros'])
+        barrera = threading.Barrier(options['workers'])
+        latencias, errores, bloqueo = [], [], threading.Lock()
+
+        def worker(numero):
+            propias, fallos = [], 0
+            conexion = perfil.conectar(ruta) if perfil.persistente else None
+            barrera.wait()
+            for i in range(options['operaciones']):
+                inicio = time.perf_counter()
+                actual = conexion or perfil.conectar(ruta)
+                try:
+                    self.operacion(actual, perfil, (numero * 7919 + i) % options['libros'] + 1, numero, i % 2 == 1)
+                    propias.append(time.perf_counter() - inicio)
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    fallos += 1
+                finally:
+                    if conexion is None:
+                        actual.close()
+            if conexion is not None:
+                conexion.close()
+            with bloqueo:
+                latencias.extend(propias)
+                errores.append(fallos)
+
+        hilos = [threading.Thread(target=worker, args=(n,)) for n in range(options['workers'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        latencias.sort()
+        return {
+            'perfil': perfil.nombre,
+            'ok': len(latencias),
+            'errores': sum(errores),
+            'segundos': round(duracion, 3),
+            'ops_por_segundo': round(len(latencias) / duracion, 1) if duracion else 0.0,
+            'p50_ms': round(statistics.median(latencias) * 1000, 3) if latencias else 0.0,
+            'p99_ms': round(percentil(latencias, 99) * 1000, 3),
+        }
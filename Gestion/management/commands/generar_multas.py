@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from Gestion import estadisticas, saldos
+from Gestion.expresiones import ComparacionFilas
+from Gestion.models import Multa, Prestamos
+
+
+class Command(BaseCommand):
+    help = ('Genera o actualiza las multas por retraso de todos los préstamos vencidos. '
+            'Pensado para ejecutarse cada noche; se puede repetir sin duplicar multas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Préstamos por lote (y por transacción)')
+        parser.add_argument('--fecha', help='Calcula como si hoy fuera esta fecha (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero')
+        hoy = timezone.now().date()
+        if options['fecha']:
+            hoy = parse_date(options['fecha'])
+            if hoy is None:
+                raise CommandError('--fecha debe tener el formato AAAA-MM-DD')
+
+        despues = None
+        total = 0
+        fechas = set()
+        while True:
+            lote = list(self.vencidos(hoy, despues)[:options['lote']])
+            if not lote:
+                break
+            with transaction.atomic():
+                ids = [p['id'] for p in lote]
+                anteriores = dict(Multa.objects.filter(prestamo_id__in=ids, tipo_multa='retraso')
+                                  .values_list('prestamo_id', 'monto'))
+                Multa.objects.bulk_create(
+                    [Multa(prestamo_id=p['id'], tipo_multa='retraso', monto=p['multa_acumulada'], fecha=hoy) for p in lote],
+                    update_conflicts=True,
+                    unique_fields=['prestamo', 'tipo_multa'],
+                    update_fields=['monto'],
+                )
+                # bulk_create no dispara señales: apuntamos a mano los cambios de saldo
+                # y los días cuyas multas cambiaron
+                movimientos = []
+                for multa_id, prestamo_id, usuario_id, monto, fecha in Multa.objects.filter(
+                        prestamo_id__in=ids, tipo_multa='retraso'
+                ).values_list('id', 'prestamo_id', 'prestamo__usuario_id', 'monto', 'fecha'):
+                    fechas.add(fecha)
+                    if prestamo_id in anteriores:
+                        movimientos.append((usuario_id, multa_id, 'ajuste', monto - anteriores[prestamo_id]))
+                    else:
+                        movimientos.append((usuario_id, multa_id, 'cargo', monto))
+                saldos.aplicar(movimientos)
+            despues = (lote[-1]['fecha_max'], lote[-1]['id'])
+            total += len(lote)
+            self.stdout.write(f'{total} préstamos vencidos procesados...')
+
+        estadisticas.recalcular_multas(*fechas)
+        self.stdout.write(self.style.SUCCESS(f'Multas por retraso al día {hoy}: {total} préstamos vencidos.'))
+
+    @staticmethod
+    def vencidos(hoy, despues=None):
+        """
+        Préstamos en curso con fecha_max pasada y su multa calculada en SQL.
+        Keyset sobre (fecha_max, id), que es el orden del índice (estado, fecha_max)
+        con estado='p': cada lote sigue leyendo el índice justo después del
+        anterior, sin volver a recorrer ni ordenar lo ya procesado.
+        """
+        multa_pagada = Multa.objects.filter(prestamo=OuterRef('pk'), tipo_multa='retraso', pagada=True)
+        qs = Prestamos.objects.filter(estado='p', fecha_max__lt=hoy, fecha_devolucion__isnull=True)
+        if despues is not None:
+            qs = qs.filter(ComparacionFilas(('fecha_max', 'id'), despues, '>'))
+        return (
+            qs.filter(~Exists(multa_pagada))  # una multa ya cobrada no se vuelve a tocar
+            .with_multa(hoy)
+            .order_by('fecha_max', 'id')
+            .values('id', 'fecha_max', 'multa_acumulada')
+        )
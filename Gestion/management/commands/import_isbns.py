@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from Gestion import cache_paginas, openlibrary, portadas
+from Gestion.models import Autor, Libro, clave_autor
+
+
+class Command(BaseCommand):
+    help = ('Importa libros en masa desde un archivo de ISBNs (uno por línea o CSV "isbn,cantidad"). '
+            'Resuelve los metadatos en Open Library en paralelo, inserta por lotes y guarda un punto de control '
+            'para poder reanudar si se interrumpe.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al CSV o archivo de texto con los ISBNs')
+        parser.add_argument('--workers', type=int, default=8, help='Consultas simultáneas a Open Library')
+        parser.add_argument('--lote', type=int, default=200, help='ISBNs por lote (y por transacción)')
+        parser.add_argument('--checkpoint', help='Archivo de progreso (por defecto <archivo>.checkpoint)')
+        parser.add_argument('--reiniciar', action='store_true', help='Ignora el progreso guardado y empieza de cero')
+        parser.add_argument('--portadas', action='store_true', help='Descarga y procesa las portadas en segundo plano')
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        if not os.path.exists(archivo):
+            raise CommandError(f'No existe el archivo {archivo}')
+        if options['workers'] < 1 or options['lote'] < 1:
+            raise CommandError('--workers y --lote deben ser mayores que cero')
+
+        self.con_portadas = options['portadas']
+        self.ruta_checkpoint = options['checkpoint'] or f'{archivo}.checkpoint'
+        self.progreso = self.leer_checkpoint(options['reiniciar'])
+        if self.progreso.get('completado'):
+            self.stdout.write(self.style.WARNING(
+                'Este archivo ya se importó por completo. Usa --reiniciar para importarlo otra vez.'
+            ))
+            return
+        if self.progreso['linea']:
+            self.stdout.write(f"Reanudando después de la línea {self.progreso['linea']}.")
+
+        # Cliente propio con un pool del tamaño del número de workers. Los hilos solo
+        # hacen HTTP; todo lo que toca la BD ocurre en el hilo principal.
+        self.cliente = openlibrary.ClienteOpenLibrary(TAMANO_POOL=options['workers'])
+
+        lote = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            self.pool = pool
+            for numero, isbn, cantidad in self.leer_archivo(archivo):
+                if numero <= self.progreso['linea']:
+                    continue
+                lote.append((numero, isbn, cantidad))
+                if len(lote) >= options['lote']:
+                    self.procesar_lote(lote)
+                    lote = []
+            if lote:
+                self.procesar_lote(lote)
+
+        self.progreso['completado'] = True
+        self.guardar_checkpoint()
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación terminada: {self.progreso['creados']} libros nuevos, "
+            f"{self.progreso['actualizados']} con más ejemplares, {self.progreso['fallidos']} fallidos."
+        ))
+
+    # --- Lectura ---
+    def leer_archivo(self, archivo):
+        """Genera (numero_linea, isbn, cantidad) sin cargar el archivo entero en memoria."""
+        with open(archivo, newline='', encoding='utf-8') as f:
+            for numero, fila in enumerate(csv.reader(f, delimiter=self.delimitador(archivo)), start=1):
+                if not fila or not fila[0].strip() or fila[0].strip().startswith('#'):
+                    continue
+                isbn = re.sub(r'[-\s]', '', fila[0])
+                if isbn.lower() == 'isbn':  # cabecera
+                    continue
+                try:
+                    cantidad = int(fila[1]) if len(fila) > 1 and fila[1].strip() else 1
+                except ValueError:
+                    cantidad = 0
+                yield numero, isbn, cantidad
+
+    @staticmethod
+    def delimitador(archivo):
+        with open(archivo, encoding='utf-8') as f:
+            muestra = f.readline()
+        return ';' if ';' in muestra and ',' not in muestra else ','
+
+    # --- Lotes ---
+    def resolver(self, isbn):
+        try:
+            return self.cliente.libro(isbn, usar_cache=False)
+        except Exception as e:
+            self.stderr.write(f'{isbn}: error consultando Open Library ({e})')
+            return None
+
+    def procesar_lote(self, lote):
+        validos = OrderedDict()
+        for numero, isbn, cantidad in lote:
+            if len(isbn) not in (10, 13) or not isbn.isdigit() or cantidad < 1:
+                self.stderr.write(f'Línea {numero}: "{isbn}" no es un ISBN válido o la cantidad es incorrecta.')
+                self.progreso['fallidos'] += 1
+                continue
+            validos[isbn] = validos.get(isbn, 0) + cantidad  # ISBN repetido en el lote: sumamos
+
+        existentes = set(Libro.objects.filter(isbn__in=list(validos)).values_list('isbn', flat=True))
+        nuevos = [isbn for isbn in validos if isbn not in existentes]
+        metadatos = dict(zip(nuevos, self.pool.map(self.resolver, nuevos)))
+
+        with transaction.atomic():
+            self.sumar_ejemplares({isbn: validos[isbn] for isbn in existentes})
+            self.crear_libros({isbn: (validos[isbn], metadatos[isbn]) for isbn in nuevos})
+            self.progreso['linea'] = lote[-1][0]
+        # El checkpoint se escribe solo cuando el lote ya está confirmado en la BD
+        self.guardar_checkpoint()
+        self.stdout.write(f"Línea {self.progreso['linea']}: {self.progreso['creados']} creados hasta ahora.")
+
+    def sumar_ejemplares(self, cantidades):
+        # Un UPDATE por cantidad distinta (normalmente unas pocas), con F() para no pisar préstamos en curso
+        por_cantidad = {}
+        for isbn, cantidad in cantidades.items():
+            por_cantidad.setdefault(cantidad, []).append(isbn)
+        for cantidad, isbns in por_cantidad.items():
+            ids = list(Libro.objects.filter(isbn__in=isbns).values_list('pk', flat=True))
+            cache_paginas.invalidar('libros', *(f'libro:{pk}' for pk in ids))
+            self.progreso['actualizados'] += Libro.objects.filter(pk__in=ids).update(
+                cantidad_total=F('cantidad_total') + cantidad,
+                ejemplares_disponibles=F('ejemplares_disponibles') + cantidad,
+                disponible=True,
+                actualizado=timezone.now(),  # update() no toca los auto_now
+            )
+
+    def crear_libros(self, pendientes):
+        encontrados = {}
+        for isbn, (cantidad, info) in pendientes.items():
+            if not info:
+                self.stderr.write(f'{isbn}: Open Library no tiene datos de este ISBN.')
+                self.progreso['fallidos'] += 1
+                continue
+            autores = info.get('authors') or [{'name': 'Autor Desconocido'}]
+            encontrados[isbn] = (cantidad, info, openlibrary.separar_nombre(autores[0].get('name')))
+        if not encontrados:
+            return
+
+        autores = self.autores_por_nombre({nombre for _, _, nombre in encontrados.values()})
+        libros = [
+            Libro(
+                titulo=(info.get('title') or 'Sin Título')[:200],
+                isbn=isbn,
+                descripcion=str(info.get('notes') or info.get('description') or ''),
+                autor=autores[nombre],
+                cantidad_total=cantidad,
+                ejemplares_disponibles=cantidad,  # bulk_create no pasa por Libro.save()
+                disponible=True,
+            )
+            for isbn, (cantidad, info, nombre) in encontrados.items()
+        ]
+        Libro.objects.bulk_create(libros, batch_size=500)
+        # bulk_create no dispara los post_save de signals.py; invalidar() repite el borrado al confirmar
+        cache_paginas.invalidar('libros', 'autores')
+        self.progreso['creados'] += len(libros)
+
+        if self.con_portadas:
+            for libro in libros:
+                # default=false: 404 en vez de la imagen vacía de relleno
+                portadas.encolar(libro.pk, url=f"{self.cliente.url_portada(libro.isbn)}?default=false")
+
+    @staticmethod
+    def autores_por_nombre(nombres):
+        """{(nombre, apellido): Autor}, creando en bloque los que falten."""
+        claves = {(n, a): clave_autor(n, a) for (n, a) in nombres}
+
+        def buscar():
+            por_clave = Autor.objects.in_bulk(set(claves.values()), field_name='clave')
+            return {nombre: por_clave[clave] for nombre, clave in claves.items() if clave in por_clave}
+
+        autores = buscar()
+        # bulk_create no pasa por Autor.save(): la clave va a mano. Dos variantes del
+        # mismo nombre en el lote ("Le Guin"/"le guin") comparten clave: se crea una vez.
+        faltantes = {clave: Autor(nombre=n, apellido=a, clave=clave)
+                     for (n, a), clave in claves.items() if (n, a) not in autores}
+        if faltantes:
+            Autor.objects.bulk_create(faltantes.values(), ignore_conflicts=True)
+            autores = buscar()
+        return autores
+
+    # --- Punto de control ---
+    def leer_checkpoint(self, reiniciar):
+        vacio = {'linea': 0, 'creados': 0, 'actualizados': 0, 'fallidos': 0}
+        if reiniciar or not os.path.exists(self.ruta_checkpoint):
+            return vacio
+        with open(self.ruta_checkpoint, encoding='utf-8') as f:
+            return {**vacio, **json.load(f)}
+
+    def guardar_checkpoint(self):
+        # Escritura atómica: si se corta a mitad nunca queda un JSON a medias
+        temporal = f'{self.ruta_checkpoint}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.progreso, f)
+        os.replace(temporal, self.ruta_checkpoint)
@@ -0,0 +1,24 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from Gestion import portadas
+from Gestion.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Genera las renditions (miniatura, tarjeta, detalle en JPEG y WebP) de las portadas ya guardadas'
+
+    def handle(self, *args, **options):
+        # Solo las portadas antiguas, guardadas antes de que existieran las renditions
+        libros = Libro.objects.filter(portada_hash='').exclude(portada='').exclude(portada__isnull=True)
+
+        procesadas = fallidas = 0
+        for libro_id, ruta in libros.values_list('id', 'portada').iterator(chunk_size=500):
+            try:
+                with default_storage.open(ruta, 'rb') as f:
+                    portadas.asignar_portada(libro_id, f.read())
+                procesadas += 1
+            except Exception as e:
+                fallidas += 1
+                self.stderr.write(f'Libro {libro_id}: no se pudo procesar {ruta} ({e})')
+
+        self.stdout.write(self.style.SUCCESS(f'{procesadas} portadas procesadas, {fallidas} con error.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from Gestion import openlibrary
+from Gestion.models import IsbnDesconocido, RespuestaOpenLibrary
+
+
+class Command(BaseCommand):
+    help = ('Purga las cachés de Open Library: por defecto borra lo expirado y recorta cada una a su tope '
+            '(MAX_ENTRADAS, MAX_NEGATIVOS). --isbn olvida ISBN desconocidos concretos (p. ej. cuando Open '
+            'Library ya los tiene) y --negativos / --respuestas vacían la caché correspondiente.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--isbn', nargs='+', default=[], help='ISBN que se vuelven a consultar la próxima vez')
+        parser.add_argument('--negativos', action='store_true', help='Vacía la caché de ISBN desconocidos')
+        parser.add_argument('--respuestas', action='store_true', help='Vacía la caché de respuestas')
+
+    def handle(self, *args, **options):
+        borradas = openlibrary.ClienteOpenLibrary().purgar_cache()
+        if options['isbn']:
+            borradas['negativos'] += IsbnDesconocido.objects.filter(isbn__in=options['isbn']).delete()[0]
+        if options['negativos']:
+            borradas['negativos'] += IsbnDesconocido.objects.all().delete()[0]
+        if options['respuestas']:
+            borradas['respuestas'] += RespuestaOpenLibrary.objects.all().delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{borradas['respuestas']} respuestas y {borradas['negativos']} ISBN desconocidos borrados; "
+            f"quedan {RespuestaOpenLibrary.objects.count()} y {IsbnDesconocido.objects.count()}."
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from Gestion import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero los resúmenes diarios de préstamos, devoluciones y multas'
+
+    def handle(self, *args, **kwargs):
+        cubos_libros, dias_multas = estadisticas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Estadísticas reconstruidas: {cubos_libros} filas libro/día y {dias_multas} días con multas.'
+        ))
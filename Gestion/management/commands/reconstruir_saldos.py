@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from Gestion import saldos
+
+
+class Command(BaseCommand):
+    help = ('Comprueba el saldo de multas de cada socio contra sus multas sin pagar '
+            'y apunta un ajuste donde no cuadre')
+
+    def handle(self, *args, **kwargs):
+        ajustes = saldos.reconstruir()
+        if ajustes:
+            self.stdout.write(self.style.WARNING(f'{ajustes} saldos corregidos con un movimiento de ajuste.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todos los saldos cuadran.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Gestion import busqueda
+from Gestion.models import Libro, Autor
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los índices de texto completo de libros y autores'
+
+    def handle(self, *args, **kwargs):
+        if not busqueda.usa_fts():
+            self.stdout.write(self.style.WARNING('La base de datos no es SQLite: la búsqueda usa icontains, no hay índice que reconstruir.'))
+            return
+
+        with transaction.atomic():
+            busqueda.reconstruir_indices()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Índices reconstruidos: {Libro.objects.count()} libros y {Autor.objects.count()} autores.'
+        ))
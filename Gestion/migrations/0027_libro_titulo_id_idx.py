@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0026_delete_solicitudprestamo'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='autor',
+            options={'verbose_name': 'Autor', 'verbose_name_plural': 'Autores'},
+        ),
+        migrations.AlterField(
+            model_name='autor',
+            name='bibliografia',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='autor',
+            unique_together={('nombre', 'apellido')},
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['titulo', 'id'], name='libro_titulo_id_idx'),
+        ),
+    ]
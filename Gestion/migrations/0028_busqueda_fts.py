@@ -0,0 +1,121 @@
+# Índices de texto completo (FTS5) para el catálogo y los autores.
+# Solo aplica en SQLite; en otros motores Gestion.busqueda usa icontains.
+#
+# OJO: cuando SQLite reconstruye una tabla en una migración (AlterField, AddField
+# no nulo, etc.) se pierden sus triggers (y los de Autor que nombran la tabla
+# rompen el RENAME). Las migraciones que toquen Libro o Autor
+# deben envolver sus operaciones con preservar_triggers() de este módulo.
+
+from django.db import migrations
+
+TABLAS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS Gestion_libro_fts USING fts5(
+        titulo, descripcion, autor, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS Gestion_autor_fts USING fts5(
+        nombre, apellido, bibliografia, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+]
+
+TRIGGERS = [
+    # --- Libros ---
+    """CREATE TRIGGER IF NOT EXISTS gestion_libro_fts_ai AFTER INSERT ON Gestion_libro BEGIN
+        INSERT INTO Gestion_libro_fts(rowid, titulo, descripcion, autor)
+        SELECT new.id, new.titulo, COALESCE(new.descripcion, ''), a.nombre || ' ' || a.apellido
+        FROM Gestion_autor a WHERE a.id = new.autor_id;
+    END""",
+    # Libro.save() reescribe todas las columnas, así que solo reindexamos si cambió el texto
+    """CREATE TRIGGER IF NOT EXISTS gestion_libro_fts_au AFTER UPDATE ON Gestion_libro
+    WHEN old.titulo IS NOT new.titulo OR old.descripcion IS NOT new.descripcion
+         OR old.autor_id IS NOT new.autor_id BEGIN
+        DELETE FROM Gestion_libro_fts WHERE rowid = old.id;
+        INSERT INTO Gestion_libro_fts(rowid, titulo, descripcion, autor)
+        SELECT new.id, new.titulo, COALESCE(new.descripcion, ''), a.nombre || ' ' || a.apellido
+        FROM Gestion_autor a WHERE a.id = new.autor_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS gestion_libro_fts_ad AFTER DELETE ON Gestion_libro BEGIN
+        DELETE FROM Gestion_libro_fts WHERE rowid = old.id;
+    END""",
+
+    # --- Autores ---
+    """CREATE TRIGGER IF NOT EXISTS gestion_autor_fts_ai AFTER INSERT ON Gestion_autor BEGIN
+        INSERT INTO Gestion_autor_fts(rowid, nombre, apellido, bibliografia)
+        VALUES (new.id, new.nombre, new.apellido, COALESCE(new.bibliografia, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS gestion_autor_fts_au AFTER UPDATE ON Gestion_autor
+    WHEN old.nombre IS NOT new.nombre OR old.apellido IS NOT new.apellido
+         OR old.bibliografia IS NOT new.bibliografia BEGIN
+        DELETE FROM Gestion_autor_fts WHERE rowid = old.id;
+        INSERT INTO Gestion_autor_fts(rowid, nombre, apellido, bibliografia)
+        VALUES (new.id, new.nombre, new.apellido, COALESCE(new.bibliografia, ''));
+    END""",
+    # Si cambia el nombre del autor, sus libros también deben encontrarse por el nuevo
+    """CREATE TRIGGER IF NOT EXISTS gestion_autor_fts_libros_au AFTER UPDATE ON Gestion_autor
+    WHEN old.nombre IS NOT new.nombre OR old.apellido IS NOT new.apellido BEGIN
+        UPDATE Gestion_libro_fts SET autor = new.nombre || ' ' || new.apellido
+        WHERE rowid IN (SELECT id FROM Gestion_libro WHERE autor_id = new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS gestion_autor_fts_ad AFTER DELETE ON Gestion_autor BEGIN
+        DELETE FROM Gestion_autor_fts WHERE rowid = old.id;
+    END""",
+]
+
+CARGA_INICIAL = [
+    """INSERT INTO Gestion_libro_fts(rowid, titulo, descripcion, autor)
+    SELECT l.id, l.titulo, COALESCE(l.descripcion, ''), a.nombre || ' ' || a.apellido
+    FROM Gestion_libro l JOIN Gestion_autor a ON a.id = l.autor_id""",
+    """INSERT INTO Gestion_autor_fts(rowid, nombre, apellido, bibliografia)
+    SELECT id, nombre, apellido, COALESCE(bibliografia, '') FROM Gestion_autor""",
+]
+
+CREAR = TABLAS + TRIGGERS + CARGA_INICIAL
+
+ELIMINAR_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS gestion_libro_fts_ai",
+    "DROP TRIGGER IF EXISTS gestion_libro_fts_au",
+    "DROP TRIGGER IF EXISTS gestion_libro_fts_ad",
+    "DROP TRIGGER IF EXISTS gestion_autor_fts_ai",
+    "DROP TRIGGER IF EXISTS gestion_autor_fts_au",
+    "DROP TRIGGER IF EXISTS gestion_autor_fts_libros_au",
+    "DROP TRIGGER IF EXISTS gestion_autor_fts_ad",
+]
+
+ELIMINAR = ELIMINAR_TRIGGERS + [
+    "DROP TABLE IF EXISTS Gestion_libro_fts",
+    "DROP TABLE IF EXISTS Gestion_autor_fts",
+]
+
+
+def ejecutar(sentencias):
+    def operacion(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+    return operacion
+
+
+def preservar_triggers(*operaciones):
+    """
+    Quita los triggers FTS antes de operaciones que reconstruyen tablas y los
+    vuelve a crear después (en ambos sentidos de la migración). Hay que quitarlos
+    antes porque un trigger de Autor que nombra Gestion_libro hace fallar el
+    RENAME que usa SQLite al reconstruir la tabla.
+    """
+    quitar, crear = ejecutar(ELIMINAR_TRIGGERS), ejecutar(TRIGGERS)
+    return [
+        migrations.RunPython(quitar, crear),
+        *operaciones,
+        migrations.RunPython(crear, quitar),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0027_libro_titulo_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(ejecutar(CREAR), ejecutar(ELIMINAR)),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0028_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespuestaOpenLibrary',
+            fields=[
+                ('clave', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('url', models.TextField()),
+                ('contenido', models.TextField()),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expira', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Respuesta de Open Library',
+                'verbose_name_plural': 'Respuestas de Open Library',
+            },
+        ),
+    ]
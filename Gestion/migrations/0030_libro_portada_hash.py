@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+fts = import_module('Gestion.migrations.0028_busqueda_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0029_respuestaopenlibrary'),
+    ]
+
+    operations = fts.preservar_triggers(
+        migrations.AddField(
+            model_name='libro',
+            name='portada_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    )
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0030_libro_portada_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prestamos',
+            name='estado',
+            field=models.CharField(choices=[('s', 'Solicitado'), ('p', 'Prestado'), ('m', 'Multa'), ('d', 'Devuelto'), ('r', 'Rechazado')], default='p', max_length=1),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['pagada', 'fecha'], name='multa_pagada_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['fecha', 'id'], name='multa_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamos',
+            index=models.Index(fields=['usuario', 'fecha_prestamo'], name='prestamo_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamos',
+            index=models.Index(fields=['estado', 'fecha_max'], name='prestamo_estado_fmax_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamos',
+            index=models.Index(fields=['fecha_prestamo', 'id'], name='prestamo_fecha_id_idx'),
+        ),
+    ]
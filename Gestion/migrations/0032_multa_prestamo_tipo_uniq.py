@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+def quitar_duplicados(apps, schema_editor):
+    # Antes no había restricción: si un préstamo tiene dos multas del mismo tipo
+    # conservamos la pagada (o la más antigua) para poder crear el índice único.
+    Multa = apps.get_model('Gestion', 'Multa')
+    vistas = set()
+    sobrantes = []
+    for multa_id, prestamo_id, tipo in Multa.objects.order_by('prestamo_id', 'tipo_multa', '-pagada', 'id') \
+            .values_list('id', 'prestamo_id', 'tipo_multa').iterator():
+        if (prestamo_id, tipo) in vistas:
+            sobrantes.append(multa_id)
+        vistas.add((prestamo_id, tipo))
+    Multa.objects.filter(id__in=sobrantes).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0031_indices_prestamos_multas'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='multa',
+            constraint=models.UniqueConstraint(fields=('prestamo', 'tipo_multa'), name='multa_prestamo_tipo_uniq'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:19
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cargar_historial(apps, schema_editor):
+    # Un cargo por cada multa existente y un pago por cada una ya pagada,
+    # en orden de fecha, con el saldo acumulado de cada socio.
+    Multa = apps.get_model('Gestion', 'Multa')
+    MovimientoMulta = apps.get_model('Gestion', 'MovimientoMulta')
+    SaldoUsuario = apps.get_model('Gestion', 'SaldoUsuario')
+
+    saldos, movimientos = {}, []
+    multas = Multa.objects.order_by('fecha', 'id').values_list('id', 'prestamo__usuario_id', 'monto', 'pagada')
+    for multa_id, usuario_id, monto, pagada in multas.iterator():
+        for tipo, importe in [('cargo', monto)] + ([('pago', -monto)] if pagada else []):
+            saldos[usuario_id] = saldos.get(usuario_id, Decimal('0')) + importe
+            movimientos.append(MovimientoMulta(usuario_id=usuario_id, multa_id=multa_id, tipo=tipo,
+                                               monto=importe, saldo_resultante=saldos[usuario_id]))
+    MovimientoMulta.objects.bulk_create(movimientos, batch_size=1000)
+    SaldoUsuario.objects.bulk_create([SaldoUsuario(usuario_id=u, saldo=s) for u, s in saldos.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0033_estadisticas'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo_multas', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de multas',
+                'verbose_name_plural': 'Saldos de multas',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoMulta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cargo', 'Cargo'), ('pago', 'Pago'), ('ajuste', 'Ajuste')], max_length=10)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('saldo_resultante', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('multa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='Gestion.multa')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_multas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', 'id'], name='movimiento_usuario_id_idx')],
+            },
+        ),
+        migrations.RunPython(cargar_historial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+fts = import_module('Gestion.migrations.0028_busqueda_fts')
+
+
+def clave_autor(nombre, apellido):
+    # Copia congelada de Gestion.models.clave_autor
+    def limpiar(texto):
+        return ' '.join((texto or '').split()).casefold()
+    return f"{limpiar(nombre)}|{limpiar(apellido)}"
+
+
+def fusionar_duplicados(apps, schema_editor):
+    # Con iexact se colaban "Cervantes" y "cervantes": nos quedamos con el más
+    # antiguo, le pasamos los libros (y la bibliografía si no tenía) y borramos el resto.
+    # Va antes de reconstruir la tabla para que los triggers FTS sigan al día.
+    Autor = apps.get_model('Gestion', 'Autor')
+    Libro = apps.get_model('Gestion', 'Libro')
+    grupos = {}
+    for autor in Autor.objects.order_by('id').iterator():
+        grupos.setdefault(clave_autor(autor.nombre, autor.apellido), []).append(autor)
+    for autor, *duplicados in grupos.values():
+        if not duplicados:
+            continue
+        ids = [d.id for d in duplicados]
+        Libro.objects.filter(autor_id__in=ids).update(autor_id=autor.id)
+        if not autor.bibliografia:
+            autor.bibliografia = next((d.bibliografia for d in duplicados if d.bibliografia), autor.bibliografia)
+            autor.save(update_fields=['bibliografia'])
+        Autor.objects.filter(id__in=ids).delete()
+
+
+def rellenar_clave(apps, schema_editor):
+    Autor = apps.get_model('Gestion', 'Autor')
+    autores = list(Autor.objects.only('id', 'nombre', 'apellido'))
+    for autor in autores:
+        autor.clave = clave_autor(autor.nombre, autor.apellido)
+    Autor.objects.bulk_update(autores, ['clave'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0034_saldos_multas'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_duplicados, migrations.RunPython.noop),
+        *fts.preservar_triggers(
+            migrations.AddField(
+                model_name='autor',
+                name='clave',
+                field=models.CharField(editable=False, max_length=101, null=True),
+            ),
+            migrations.RunPython(rellenar_clave, migrations.RunPython.noop),
+            migrations.AlterField(
+                model_name='autor',
+                name='clave',
+                field=models.CharField(editable=False, max_length=101, unique=True),
+            ),
+            migrations.AlterUniqueTogether(
+                name='autor',
+                unique_together=set(),
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:31
+
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+
+fts = import_module('Gestion.migrations.0028_busqueda_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0035_autor_clave'),
+    ]
+
+    operations = fts.preservar_triggers(
+        migrations.AddField(
+            model_name='autor',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    )
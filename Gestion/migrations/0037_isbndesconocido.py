@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0036_actualizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IsbnDesconocido',
+            fields=[
+                ('isbn', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('ultimo_acceso', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('consultas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'ISBN desconocido',
+                'verbose_name_plural': 'ISBN desconocidos',
+            },
+        ),
+    ]
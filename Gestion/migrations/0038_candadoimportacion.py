@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Gestion', '0037_isbndesconocido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandadoImportacion',
+            fields=[
+                ('isbn', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('ficha', models.CharField(max_length=32)),
+                ('expira', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -2,21 +2,69 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from .expresiones import DiasEntre
+
+# Recargo diario por retraso (lo usan multa_total y el comando generar_multas)
+TARIFA_RETRASO = Decimal('0.50')
+
+def clave_autor(nombre, apellido):
+    """Nombre sin mayúsculas ni espacios sobrantes: 'Gabriel  García' y 'gabriel garcía' coinciden."""
+    def limpiar(texto):
+        return ' '.join((texto or '').split()).casefold()
+    return f"{limpiar(nombre)}|{limpiar(apellido)}"
+
+
+class AutorQuerySet(models.QuerySet):
+    """
+    Búsquedas por nombre a través de `clave` (índice único) en vez de
+    nombre__iexact/apellido__iexact, que en SQLite recorren la tabla entera.
+    """
+
+    def por_nombre(self, nombre, apellido):
+        return self.filter(clave=clave_autor(nombre, apellido))
+
+    def obtener_o_crear(self, nombre, apellido, defaults=None):
+        return self.get_or_create(
+            clave=clave_autor(nombre, apellido),
+            defaults={'nombre': nombre, 'apellido': apellido, **(defaults or {})},
+        )
+
 
 class Autor(models.Model):
     nombre = models.CharField(max_length=50)
     apellido = models.CharField(max_length=50)
     bibliografia = models.TextField(blank=True, null=True) 
+    # Nombre normalizado (ver clave_autor); se rellena en save(). Con bulk_create hay que ponerlo a mano.
+    clave = models.CharField(max_length=101, unique=True, editable=False)
+    # Versión para los ETag de la API. Los update()/bulk_update() y los save(update_fields=...)
+    # deben ponerlo a mano
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = AutorQuerySet.as_manager()
 
     class Meta:
-        unique_together = ('nombre', 'apellido')
         verbose_name = "Autor"
         verbose_name_plural = "Autores"
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
+    def clean(self):
+        # `clave` no sale en los formularios, así que su unicidad no la valida el ModelForm
+        if Autor.objects.por_nombre(self.nombre, self.apellido).exclude(pk=self.pk).exists():
+            raise ValidationError(f"Ya existe un autor llamado {self.nombre} {self.apellido}.")
+
+    def save(self, *args, **kwargs):
+        self.clave = clave_autor(self.nombre, self.apellido)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'nombre', 'apellido'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'clave'}
+        super().save(*args, **kwargs)
+
 class Libro(models.Model):
     isbn_validator = RegexValidator(
         regex=r'^(\d{10}|\d{13})$', 
@@ -37,7 +85,18 @@ class Libro(models.Model):
     cantidad_total = models.PositiveIntegerField(default=1)
     ejemplares_disponibles = models.IntegerField(default=1)
     portada = models.ImageField(upload_to='portadas/', blank=True, null=True)
+    # sha256 de la imagen original; las renditions se llaman portadas/<hash>_<tamaño>.<ext>
+    portada_hash = models.CharField(max_length=64, blank=True, default='')
     disponible = models.BooleanField(default=True)
+    # Versión para los ETag de la API. Los update()/bulk_update() y los save(update_fields=...)
+    # deben ponerlo a mano
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Orden estable del catálogo, usado por la paginación keyset
+            models.Index(fields=['titulo', 'id'], name='libro_titulo_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.pk:
@@ -50,10 +109,54 @@ class Libro(models.Model):
 
         super().save(*args, **kwargs)
 
+    @property
+    def portadas(self):
+        """{'miniatura': {'jpg': url, 'webp': url}, 'tarjeta': ..., 'detalle': ...} o None."""
+        from .portadas import RENDICIONES, FORMATOS, urls
+        if self.portada_hash:
+            return urls(self.portada_hash)
+        if self.portada:
+            # Portadas antiguas, anteriores al pipeline: solo existe el archivo original
+            return {r: {f: self.portada.url for f in FORMATOS} for r in RENDICIONES}
+        return None
+
     def __str__(self):
         estado = "✅" if self.disponible else "❌"
         return f"{estado} {self.titulo} ({self.ejemplares_disponibles}/{self.cantidad_total})"
 
+class PrestamosQuerySet(models.QuerySet):
+    """
+    Las mismas cuentas que Prestamos.dias_retraso y Prestamos.multa_total, pero en
+    SQL, para poder filtrar y ordenar por ellas. Las anotaciones se llaman
+    `retraso` y `multa_acumulada` para no chocar con las propiedades.
+    """
+
+    def with_retraso(self, hoy=None):
+        hoy = hoy or timezone.now().date()
+        referencia = Coalesce(F('fecha_devolucion'), Value(hoy))
+        return self.annotate(retraso=Case(
+            When(fecha_max__isnull=False, then=Greatest(DiasEntre(referencia, F('fecha_max')), Value(0))),
+            default=Value(0),
+        ))
+
+    def with_multa(self, hoy=None):
+        qs = self if 'retraso' in self.query.annotations else self.with_retraso(hoy)
+        return qs.annotate(multa_acumulada=ExpressionWrapper(
+            F('retraso') * Value(TARIFA_RETRASO) + F('multa_fija'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ))
+
+    def atrasados(self, hoy=None):
+        """
+        Los de retraso > 0, pero con condiciones sobre columnas y no sobre la
+        anotación, que habría que calcular fila a fila: en curso y vencidos
+        (índice estado, fecha_max) o devueltos después de fecha_max.
+        """
+        hoy = hoy or timezone.now().date()
+        return self.filter(Q(estado='p', fecha_devolucion__isnull=True, fecha_max__lt=hoy)
+                           | Q(fecha_devolucion__gt=F('fecha_max')))
+
+
 class Prestamos(models.Model):
     libro = models.ForeignKey(Libro, related_name="prestamos", on_delete=models.PROTECT)
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="prestamos", on_delete=models.PROTECT)
@@ -61,11 +164,23 @@ class Prestamos(models.Model):
     fecha_max = models.DateField(null=True, blank=True)
     fecha_devolucion = models.DateField(null=True, blank=True)
 
-    ESTADOS = [('p', 'Prestado'), ('m', 'Multa'), ('d', 'Devuelto')]
+    ESTADOS = [('s', 'Solicitado'), ('p', 'Prestado'), ('m', 'Multa'), ('d', 'Devuelto'), ('r', 'Rechazado')]
 
     estado = models.CharField(max_length=1, choices=ESTADOS, default='p')
     multa_fija = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
 
+    objects = PrestamosQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Historial de un socio ("Mis préstamos")
+            models.Index(fields=['usuario', 'fecha_prestamo'], name='prestamo_usuario_fecha_idx'),
+            # Préstamos vencidos: estado = 'p' AND fecha_max < hoy
+            models.Index(fields=['estado', 'fecha_max'], name='prestamo_estado_fmax_idx'),
+            # Orden del listado global
+            models.Index(fields=['fecha_prestamo', 'id'], name='prestamo_fecha_id_idx'),
+        ]
+
     @property
     def dias_retraso(self):
         hoy = timezone.now().date()
@@ -76,31 +191,9 @@ class Prestamos(models.Model):
 
     @property
     def multa_total(self):
-        tarifa_retraso = Decimal('0.50')
-        total_retraso = Decimal(self.dias_retraso) * tarifa_retraso
+        total_retraso = Decimal(self.dias_retraso) * TARIFA_RETRASO
         return total_retraso + Decimal(self.multa_fija)
 
-    def save(self, *args, **kwargs):
-        # Forzamos la conversión a entero por si vienen como string desde el POST
-        try:
-            total = int(self.cantidad_total or 0)
-            disponibles = int(self.ejemplares_disponibles or 0)
-        except (ValueError, TypeError):
-            total = 0
-            disponibles = 0
-
-        if not self.pk:
-            self.ejemplares_disponibles = total
-            disponibles = total
-        
-        # Ahora la comparación es segura: int > int
-        self.disponible = disponibles > 0
-
-        if disponibles > total:
-            self.ejemplares_disponibles = total
-
-        super().save(*args, **kwargs)
-
 class Multa(models.Model):
     prestamo = models.ForeignKey(Prestamos, related_name="multas", on_delete=models.PROTECT)
     tipo_multa = models.CharField(max_length=50, choices=[('retraso', 'Retraso'), ('perdida', 'Pérdida del libro'), ('deterioro', 'Deterioro del libro')])
@@ -108,10 +201,132 @@ class Multa(models.Model):
     pagada = models.BooleanField(default=False)
     fecha = models.DateField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['pagada', 'fecha'], name='multa_pagada_fecha_idx'),
+            models.Index(fields=['fecha', 'id'], name='multa_fecha_id_idx'),
+        ]
+        constraints = [
+            # Una multa de cada tipo por préstamo: permite el upsert de generar_multas
+            models.UniqueConstraint(fields=['prestamo', 'tipo_multa'], name='multa_prestamo_tipo_uniq'),
+        ]
+
     def __str__(self):
         return f"Multa {self.tipo_multa} - {self.monto} - {self.prestamo}"
 
     def save(self, *args, **kwargs):
         if self.tipo_multa == 'retraso' and (self.monto == 0 or self.monto is None):
             self.monto = self.prestamo.multa_total
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class RespuestaOpenLibrary(models.Model):
+    """Caché persistente de respuestas JSON de Open Library (ver Gestion/openlibrary.py)."""
+    clave = models.CharField(max_length=64, primary_key=True)  # sha256 de la URL
+    url = models.TextField()
+    contenido = models.TextField()
+    creado = models.DateTimeField(default=timezone.now)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Respuesta de Open Library"
+        verbose_name_plural = "Respuestas de Open Library"
+
+    def __str__(self):
+        return self.url
+
+
+class IsbnDesconocido(models.Model):
+    """
+    Caché negativa: ISBN por los que Open Library respondió que no los conoce.
+    Tiene su propio TTL (TTL_NEGATIVO) y un tope de filas (MAX_NEGATIVOS) que se
+    recorta por ultimo_acceso, es decir, como un LRU (ver Gestion/openlibrary.py).
+    """
+    isbn = models.CharField(max_length=32, primary_key=True)
+    creado = models.DateTimeField(default=timezone.now)
+    expira = models.DateTimeField(db_index=True)
+    ultimo_acceso = models.DateTimeField(default=timezone.now, db_index=True)
+    consultas = models.PositiveIntegerField(default=0)  # peticiones a Open Library que nos ahorramos
+
+    class Meta:
+        verbose_name = "ISBN desconocido"
+        verbose_name_plural = "ISBN desconocidos"
+
+    def __str__(self):
+        return self.isbn
+
+
+class CandadoImportacion(models.Model):
+    """
+    Candado entre procesos de Gestion/importacion.py: una fila por ISBN que algún
+    worker está importando de Open Library. La clave primaria garantiza que solo
+    uno consigue insertarla; si el proceso muere sin borrarla, caduca en `expira`.
+    """
+    isbn = models.CharField(max_length=32, primary_key=True)
+    ficha = models.CharField(max_length=32)  # identifica al dueño: solo él lo suelta
+    expira = models.DateTimeField()
+
+    def __str__(self):
+        return self.isbn
+
+
+# --- Resúmenes de circulación (mantenidos por Gestion.estadisticas) ---
+class EstadisticaLibroDia(models.Model):
+    """Préstamos y devoluciones de un libro en un día."""
+    fecha = models.DateField()
+    libro = models.ForeignKey(Libro, related_name="estadisticas", on_delete=models.CASCADE)
+    prestamos = models.PositiveIntegerField(default=0)
+    devoluciones = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'libro'], name='estadistica_libro_dia_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.libro_id}: {self.prestamos}/{self.devoluciones}"
+
+
+class EstadisticaMultasDia(models.Model):
+    """Multas registradas en un día (por Multa.fecha) y cuánto de eso ya está pagado."""
+    fecha = models.DateField(unique=True)
+    cantidad = models.PositiveIntegerField(default=0)
+    monto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    monto_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.fecha}: {self.cantidad} multas, {self.monto}"
+
+
+# --- Cuenta de multas por socio (mantenida por Gestion.saldos) ---
+class SaldoUsuario(models.Model):
+    """Lo que debe cada socio ahora mismo: una fila, sin sumar su historial."""
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, related_name="saldo_multas", on_delete=models.CASCADE)
+    saldo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo de multas"
+        verbose_name_plural = "Saldos de multas"
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.saldo}"
+
+
+class MovimientoMulta(models.Model):
+    """Libro mayor de multas: solo se añaden filas, nunca se editan ni se borran."""
+    TIPOS = [('cargo', 'Cargo'), ('pago', 'Pago'), ('ajuste', 'Ajuste')]
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="movimientos_multas", on_delete=models.PROTECT)
+    multa = models.ForeignKey(Multa, related_name="movimientos", null=True, blank=True, on_delete=models.SET_NULL)
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    monto = models.DecimalField(max_digits=10, decimal_places=2)  # + aumenta la deuda, - la reduce
+    saldo_resultante = models.DecimalField(max_digits=12, decimal_places=2)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'id'], name='movimiento_usuario_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.monto} ({self.usuario_id})"
@@ -0,0 +1,418 @@
+"""
+Cliente compartido de Open Library.
+
+- Una sola requests.Session con pool de conexiones keep-alive (sin un
+  handshake TLS nuevo por consulta).
+- Caché persistente en BD (RespuestaOpenLibrary) con TTL y tope de entradas.
+- Caché negativa (IsbnDesconocido) de los ISBN que Open Library no conoce,
+  con su propio TTL y tope LRU: los reintentos de un ISBN erróneo se
+  responden sin salir a la red.
+- Contadores de aciertos/fallos de caché.
+
+El transporte es cualquier objeto con un método get(url, timeout=...) que
+devuelva algo parecido a requests.Response, así en las pruebas se puede
+cambiar por un stub local.
+
+ClienteAsincrono es la variante para las vistas async (ASGI): la misma caché y
+los mismos contadores, pero el HTTP se espera sin ocupar un hilo. Usa httpx si
+está instalado; si no, hace las peticiones con la sesión de requests en un hilo
+del ejecutor por defecto, que tampoco bloquea el bucle de eventos.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import weakref
+from datetime import timedelta
+
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Autor, IsbnDesconocido, Libro, RespuestaOpenLibrary
+
+try:
+    import httpx
+except ImportError:  # dependencia opcional: sin ella ClienteAsincrono usa requests en un hilo
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+CONFIG_POR_DEFECTO = {
+    'URL_BASE': 'https://openlibrary.org',
+    'URL_PORTADAS': 'https://covers.openlibrary.org',
+    'TIMEOUT': (3.05, 10),           # (conexión, lectura) en segundos
+    'TTL': 60 * 60 * 24 * 7,         # una semana
+    'MAX_ENTRADAS': 20000,
+    'TTL_NEGATIVO': 60 * 60 * 24,    # un día: Open Library va incorporando libros
+    'MAX_NEGATIVOS': 50000,
+    'PLAZO_IMPORTACION': 30,         # espera máxima a que otro proceso importe el mismo ISBN
+    'TAMANO_POOL': 10,
+    'REINTENTOS': 2,
+}
+
+
+USER_AGENT = 'Biblioteca_Django (gestion de biblioteca)'
+
+
+def configuracion():
+    return {**CONFIG_POR_DEFECTO, **getattr(settings, 'OPENLIBRARY', {})}
+
+
+def separar_nombre(nombre_completo):
+    """'Gabriel García Márquez' -> ('Gabriel', 'García Márquez'); sin apellido usamos '.'."""
+    partes = (nombre_completo or '').strip().split(' ', 1)
+    nombre = partes[0]
+    apellido = partes[1] if len(partes) > 1 else '.'
+    return nombre, apellido
+
+
+def ol_id_autor(datos_autor):
+    """Extrae 'OL23919A' de {'url': 'https://openlibrary.org/authors/OL23919A/Nombre'}."""
+    partes = (datos_autor or {}).get('url', '').split('/')
+    if 'authors' not in partes:
+        return None
+    indice = partes.index('authors') + 1
+    return partes[indice] if indice < len(partes) and partes[indice] else None
+
+
+def crear_sesion(config):
+    """requests.Session con pool keep-alive y reintentos en los 502/503/504."""
+    sesion = requests.Session()
+    reintentos = Retry(
+        total=config['REINTENTOS'],
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=['GET'],
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=config['TAMANO_POOL'],
+        pool_maxsize=config['TAMANO_POOL'],
+        max_retries=reintentos,
+    )
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    sesion.headers['User-Agent'] = USER_AGENT
+    return sesion
+
+
+def autor_principal(info):
+    """(nombre completo, id de Open Library) del primer autor del libro; sin autores, 'Autor Desconocido'."""
+    autores = (info or {}).get('authors')
+    if not autores:
+        return "Autor Desconocido", None
+    return autores[0].get('name'), ol_id_autor(autores[0])
+
+
+def guardar_libro(isbn, info, bibliografia=''):
+    """
+    Da de alta en el catálogo el libro que devolvió Open Library, con un
+    ejemplar, y a su autor si no existía. Devuelve (libro, creado): si otra
+    petición lo importó mientras tanto, se devuelve ese.
+    """
+    nombre, apellido = separar_nombre(autor_principal(info)[0])
+    with transaction.atomic():
+        autor, _ = Autor.objects.obtener_o_crear(nombre, apellido, defaults={'bibliografia': bibliografia})
+        return Libro.objects.get_or_create(isbn=isbn, defaults={
+            'titulo': info.get('title', 'Sin Título'),
+            'descripcion': str(info.get('description', info.get('notes', ''))),
+            'autor': autor,
+            'cantidad_total': 1,
+            'ejemplares_disponibles': 1,
+        })
+
+
+def _recortar(modelo, maximo, orden):
+    """Borra las filas expiradas de `modelo` y, si pasan de `maximo`, las primeras según `orden`."""
+    borradas = modelo.objects.filter(expira__lte=timezone.now()).delete()[0]
+    sobrantes = modelo.objects.count() - maximo
+    if sobrantes > 0:
+        primeras = modelo.objects.order_by(orden).values_list('pk', flat=True)[:sobrantes]
+        borradas += modelo.objects.filter(pk__in=list(primeras)).delete()[0]
+    return borradas
+
+
+class _BaseCliente:
+    """Configuración, caché en BD y contadores, comunes al cliente síncrono y al asíncrono."""
+
+    def __init__(self, **opciones):
+        self.config = {**configuracion(), **opciones}
+        self.url_base = self.config['URL_BASE'].rstrip('/')
+        self.url_portadas = self.config['URL_PORTADAS'].rstrip('/')
+        self.aciertos = 0
+        self.fallos = 0
+        self.negativos = 0
+        self._escrituras = 0
+        self._lock = threading.Lock()
+
+    # --- Caché ---
+    @staticmethod
+    def _clave(url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _leer_cache(self, url):
+        entrada = RespuestaOpenLibrary.objects.filter(
+            clave=self._clave(url), expira__gt=timezone.now()
+        ).values_list('contenido', flat=True).first()
+        return None if entrada is None else json.loads(entrada)
+
+    def _guardar_cache(self, url, datos):
+        ahora = timezone.now()
+        RespuestaOpenLibrary.objects.update_or_create(
+            clave=self._clave(url),
+            defaults={
+                'url': url,
+                'contenido': json.dumps(datos),
+                'creado': ahora,
+                'expira': ahora + timedelta(seconds=self.config['TTL']),
+            },
+        )
+        self._anotar_escritura()
+
+    def _anotar_escritura(self):
+        with self._lock:
+            self._escrituras += 1
+            toca_purgar = self._escrituras % 100 == 1
+        if toca_purgar:
+            self.purgar_cache()
+
+    def purgar_cache(self):
+        """
+        Borra lo expirado de las dos cachés y, si siguen por encima de su tope, lo
+        que sobra: las respuestas más antiguas y los ISBN desconocidos consultados
+        hace más tiempo. Devuelve cuántas filas se borraron de cada una.
+        """
+        return {
+            'respuestas': _recortar(RespuestaOpenLibrary, self.config['MAX_ENTRADAS'], 'expira'),
+            'negativos': _recortar(IsbnDesconocido, self.config['MAX_NEGATIVOS'], 'ultimo_acceso'),
+        }
+
+    # --- Caché negativa ---
+    def _consulta_desconocido(self, isbn):
+        return IsbnDesconocido.objects.filter(isbn=isbn, expira__gt=timezone.now())
+
+    def _anotar_desconocido(self, isbn):
+        """Una petición ahorrada: el ISBN vuelve al final de la cola del LRU."""
+        IsbnDesconocido.objects.filter(isbn=isbn).update(ultimo_acceso=timezone.now(), consultas=F('consultas') + 1)
+        self._contar(True, negativo=True)
+
+    def _recordar_desconocido(self, isbn):
+        if len(isbn) > IsbnDesconocido._meta.get_field('isbn').max_length:
+            return  # no es un ISBN: no merece una fila
+        ahora = timezone.now()
+        IsbnDesconocido.objects.update_or_create(isbn=isbn, defaults={
+            'creado': ahora,
+            'ultimo_acceso': ahora,
+            'expira': ahora + timedelta(seconds=self.config['TTL_NEGATIVO']),
+        })
+        self._anotar_escritura()
+
+    @staticmethod
+    def _extraer_libro(isbn, datos):
+        """
+        (info, desconocido): un 200 sin el libro es que Open Library no lo
+        conoce; un error (datos None) no dice nada y no se recuerda.
+        """
+        info = (datos or {}).get(f"ISBN:{isbn}")
+        return info, datos is not None and not info
+
+    def _contar(self, acierto, negativo=False):
+        with self._lock:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+            if negativo:
+                self.negativos += 1
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'negativos': self.negativos,
+                'tasa_aciertos': self.aciertos / total if total else 0.0,
+            }
+
+    # --- Rutas y respuestas ---
+    def _url(self, ruta):
+        return f"{self.url_base}{ruta}"
+
+    @staticmethod
+    def _ruta_libro(isbn):
+        return f"/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
+
+    @staticmethod
+    def _ruta_autor(ol_id):
+        return f"/authors/{ol_id}.json"
+
+    @staticmethod
+    def _texto_bio(datos_autor):
+        bio = (datos_autor or {}).get('bio', '')
+        return bio.get('value', '') if isinstance(bio, dict) else bio
+
+    def _json(self, respuesta, url):
+        if respuesta.status_code != 200:
+            logger.info("Open Library respondió %s para %s", respuesta.status_code, url)
+            return None
+        return respuesta.json()
+
+    def url_portada(self, isbn, tamano='L'):
+        return f"{self.url_portadas}/b/isbn/{isbn}-{tamano}.jpg"
+
+
+class ClienteOpenLibrary(_BaseCliente):
+
+    def __init__(self, transporte=None, **opciones):
+        super().__init__(**opciones)
+        self.transporte = transporte or crear_sesion(self.config)
+
+    # --- HTTP ---
+    def obtener_json(self, ruta, timeout=None, usar_cache=True):
+        """GET a `ruta` (relativa a URL_BASE). Devuelve el JSON o None si no es 200."""
+        url = self._url(ruta)
+        if usar_cache:
+            datos = self._leer_cache(url)
+            self._contar(datos is not None)
+            if datos is not None:
+                return datos
+
+        datos = self._json(self.transporte.get(url, timeout=timeout or self.config['TIMEOUT']), url)
+        # Las respuestas vacías no se guardan: los ISBN desconocidos van a la caché negativa
+        if datos and usar_cache:
+            self._guardar_cache(url, datos)
+        return datos
+
+    def descargar(self, url, timeout=None):
+        """Descarga binaria (portadas). No se cachea en BD."""
+        respuesta = self.transporte.get(url, timeout=timeout or self.config['TIMEOUT'])
+        return respuesta.content if respuesta.status_code == 200 else None
+
+    # --- Recursos ---
+    def libro(self, isbn, usar_cache=True):
+        """Datos del libro (jscmd=data) o None si Open Library no conoce el ISBN."""
+        if usar_cache and self._consulta_desconocido(isbn).exists():
+            self._anotar_desconocido(isbn)
+            return None
+        datos = self.obtener_json(self._ruta_libro(isbn), usar_cache=usar_cache)
+        info, desconocido = self._extraer_libro(isbn, datos)
+        if desconocido and usar_cache:
+            self._recordar_desconocido(isbn)
+        return info
+
+    def autor(self, ol_id, usar_cache=True):
+        return self.obtener_json(self._ruta_autor(ol_id), timeout=5, usar_cache=usar_cache)
+
+    def biografia(self, ol_id, usar_cache=True):
+        return self._texto_bio(self.autor(ol_id, usar_cache=usar_cache))
+
+
+class TransporteHttpx:
+    """httpx.AsyncClient con la interfaz del transporte síncrono (timeout=(conexión, lectura) incluido)."""
+
+    def __init__(self, config):
+        limites = httpx.Limits(max_connections=config['TAMANO_POOL'],
+                               max_keepalive_connections=config['TAMANO_POOL'])
+        self.cliente = httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT},
+            follow_redirects=True,
+            transport=httpx.AsyncHTTPTransport(limits=limites, retries=config['REINTENTOS']),
+        )
+
+    async def get(self, url, timeout=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        return await self.cliente.get(url, timeout=timeout)
+
+
+class TransporteEnHilo:
+    """Sin httpx: cada GET de la sesión de requests va a un hilo y el bucle de eventos sigue libre."""
+
+    def __init__(self, sesion):
+        self.sesion = sesion
+
+    async def get(self, url, timeout=None):
+        return await asyncio.to_thread(self.sesion.get, url, timeout=timeout)
+
+
+class ClienteAsincrono(_BaseCliente):
+    """
+    Los mismos recursos que ClienteOpenLibrary, como corrutinas. Las lecturas de
+    la caché usan el ORM asíncrono; solo las escrituras pasan por sync_to_async.
+    El transporte es cualquier objeto con un `async get(url, timeout=...)`.
+    """
+
+    def __init__(self, transporte=None, **opciones):
+        super().__init__(**opciones)
+        if transporte is None:
+            transporte = TransporteHttpx(self.config) if httpx else TransporteEnHilo(crear_sesion(self.config))
+        self.transporte = transporte
+
+    async def _leer_cache_async(self, url):
+        entrada = await RespuestaOpenLibrary.objects.filter(
+            clave=self._clave(url), expira__gt=timezone.now()
+        ).values_list('contenido', flat=True).afirst()
+        return None if entrada is None else json.loads(entrada)
+
+    # --- HTTP ---
+    async def obtener_json(self, ruta, timeout=None, usar_cache=True):
+        url = self._url(ruta)
+        if usar_cache:
+            datos = await self._leer_cache_async(url)
+            self._contar(datos is not None)
+            if datos is not None:
+                return datos
+
+        datos = self._json(await self.transporte.get(url, timeout=timeout or self.config['TIMEOUT']), url)
+        if datos and usar_cache:
+            await sync_to_async(self._guardar_cache)(url, datos)
+        return datos
+
+    # --- Recursos ---
+    async def libro(self, isbn, usar_cache=True):
+        if usar_cache and await self._consulta_desconocido(isbn).aexists():
+            await sync_to_async(self._anotar_desconocido)(isbn)
+            return None
+        datos = await self.obtener_json(self._ruta_libro(isbn), usar_cache=usar_cache)
+        info, desconocido = self._extraer_libro(isbn, datos)
+        if desconocido and usar_cache:
+            await sync_to_async(self._recordar_desconocido)(isbn)
+        return info
+
+    async def autor(self, ol_id, usar_cache=True):
+        return await self.obtener_json(self._ruta_autor(ol_id), timeout=5, usar_cache=usar_cache)
+
+    async def biografia(self, ol_id, usar_cache=True):
+        return self._texto_bio(await self.autor(ol_id, usar_cache=usar_cache))
+
+
+_cliente = None
+_cliente_lock = threading.Lock()
+# Un cliente asíncrono por bucle de eventos: las conexiones de httpx no se pueden compartir entre bucles
+_clientes_asincronos = weakref.WeakKeyDictionary()
+
+
+def obtener_cliente():
+    """Cliente compartido por todo el proceso (reutiliza el pool de conexiones)."""
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                _cliente = ClienteOpenLibrary()
+    return _cliente
+
+
+def obtener_cliente_asincrono():
+    """Cliente asíncrono compartido del bucle de eventos actual (en ASGI, el del servidor)."""
+    bucle = asyncio.get_running_loop()
+    cliente = _clientes_asincronos.get(bucle)
+    if cliente is None:
+        cliente = _clientes_asincronos[bucle] = ClienteAsincrono()
+    return cliente
@@ -0,0 +1,116 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .expresiones import ComparacionFilas
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class PaginaKeyset:
+    """Página obtenida por búsqueda (seek): no conoce el total ni su número."""
+
+    def __init__(self, object_list, paginator, cursor_siguiente=None, cursor_anterior=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginación por clave sobre un orden estable e indexado (ej. ('titulo', 'id')
+    o ('-fecha_prestamo', '-id')). En vez de OFFSET filtramos "después de la
+    última fila vista", así la página 1000 cuesta lo mismo que la primera y no
+    hace falta el COUNT(*). El último campo del orden debe ser único (normalmente 'id').
+    """
+
+    def __init__(self, queryset, per_page, ordering=('titulo', 'id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.campos = [campo.lstrip('-') for campo in self.ordering]
+        self.descendente = [campo.startswith('-') for campo in self.ordering]
+
+    # --- Cursores ---
+    def codificar(self, obj):
+        valores = [getattr(obj, campo) for campo in self.campos]
+        crudo = json.dumps(valores, default=str).encode()
+        return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+    def decodificar(self, cursor):
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        except (ValueError, TypeError) as e:
+            raise CursorInvalido(str(e))
+        if not isinstance(valores, list) or len(valores) != len(self.ordering):
+            raise CursorInvalido("Cursor con formato incorrecto.")
+        return valores
+
+    def _filtro(self, valores, adelante):
+        # Con campos descendentes (o yendo hacia atrás) el > pasa a ser <.
+        operadores = ['gt' if adelante != desc else 'lt' for desc in self.descendente]
+        if len(set(operadores)) == 1:
+            # Todos en el mismo sentido: (a, b, c) > (x, y, z), que el índice resuelve como un rango
+            return ComparacionFilas(self.campos, valores, '>' if operadores[0] == 'gt' else '<')
+
+        # Sentidos mezclados: a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        # más a >= x (o <=) para que el primer campo del índice acote el recorrido
+        condicion = Q()
+        for i, campo in enumerate(self.campos):
+            iguales = {self.campos[j]: valores[j] for j in range(i)}
+            condicion |= Q(**iguales, **{f"{campo}__{operadores[i]}": valores[i]})
+        return Q(**{f"{self.campos[0]}__{operadores[0]}e": valores[0]}) & condicion
+
+    # --- Páginas ---
+    def consulta(self, despues=None, antes=None):
+        """La consulta de la página (sin el LIMIT), ya filtrada por el cursor y ordenada."""
+        if antes:
+            qs = self.queryset.filter(self._filtro(self.decodificar(antes), adelante=False))
+            return qs.order_by(*[campo if desc else f"-{campo}" for campo, desc in zip(self.campos, self.descendente)])
+        qs = self.queryset.order_by(*self.ordering)
+        if despues:
+            qs = qs.filter(self._filtro(self.decodificar(despues), adelante=True))
+        return qs
+
+    def page(self, despues=None, antes=None):
+        """Devuelve la página que sigue a `despues` o la que precede a `antes`."""
+        try:
+            # Pedimos una fila de más para saber si hay otra página sin contar
+            filas = list(self.consulta(despues, antes)[:self.per_page + 1])
+        except (ValidationError, TypeError) as e:
+            # Un cursor manipulado con valores que no encajan en el campo (ej. una fecha rota);
+            # la comparación de filas los convierte al compilar la consulta
+            raise CursorInvalido(str(e))
+        hay_mas = len(filas) > self.per_page
+        filas = filas[:self.per_page]
+
+        if antes:
+            filas.reverse()
+            siguiente = self.codificar(filas[-1]) if filas else None
+            anterior = self.codificar(filas[0]) if filas and hay_mas else None
+        else:
+            siguiente = self.codificar(filas[-1]) if filas and hay_mas else None
+            anterior = self.codificar(filas[0]) if filas and despues else None
+
+        return PaginaKeyset(filas, self, cursor_siguiente=siguiente, cursor_anterior=anterior)
@@ -0,0 +1,138 @@
+"""
+Procesamiento de portadas fuera del ciclo petición-respuesta.
+
+Cada imagen original se guarda como varias renditions fijas (JPEG + WebP) con
+nombre derivado del sha256 del contenido: portadas/<hash>_<rendicion>.<ext>.
+Dos libros con la misma portada comparten los mismos archivos.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import cache_paginas
+from .models import Libro
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO = 'portadas'
+
+# Tamaños máximos (ancho, alto). La miniatura es el doble de lo que ocupa en el
+# listado (70x105) para pantallas de alta densidad.
+RENDICIONES = {
+    'miniatura': (140, 210),
+    'tarjeta': (300, 450),
+    'detalle': (600, 900),
+}
+
+FORMATOS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def nombre_archivo(hash_contenido, rendicion, formato):
+    return f"{DIRECTORIO}/{hash_contenido}_{rendicion}.{formato}"
+
+
+def urls(hash_contenido):
+    """{rendicion: {formato: url}} para un hash ya procesado."""
+    return {
+        rendicion: {formato: default_storage.url(nombre_archivo(hash_contenido, rendicion, formato)) for formato in FORMATOS}
+        for rendicion in RENDICIONES
+    }
+
+
+def procesar_imagen(contenido):
+    """Genera las renditions que falten y devuelve el hash del contenido original."""
+    hash_contenido = hashlib.sha256(contenido).hexdigest()
+    pendientes = [
+        (rendicion, formato)
+        for rendicion in RENDICIONES
+        for formato in FORMATOS
+        if not default_storage.exists(nombre_archivo(hash_contenido, rendicion, formato))
+    ]
+    if not pendientes:
+        return hash_contenido  # Portada repetida: ya la tenemos
+
+    original = Image.open(BytesIO(contenido))
+    if original.mode != 'RGB':
+        original = original.convert('RGB')
+
+    for rendicion, formato in pendientes:
+        img = original.copy()
+        img.thumbnail(RENDICIONES[rendicion], Image.LANCZOS)
+        formato_pil, opciones = FORMATOS[formato]
+        buffer = BytesIO()
+        img.save(buffer, format=formato_pil, **opciones)
+        nombre = nombre_archivo(hash_contenido, rendicion, formato)
+        if not default_storage.exists(nombre):  # otro hilo pudo adelantarse
+            default_storage.save(nombre, ContentFile(buffer.getvalue()))
+    return hash_contenido
+
+
+def asignar_portada(libro_id, contenido):
+    hash_contenido = procesar_imagen(contenido)
+    # update() para no pisar cambios de stock hechos mientras procesábamos
+    Libro.objects.filter(pk=libro_id).update(
+        portada_hash=hash_contenido,
+        portada=nombre_archivo(hash_contenido, 'detalle', 'jpg'),
+        actualizado=timezone.now(),
+    )
+    cache_paginas.invalidar('libros', f'libro:{libro_id}')
+    return hash_contenido
+
+
+def procesar_desde_url(libro_id, url):
+    from .openlibrary import obtener_cliente
+    contenido = obtener_cliente().descargar(url)
+    if contenido:
+        return asignar_portada(libro_id, contenido)
+    return None
+
+
+def _trabajo(libro_id, url=None, contenido=None):
+    try:
+        if contenido is not None:
+            asignar_portada(libro_id, contenido)
+        elif url:
+            procesar_desde_url(libro_id, url)
+    except Exception:
+        logger.exception("No se pudo procesar la portada del libro %s", libro_id)
+    finally:
+        close_old_connections()
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    if _ejecutor is None:
+        # Dos hilos encolando a la vez crearían dos pools y uno se quedaría sin cerrar
+        with _ejecutor_lock:
+            if _ejecutor is None:
+                _ejecutor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PORTADAS_WORKERS', 2),
+                    thread_name_prefix='portadas',
+                )
+    return _ejecutor
+
+
+def encolar(libro_id, url=None, contenido=None):
+    """
+    Programa el procesamiento de la portada cuando la transacción actual se confirme.
+    Con PORTADAS_ASINCRONO = False se procesa en línea (útil en pruebas y scripts).
+    """
+    if not getattr(settings, 'PORTADAS_ASINCRONO', True):
+        transaction.on_commit(lambda: _trabajo(libro_id, url=url, contenido=contenido))
+        return
+    transaction.on_commit(lambda: _obtener_ejecutor().submit(_trabajo, libro_id, url, contenido))
@@ -0,0 +1,166 @@
+"""
+Pruebas de rendimiento de extremo a extremo (comando benchmark_biblioteca).
+
+Cada escenario es una petición real contra las vistas o la API, hecha con el
+cliente de pruebas de Django sobre una base con datos sintéticos
+(datos_sinteticos.py). De cada uno se guardan los percentiles de latencia y el
+número de consultas SQL, y se comparan con una línea base guardada: una
+regresión es un p95 que crece más allá del umbral o cualquier consulta de más.
+
+Antes de cada petición se vacía la caché de páginas: se mide el coste de
+generar la respuesta, no el de leerla de memoria.
+"""
+import math
+import platform
+import time
+
+from django.core.cache import caches
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache_paginas
+from .models import Libro, Prestamos
+from .paginacion import KeysetPaginator
+from .views import LibroListView
+
+# Una petición que tarde menos que esto no se da por regresión aunque se duplique
+MARGEN_MS = 5.0
+UMBRAL = 1.5
+
+
+def percentil(valores, p):
+    """Percentil por el método del rango más cercano (valores ya ordenados)."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+class Escenario:
+    """
+    `preparar()` se llama antes de cada repetición, fuera del tiempo medido, y
+    devuelve (metodo, url, datos): así las acciones que cambian datos (prestar,
+    devolver) tienen siempre un objetivo válido.
+    """
+
+    def __init__(self, nombre, preparar, estado=200):
+        self.nombre = nombre
+        self.preparar = preparar
+        self.estado = estado
+
+
+def _pagina_profunda():
+    """Cursor del listado de libros a mitad del catálogo, como quien lleva rato paginando."""
+    libros = Libro.objects.order_by(*LibroListView.ordering).only(*LibroListView.ordering)
+    total = libros.count()
+    if not total:
+        return reverse('libro_list')
+    paginador = KeysetPaginator(libros, LibroListView.paginate_by, ordering=LibroListView.ordering)
+    return f"{reverse('libro_list')}?despues={paginador.codificar(libros[total // 2])}"
+
+
+def escenarios(socio_id):
+    """
+    Los escenarios estándar. `socio_id` es el usuario a quien se prestan los
+    libros en crear_prestamo: no debe tener multas que lo bloqueen.
+    """
+    profunda = _pagina_profunda()
+    # La API busca por ISBN (si no está en el catálogo iría a Open Library)
+    isbn_medio = (Libro.objects.filter(isbn__isnull=False).order_by('id').values_list('isbn', flat=True)
+                  [max(Libro.objects.count() // 2 - 1, 0)])
+    mas_prestado = (Prestamos.objects.values('libro_id').annotate(n=Count('id'))
+                    .order_by('-n').values_list('libro_id', flat=True).first())
+
+    def prestar():
+        libro_id = (Libro.objects.filter(ejemplares_disponibles__gt=0).order_by('-ejemplares_disponibles', 'id')
+                    .values_list('id', flat=True).first())
+        return 'post', reverse('crear_prestamo'), {
+            'libro': libro_id, 'usuario': socio_id, 'fecha_prestamo': timezone.now().date().isoformat(),
+        }
+
+    def devolver():
+        prestamo_id = Prestamos.objects.filter(estado='p').order_by('-id').values_list('id', flat=True).first()
+        return 'post', reverse('devolver_libro', args=[prestamo_id]), {}
+
+    def get(url):
+        return lambda: ('get', url, {})
+
+    return [
+        Escenario('libro_list', get(reverse('libro_list'))),
+        Escenario('libro_list_profunda', get(profunda)),
+        Escenario('libro_detalle', get(reverse('libro_detalle', args=[mas_prestado]))),
+        Escenario('lista_prestamos', get(reverse('lista_prestamos'))),
+        Escenario('lista_prestamos_atrasados', get(f"{reverse('lista_prestamos')}?atrasados=1&orden=retraso")),
+        Escenario('lista_multas', get(reverse('lista_multas'))),
+        Escenario('api_libros_lista', get(reverse('libros-api-list'))),
+        Escenario('api_libros_detalle', get(reverse('libros-api-detail', args=[isbn_medio]))),
+        Escenario('crear_prestamo', prestar, estado=302),
+        Escenario('devolver_libro', devolver, estado=302),
+    ]
+
+
+def medir(client, escenarios, repeticiones=20, calentamiento=2):
+    """
+    Ejecuta cada escenario `calentamiento` + `repeticiones` veces y devuelve
+    {nombre: {p50_ms, p95_ms, p99_ms, max_ms, consultas}}; `consultas` es el
+    máximo de consultas SQL de una petición.
+    """
+    resultados = {}
+    for escenario in escenarios:
+        tiempos, consultas = [], 0
+        for i in range(calentamiento + repeticiones):
+            metodo, url, datos = escenario.preparar()
+            caches[cache_paginas.ALIAS].clear()
+            # Con DEBUG el registro de consultas está lleno tras la carga y CaptureQueriesContext contaría 0
+            reset_queries()
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = getattr(client, metodo)(url, datos)
+                duracion = time.perf_counter() - inicio
+            if respuesta.status_code != escenario.estado:
+                raise AssertionError(f"{escenario.nombre}: {metodo.upper()} {url} devolvió "
+                                     f"{respuesta.status_code}, se esperaba {escenario.estado}")
+            if i >= calentamiento:
+                tiempos.append(duracion * 1000)
+                consultas = max(consultas, len(capturadas))
+        tiempos.sort()
+        resultados[escenario.nombre] = {
+            'p50_ms': round(percentil(tiempos, 50), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'p99_ms': round(percentil(tiempos, 99), 3),
+            'max_ms': round(tiempos[-1], 3) if tiempos else 0.0,
+            'consultas': consultas,
+        }
+    return resultados
+
+
+def comparar(resultados, base, umbral=UMBRAL, margen_ms=MARGEN_MS):
+    """
+    Lista de regresiones respecto a la línea base `base` (mismo formato que
+    medir()). Los escenarios que no están en la base no se comparan.
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            continue
+        limite = anterior['p95_ms'] * umbral + margen_ms
+        if actual['p95_ms'] > limite:
+            regresiones.append(f"{nombre}: p95 {actual['p95_ms']:.1f} ms > {limite:.1f} ms "
+                               f"(base {anterior['p95_ms']:.1f} ms)")
+        if actual['consultas'] > anterior['consultas']:
+            regresiones.append(f"{nombre}: {actual['consultas']} consultas (base {anterior['consultas']})")
+    return regresiones
+
+
+def entorno():
+    """Con qué se midió: una base de otra máquina solo sirve como referencia."""
+    return {
+        'python': platform.python_version(),
+        'sqlite': connection.Database.sqlite_version if connection.vendor == 'sqlite' else None,
+        'maquina': platform.machine(),
+        'fecha': timezone.now().isoformat(timespec='seconds'),
+    }
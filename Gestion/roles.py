@@ -0,0 +1,68 @@
+"""
+Resolución de roles (grupos) del usuario.
+
+Los grupos se leen una sola vez por petición y quedan memorizados en el propio
+objeto usuario. Opcionalmente (ROLES_CACHE_TIMEOUT) también se guardan en la
+caché de Django entre peticiones; Gestion.signals invalida esa entrada cuando
+cambian los grupos del usuario.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+ADMINISTRADOR = 'Administrador'
+BIBLIOTECARIO = 'Bibliotecario'
+BODEGA = 'Bodega'
+CLIENTE = 'Cliente'
+
+_ATRIBUTO = '_roles_cache'
+
+
+def _clave(user_id):
+    return f'roles:usuario:{user_id}'
+
+
+def roles_de(user):
+    """frozenset con los nombres de los grupos del usuario (vacío si es anónimo)."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, _ATRIBUTO, None)
+    if roles is not None:
+        return roles
+
+    timeout = getattr(settings, 'ROLES_CACHE_TIMEOUT', None)
+    if timeout:
+        roles = cache.get(_clave(user.pk))
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        if timeout:
+            cache.set(_clave(user.pk), roles, timeout)
+    setattr(user, _ATRIBUTO, roles)
+    return roles
+
+
+def tiene_rol(user, *nombres):
+    """True si es superusuario o pertenece a alguno de los grupos indicados."""
+    if user is None or not user.is_authenticated:
+        return False
+    return user.is_superuser or bool(roles_de(user).intersection(nombres))
+
+
+def invalidar(*user_ids):
+    cache.delete_many([_clave(pk) for pk in user_ids])
+
+
+class RolesMiddleware:
+    """Deja request.roles disponible (perezoso) para vistas y plantillas."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.roles = SimpleLazyObject(lambda: roles_de(request.user))
+        return self.get_response(request)
@@ -0,0 +1,88 @@
+"""
+Cuenta corriente de multas por socio.
+
+Cada cambio en lo que debe un socio se apunta en MovimientoMulta (solo se
+añaden filas) y se acumula en SaldoUsuario, de modo que consultar la deuda en
+el mostrador es leer una fila. Lo que debe una multa es su monto si no está
+pagada y 0 si lo está; los movimientos son las diferencias de ese valor:
+cargo al crearla, pago al cobrarla y ajuste en cualquier otro cambio.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import Multa, MovimientoMulta, SaldoUsuario
+
+CERO = Decimal('0.00')
+
+
+def saldo(usuario_id):
+    return SaldoUsuario.objects.filter(usuario_id=usuario_id).values_list('saldo', flat=True).first() or CERO
+
+
+def puede_pedir_prestamo(usuario_id):
+    """False si la deuda supera settings.LIMITE_DEUDA_PRESTAMOS (None desactiva el bloqueo)."""
+    limite = getattr(settings, 'LIMITE_DEUDA_PRESTAMOS', None)
+    return limite is None or saldo(usuario_id) <= Decimal(limite)
+
+
+def deuda_de(multa_o_valores):
+    pagada, monto = multa_o_valores['pagada'], multa_o_valores['monto']
+    return CERO if pagada else Decimal(monto or 0)
+
+
+def aplicar(movimientos):
+    """
+    Apunta [(usuario_id, multa_id, tipo, monto), ...] y actualiza los saldos con
+    tres consultas en total, sin importar cuántos movimientos sean.
+    """
+    movimientos = [m for m in movimientos if m[3]]
+    if not movimientos:
+        return
+    usuarios = {m[0] for m in movimientos}
+    with transaction.atomic():
+        # Bloqueamos las filas de saldo mientras calculamos (en SQLite ya tenemos el
+        # cerrojo de escritura desde la primera escritura de la transacción)
+        saldos = dict(SaldoUsuario.objects.select_for_update()
+                      .filter(usuario_id__in=usuarios).values_list('usuario_id', 'saldo'))
+        filas = []
+        for usuario_id, multa_id, tipo, monto in movimientos:
+            saldos[usuario_id] = saldos.get(usuario_id, CERO) + Decimal(monto)
+            filas.append(MovimientoMulta(usuario_id=usuario_id, multa_id=multa_id, tipo=tipo,
+                                         monto=monto, saldo_resultante=saldos[usuario_id]))
+        SaldoUsuario.objects.bulk_create(
+            [SaldoUsuario(usuario_id=u, saldo=saldos[u]) for u in usuarios],
+            update_conflicts=True, unique_fields=['usuario'], update_fields=['saldo', 'actualizado'],
+        )
+        MovimientoMulta.objects.bulk_create(filas)
+
+
+def registrar_cambio(multa, antes=None):
+    """Apunta la diferencia de deuda de una multa (antes = {'monto', 'pagada'} o None si es nueva)."""
+    diferencia = deuda_de({'monto': multa.monto, 'pagada': multa.pagada}) - (deuda_de(antes) if antes else CERO)
+    if antes is None:
+        tipo = 'cargo'
+    elif multa.pagada and not antes['pagada']:
+        tipo = 'pago'
+    else:
+        tipo = 'ajuste'
+    aplicar([(multa.prestamo.usuario_id, multa.pk, tipo, diferencia)])
+
+
+def reconstruir():
+    """
+    Compara cada saldo con lo que deben de verdad sus multas sin pagar y apunta un
+    ajuste donde no cuadre (el libro mayor no se reescribe). Devuelve los ajustes hechos.
+    """
+    reales = dict(Multa.objects.filter(pagada=False).values('prestamo__usuario_id')
+                  .annotate(total=Sum('monto')).values_list('prestamo__usuario_id', 'total'))
+    guardados = dict(SaldoUsuario.objects.values_list('usuario_id', 'saldo'))
+    ajustes = [
+        (usuario_id, None, 'ajuste', reales.get(usuario_id, CERO) - guardados.get(usuario_id, CERO))
+        for usuario_id in set(reales) | set(guardados)
+        if reales.get(usuario_id, CERO) != guardados.get(usuario_id, CERO)
+    ]
+    aplicar(ajustes)
+    return len(ajustes)
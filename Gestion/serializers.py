@@ -1,19 +1,56 @@
 from rest_framework import serializers
-from .models import Libro, Autor
+from .models import Libro, Autor, Prestamos
 import re
 
-class AutorSerializer(serializers.ModelSerializer):
+def limpiar_isbn(value):
+    """Quita guiones y espacios y comprueba el formato (sin consultar la BD)."""
+    clean_value = re.sub(r'[-\s]', '', value)
+    if len(clean_value) not in [10, 13]:
+        raise serializers.ValidationError("El ISBN debe tener 10 o 13 dígitos.")
+    if not clean_value.isdigit():
+        raise serializers.ValidationError("El ISBN debe contener únicamente números.")
+    return clean_value
+
+
+class CamposDinamicosMixin:
+    """
+    Recorta los campos según el contexto que prepara la vista (ver
+    api_views.CamposSolicitadosMixin): context['campos'] es el ?fields= pedido
+    (None = todos) y context['expandir'] los anidados pedidos con ?expand=.
+    Sin ?fields= salen todos, anidados incluidos; con ?fields= los de
+    `expandibles` solo salen si se nombran ahí o en ?expand=.
+    """
+    expandibles = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = self.context.get('campos')
+        expandir = self.context.get('expandir')
+        if campos is None and expandir is None:
+            return  # uso interno o anidado: todos los campos, como siempre
+        for nombre in list(self.fields):
+            if campos is None:
+                visible = True
+            elif nombre in self.expandibles:
+                visible = nombre in campos or nombre in (expandir or ())
+            else:
+                visible = campos is None or nombre in campos
+            if not visible:
+                self.fields.pop(nombre)
+
+
+class AutorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Autor
-        fields = '__all__'
+        exclude = ['clave', 'actualizado']
 
     def validate(self, data):
         # Normalizamos a mayúsculas/minúsculas para evitar "Cervantes" vs "cervantes"
         nombre = data.get('nombre', self.instance.nombre if self.instance else '').strip()
         apellido = data.get('apellido', self.instance.apellido if self.instance else '').strip()
 
-        # Buscamos si existe otro autor con ese nombre (excluyendo al actual)
-        qs = Autor.objects.filter(nombre__iexact=nombre, apellido__iexact=apellido)
+        # Buscamos si existe otro autor con ese nombre (excluyendo al actual); es una consulta al índice de `clave`
+        qs = Autor.objects.por_nombre(nombre, apellido)
         
         if self.instance:
             qs = qs.exclude(pk=self.instance.pk)
@@ -27,8 +64,9 @@ class AutorSerializer(serializers.ModelSerializer):
         data['apellido'] = apellido
         return data
 
-class LibroSerializer(serializers.ModelSerializer):
+class LibroSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     autor_detalle = AutorSerializer(source='autor', read_only=True)
+    expandibles = ('autor_detalle',)
     
     class Meta:
         model = Libro
@@ -43,11 +81,7 @@ class LibroSerializer(serializers.ModelSerializer):
 
     def validate_isbn(self, value):
         if value:
-            clean_value = re.sub(r'[-\s]', '', value)
-            if len(clean_value) not in [10, 13]:
-                raise serializers.ValidationError("El ISBN debe tener 10 o 13 dígitos.")
-            if not clean_value.isdigit():
-                raise serializers.ValidationError("El ISBN debe contener únicamente números.")
+            clean_value = limpiar_isbn(value)
             
             # Validar unicidad manualmente (excepto para el mismo libro que estamos editando)
             instance = getattr(self, 'instance', None)
@@ -55,4 +89,34 @@ class LibroSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Este ISBN ya está registrado en otro libro.")
                 
             return clean_value
-        return value
\ No newline at end of file
+        return value
+
+class LibroLoteSerializer(serializers.Serializer):
+    """
+    Una fila de POST libros-api/bulk/. Solo valida el formato: la unicidad del
+    ISBN y la existencia del autor se comprueban para todo el lote a la vez en
+    inventario.aplicar_lote(). Si el ISBN ya existe, `cantidad` es lo que se suma
+    (o resta) a sus ejemplares; si no, los ejemplares con los que se crea.
+    """
+    isbn = serializers.CharField(max_length=17)
+    titulo = serializers.CharField(max_length=200, required=False)
+    descripcion = serializers.CharField(required=False, allow_blank=True)
+    autor = serializers.IntegerField(min_value=1, required=False)
+    cantidad = serializers.IntegerField(default=1)
+
+    def validate_isbn(self, value):
+        return limpiar_isbn(value)
+
+class PrestamoSerializer(serializers.ModelSerializer):
+    libro_titulo = serializers.CharField(source='libro.titulo', read_only=True)
+    usuario = serializers.CharField(source='usuario.username', read_only=True)
+    # Vienen anotados por PrestamosQuerySet.with_multa()
+    retraso = serializers.IntegerField(read_only=True)
+    multa_acumulada = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Prestamos
+        fields = [
+            'id', 'libro', 'libro_titulo', 'usuario', 'fecha_prestamo', 'fecha_max',
+            'fecha_devolucion', 'estado', 'multa_fija', 'retraso', 'multa_acumulada'
+        ]
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache_paginas, estadisticas, roles, saldos
+from .models import Autor, Libro, Multa, Prestamos
+
+
+# --- Roles: invalidar la caché entre peticiones cuando cambian los grupos ---
+@receiver(m2m_changed, sender=User.groups.through)
+def grupos_de_usuario_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        # user.groups.add(...): instance es el usuario
+        roles.invalidar(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): después ya no sabríamos qué usuarios eran
+        roles.invalidar(*instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        roles.invalidar(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def grupo_cambiado(sender, instance, **kwargs):
+    # Renombrar o borrar un grupo cambia los roles de todos sus miembros
+    if instance.pk:
+        roles.invalidar(*instance.user_set.values_list('pk', flat=True))
+
+
+# --- Estadísticas: recalcular los cubos que toca cada préstamo o multa ---
+@receiver(pre_save, sender=Prestamos)
+@receiver(pre_save, sender=Multa)
+def recordar_valores_anteriores(sender, instance, **kwargs):
+    # Si cambia la fecha (o el libro) hay que recalcular también el cubo de antes
+    instance._antes = None
+    if instance.pk:
+        campos = ('libro_id', 'fecha_prestamo', 'fecha_devolucion') if sender is Prestamos else ('fecha', 'monto', 'pagada')
+        instance._antes = sender.objects.filter(pk=instance.pk).values(*campos).first()
+
+
+@receiver(post_save, sender=Prestamos)
+@receiver(post_delete, sender=Prestamos)
+def prestamo_cambiado(sender, instance, **kwargs):
+    estadisticas.recalcular_libro(instance.libro_id, instance.fecha_prestamo, instance.fecha_devolucion)
+    antes = getattr(instance, '_antes', None)
+    if antes:
+        estadisticas.recalcular_libro(antes['libro_id'], antes['fecha_prestamo'], antes['fecha_devolucion'])
+
+
+@receiver(post_save, sender=Multa)
+@receiver(post_delete, sender=Multa)
+def multa_cambiada(sender, instance, **kwargs):
+    antes = getattr(instance, '_antes', None)
+    estadisticas.recalcular_multas(instance.fecha, antes['fecha'] if antes else None)
+
+
+# --- Saldos: cada cambio de lo que debe una multa se apunta en el libro mayor ---
+@receiver(post_save, sender=Multa)
+def multa_guardada_saldo(sender, instance, created, **kwargs):
+    saldos.registrar_cambio(instance, None if created else getattr(instance, '_antes', None))
+
+
+@receiver(post_delete, sender=Multa)
+def multa_borrada_saldo(sender, instance, **kwargs):
+    saldos.aplicar([(instance.prestamo.usuario_id, None, 'ajuste', -saldos.deuda_de(vars(instance)))])
+
+
+# --- Caché de páginas del catálogo (Gestion/cache_paginas.py) ---
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+def libro_cambiado_paginas(sender, instance, **kwargs):
+    cache_paginas.invalidar('libros', f'libro:{instance.pk}')
+
+
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+def autor_cambiado_paginas(sender, instance, **kwargs):
+    # El nombre del autor sale en el listado y en el detalle de sus libros
+    cache_paginas.invalidar('autores')
+
+
+@receiver(post_save, sender=Prestamos)
+@receiver(post_delete, sender=Prestamos)
+def prestamo_cambiado_paginas(sender, instance, **kwargs):
+    cache_paginas.invalidar('libros', f'libro:{instance.libro_id}')
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permisos_de_grupo_cambiados(sender, **kwargs):
+    cache_paginas.invalidar('permisos')
@@ -0,0 +1,68 @@
+"""
+Movimientos de stock de los libros.
+
+Cada operación es un único UPDATE condicional (WHERE ejemplares_disponibles > 0,
+etc.) que también recalcula `disponible`, así dos bibliotecarios atendiendo a la
+vez no pueden pisarse el contador ni prestar el último ejemplar dos veces.
+Devuelven True si el cambio se aplicó y False si la condición no se cumplía.
+update() no toca los auto_now ni manda señales, así que `actualizado` (ETag de
+la API) y la invalidación de cache_paginas van a mano.
+
+OJO: dentro de un UPDATE todas las expresiones ven los valores *anteriores* de
+la fila, por eso `disponible` se calcula a partir del stock de antes.
+"""
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from . import cache_paginas
+from .models import Libro
+
+
+def _aplicado(libro_id, filas):
+    if filas:
+        cache_paginas.invalidar('libros', f'libro:{libro_id}')
+    return filas == 1
+
+
+def prestar(libro_id):
+    """Resta un ejemplar si queda alguno."""
+    return _aplicado(libro_id, Libro.objects.filter(pk=libro_id, ejemplares_disponibles__gt=0).update(
+        ejemplares_disponibles=F('ejemplares_disponibles') - 1,
+        disponible=Case(When(ejemplares_disponibles__gt=1, then=Value(True)), default=Value(False)),
+        actualizado=timezone.now(),
+    ))
+
+
+def devolver(libro_id):
+    """Suma un ejemplar sin pasar de cantidad_total."""
+    return _aplicado(libro_id, Libro.objects.filter(pk=libro_id, ejemplares_disponibles__lt=F('cantidad_total')).update(
+        ejemplares_disponibles=F('ejemplares_disponibles') + 1,
+        disponible=Value(True),
+        actualizado=timezone.now(),
+    ))
+
+
+def dar_de_baja(libro_id):
+    """
+    Un ejemplar perdido sale del inventario. Si por algún desajuste había más
+    disponibles que el nuevo total, se recortan (lo que hacía Libro.save()).
+    """
+    return _aplicado(libro_id, Libro.objects.filter(pk=libro_id, cantidad_total__gt=0).update(
+        cantidad_total=F('cantidad_total') - 1,
+        ejemplares_disponibles=Greatest(Least(F('ejemplares_disponibles'), F('cantidad_total') - 1), Value(0)),
+        disponible=Case(
+            When(ejemplares_disponibles__gt=0, cantidad_total__gt=1, then=Value(True)),
+            default=Value(False),
+        ),
+        actualizado=timezone.now(),
+    ))
+
+
+def recortar(libro_id):
+    """Tras editar cantidad_total: nunca más disponibles que el total."""
+    return _aplicado(libro_id, Libro.objects.filter(pk=libro_id, ejemplares_disponibles__gt=F('cantidad_total')).update(
+        ejemplares_disponibles=F('cantidad_total'),
+        disponible=Case(When(cantidad_total__gt=0, then=Value(True)), default=Value(False)),
+        actualizado=timezone.now(),
+    ))
@@ -0,0 +1,38 @@
+"""
+Presupuestos de consultas para los tests de vistas.
+
+    class MiTest(PresupuestoConsultasMixin, TestCase):
+        def test_lista(self):
+            with self.assertPresupuestoConsultas(5):
+                self.client.get(reverse('lista_prestamos'))
+
+A diferencia de assertNumQueries, el número es un máximo (bajar de consultas
+no rompe el test) y el mensaje de error agrupa las consultas por huella, así
+un N+1 se ve de un vistazo.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from Gestion.instrumentacion import huella
+
+
+class _Presupuesto(CaptureQueriesContext):
+    def __init__(self, test_case, maximo, connection):
+        self.test_case = test_case
+        self.maximo = maximo
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None or len(self) <= self.maximo:
+            return
+        veces = {}
+        for consulta in self.captured_queries:
+            clave = huella(consulta['sql'])
+            veces[clave] = veces.get(clave, 0) + 1
+        detalle = '\n'.join(f'  {n} x {sql}' for sql, n in sorted(veces.items(), key=lambda par: -par[1]))
+        self.test_case.fail(f'{len(self)} consultas, el presupuesto es {self.maximo}:\n{detalle}')
+
+
+class PresupuestoConsultasMixin:
+    def assertPresupuestoConsultas(self, maximo, using=DEFAULT_DB_ALIAS):
+        return _Presupuesto(self, maximo, connections[using])
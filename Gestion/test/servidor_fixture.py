@@ -0,0 +1,97 @@
+"""Servidor HTTP local que imita las rutas de Open Library que usamos, para las pruebas."""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class ServidorOpenLibrary:
+    def __init__(self, libros=None, autores=None):
+        self.libros = libros or {}    # {isbn: datos jscmd=data}
+        self.autores = autores or {}  # {ol_id: datos del autor}
+        self.pedidas = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        fixture = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fixture._lock:
+                    fixture.pedidas.append(self.path)
+                cuerpo = fixture.responder(urlparse(self.path))
+                if cuerpo is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                datos = json.dumps(cuerpo).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}'
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def responder(self, url):
+        if url.path == '/api/books':
+            clave = parse_qs(url.query).get('bibkeys', [''])[0]
+            isbn = clave.replace('ISBN:', '')
+            return {clave: self.libros[isbn]} if isbn in self.libros else {}
+        if url.path.startswith('/authors/'):
+            return self.autores.get(url.path.split('/')[2].replace('.json', ''))
+        return None
+
+
+class ServidorOpenLibraryAsincrono(ServidorOpenLibrary):
+    """
+    La misma Open Library falsa sobre asyncio (async with), para las vistas
+    asíncronas. Cada respuesta tarda `retraso` segundos sin frenar a las demás;
+    max_simultaneas dice cuántas peticiones llegó a atender a la vez.
+    """
+
+    def __init__(self, libros=None, autores=None, retraso=0):
+        super().__init__(libros, autores)
+        self.retraso = retraso
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+
+    async def __aenter__(self):
+        self.servidor = await asyncio.start_server(self.atender, '127.0.0.1', 0)
+        self.url = f'http://127.0.0.1:{self.servidor.sockets[0].getsockname()[1]}'
+        return self
+
+    async def __aexit__(self, *exc):
+        self.servidor.close()
+        await self.servidor.wait_closed()
+
+    async def atender(self, lector, escritor):
+        linea = await lector.readline()
+        while await lector.readline() not in (b'\r\n', b'\n', b''):
+            pass  # cabeceras: los GET no traen cuerpo
+        ruta = linea.split()[1].decode()
+        self.pedidas.append(ruta)
+        self.simultaneas += 1
+        self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        try:
+            await asyncio.sleep(self.retraso)
+        finally:
+            self.simultaneas -= 1
+
+        cuerpo = self.responder(urlparse(ruta))
+        estado, datos = ('404 Not Found', b'') if cuerpo is None else ('200 OK', json.dumps(cuerpo).encode())
+        escritor.write(f'HTTP/1.1 {estado}\r\nContent-Type: application/json\r\n'
+                       f'Content-Length: {len(datos)}\r\nConnection: close\r\n\r\n'.encode() + datos)
+        await escritor.drain()
+        escritor.close()
@@ -0,0 +1,239 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from Gestion import busqueda, stock
+from Gestion.models import Autor, Libro
+from Gestion.roles import BIBLIOTECARIO, BODEGA
+
+
+class ApiCamposPaginacionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='movil', password='password123')
+        autores = [Autor.objects.create(nombre=f"Autor {i}", apellido=f"Apellido {i}", bibliografia="x" * 500)
+                   for i in range(4)]
+        for i in range(12):
+            Libro.objects.create(titulo=f"Libro {i:02d}", isbn=f"{9782000000000 + i}", autor=autores[i % 4],
+                                 descripcion="Una descripción muy larga. " * 40)
+
+    def setUp(self):
+        self.client.login(username='movil', password='password123')
+
+    def recorrer(self, params):
+        resultados, url, consultas = [], reverse('libros-api-list'), []
+        while url:
+            with CaptureQueriesContext(connection) as capturadas:
+                datos = self.client.get(url, params).json()
+            consultas.append(capturadas)
+            resultados += datos['results']
+            url, params = datos['next'], None  # el cursor ya lleva los parámetros
+        return resultados, consultas
+
+    def test_paginacion_por_cursor(self):
+        libros, consultas = self.recorrer({'page_size': 5})
+        self.assertEqual([l['titulo'] for l in libros], [f"Libro {i:02d}" for i in range(12)])
+        self.assertEqual(len(consultas), 3)
+        # El único COUNT es el de la versión para el ETag (va junto al MAX), no el de la paginación
+        sql = [q['sql'] for c in consultas for q in c.captured_queries]
+        self.assertFalse(any('COUNT(' in q and 'MAX(' not in q for q in sql))
+
+    def test_listado_completo_por_defecto(self):
+        def consultas_con(page_size):
+            with CaptureQueriesContext(connection) as capturadas:
+                libro = self.client.get(reverse('libros-api-list'), {'page_size': page_size}).json()['results'][0]
+            self.assertEqual(libro['autor_detalle']['apellido'], 'Apellido 0')
+            self.assertIn('descripcion', libro)
+            return len(capturadas)
+        # El autor llega con un JOIN, no con una consulta por libro
+        self.assertEqual(consultas_con(2), consultas_con(12))
+        libro = self.client.get(reverse('libros-api-list'), {'fields': 'id,titulo'}).json()['results'][0]
+        self.assertNotIn('autor_detalle', libro)
+
+    def test_fields_recorta_respuesta_y_consulta(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            datos = self.client.get(reverse('libros-api-list'), {'fields': 'id,titulo,autor'}).json()
+        self.assertEqual(set(datos['results'][0]), {'id', 'titulo', 'autor'})
+        sql = [q['sql'] for q in capturadas.captured_queries if 'gestion_libro' in q['sql'].lower()][0]
+        self.assertNotIn('descripcion', sql)
+        self.assertNotIn('Gestion_autor', sql)
+
+    def test_expand_sin_n_mas_1(self):
+        def consultas_con(page_size):
+            with CaptureQueriesContext(connection) as capturadas:
+                datos = self.client.get(reverse('libros-api-list'), {
+                    'fields': 'titulo', 'expand': 'autor_detalle', 'page_size': page_size,
+                }).json()
+            self.assertEqual(set(datos['results'][0]), {'titulo', 'autor_detalle'})
+            self.assertEqual(datos['results'][0]['autor_detalle']['apellido'], 'Apellido 0')
+            return len(capturadas)
+        self.assertEqual(consultas_con(2), consultas_con(12))
+
+    def test_detalle_sigue_trayendo_el_autor(self):
+        datos = self.client.get(reverse('libros-api-detail', args=['9782000000003'])).json()
+        self.assertEqual(datos['autor_detalle']['nombre'], 'Autor 3')
+        datos = self.client.get(reverse('libros-api-detail', args=['9782000000003']), {'fields': 'isbn'}).json()
+        self.assertEqual(datos, {'isbn': '9782000000003'})
+
+    def test_autores_sin_bibliografia(self):
+        datos = self.client.get(reverse('autores-api-list'), {'fields': 'id,apellido', 'page_size': 2}).json()
+        self.assertEqual([a['apellido'] for a in datos['results']], ['Apellido 0', 'Apellido 1'])
+        self.assertIsNotNone(datos['next'])
+
+    def test_escritura_con_fields_no_pierde_datos(self):
+        resp = self.client.patch(reverse('libros-api-detail', args=['9782000000000']) + '?fields=titulo',
+                                 {'titulo': 'Nuevo título'}, content_type='application/json')
+        self.assertEqual(resp.json(), {'titulo': 'Nuevo título'})
+        libro = Libro.objects.get(isbn='9782000000000')
+        self.assertTrue(libro.descripcion.startswith('Una descripción'))
+
+
+class ApiCargaEnBloqueTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='bodega', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BODEGA))
+        User.objects.create_user(username='socio', password='password123')
+        biblio = User.objects.create_user(username='biblio', password='password123')
+        biblio.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.autor = Autor.objects.create(nombre="Juan", apellido="Rulfo")
+        cls.libro = Libro.objects.create(titulo="Pedro Páramo", isbn="9788437604183", autor=cls.autor, cantidad_total=2)
+
+    def setUp(self):
+        self.client.login(username='bodega', password='password123')
+
+    def cargar(self, filas):
+        return self.client.post(reverse('libros-api-bulk'), filas, content_type='application/json')
+
+    def nuevos(self, n, desde=0):
+        return [{'isbn': f"{9783000000000 + i}", 'titulo': f"Tomo {i}", 'autor': self.autor.pk, 'cantidad': 2}
+                for i in range(desde, desde + n)]
+
+    def test_pocas_consultas(self):
+        self.assertEqual(self.cargar(self.nuevos(5)).json()['creados'], 5)
+        with CaptureQueriesContext(connection) as consultas:
+            resp = self.cargar(self.nuevos(400, desde=5) + [{'isbn': f"{9783000000000 + i}", 'cantidad': 1} for i in range(5)])
+        self.assertEqual(resp.json(), {'creados': 400, 'actualizados': 5, 'errores': []})
+        # Sesión + IN de ISBNs + IN de autores + unos pocos INSERT por lotes + UPDATE: nada por fila
+        self.assertLess(len(consultas), 15)
+        self.assertEqual(Libro.objects.get(isbn='9783000000004').cantidad_total, 3)
+        self.assertEqual(busqueda.ids_libros('Tomo 399'), [Libro.objects.get(isbn='9783000000399').pk])
+
+    def test_ajustes_mantienen_disponibilidad(self):
+        self.cargar([{'isbn': '978-84-376-0418-3', 'cantidad': -2, 'titulo': 'Pedro Páramo (ed. crítica)'}])
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.cantidad_total, self.libro.ejemplares_disponibles, self.libro.disponible), (0, 0, False))
+        self.assertEqual(self.libro.titulo, 'Pedro Páramo (ed. crítica)')
+        self.cargar([{'isbn': '9788437604183', 'cantidad': 3}])
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.cantidad_total, self.libro.ejemplares_disponibles, self.libro.disponible), (3, 3, True))
+
+    def test_errores_por_fila(self):
+        resp = self.cargar([
+            {'isbn': '12', 'titulo': 'Corto'},
+            {'isbn': '9783000000001', 'titulo': 'Bien', 'autor': self.autor.pk},
+            {'isbn': '9783000000001', 'titulo': 'Repetido', 'autor': self.autor.pk},
+            {'isbn': '9783000000002', 'titulo': 'Sin autor', 'autor': 999},
+            {'isbn': '9783000000003'},
+            {'isbn': '9788437604183', 'cantidad': -5},
+            'no es un libro',
+        ])
+        datos = resp.json()
+        self.assertEqual((datos['creados'], datos['actualizados']), (1, 0))
+        self.assertEqual([e['indice'] for e in datos['errores']], [0, 2, 3, 4, 5, 6])
+        self.assertEqual(Libro.objects.get(isbn='9783000000001').titulo, 'Bien')
+        self.libro.refresh_from_db()
+        self.assertEqual(self.libro.cantidad_total, 2)
+
+    def test_solo_personal(self):
+        self.client.login(username='socio', password='password123')
+        self.assertEqual(self.cargar(self.nuevos(1)).status_code, 403)
+        # El inventario es de Bodega: Bibliotecario gestiona préstamos, no el stock
+        self.client.login(username='biblio', password='password123')
+        self.assertEqual(self.cargar(self.nuevos(1)).status_code, 403)
+        self.assertFalse(Libro.objects.filter(isbn='9783000000000').exists())
+        self.client.login(username='bodega', password='password123')
+        self.assertEqual(self.cargar({'isbn': '9783000000000'}).status_code, 400)
+
+
+class ApiGetCondicionalTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='sondeo', password='password123')
+        cls.bodega = User.objects.create_user(username='almacen', password='password123')
+        cls.bodega.groups.add(Group.objects.get_or_create(name=BODEGA)[0])
+        cls.autor = Autor.objects.create(nombre="Elena", apellido="Garro")
+        cls.libro = Libro.objects.create(titulo="Los recuerdos del porvenir", isbn="9786071600837", autor=cls.autor)
+        Libro.objects.create(titulo="La semana de colores", isbn="9786071600844", autor=cls.autor)
+
+    def setUp(self):
+        self.client.login(username='sondeo', password='password123')
+        self.listado = reverse('libros-api-list')
+        self.detalle = reverse('libros-api-detail', args=[self.libro.isbn])
+
+    def etag(self, url, **params):
+        resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp['ETag']
+
+    def test_listado_sin_cambios_responde_304(self):
+        resp = self.client.get(self.listado)
+        with CaptureQueriesContext(connection) as capturadas:
+            no_modificado = self.client.get(self.listado, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual(no_modificado.content, b'')
+        self.assertEqual(no_modificado['ETag'], resp['ETag'])
+        # Ni un SELECT de las filas del listado: solo los agregados de versión
+        self.assertFalse(any('"titulo"' in q['sql'] for q in capturadas.captured_queries))
+
+    def test_cambios_cambian_el_etag(self):
+        vistos = {self.etag(self.listado)}
+        stock.prestar(self.libro.pk)
+        vistos.add(self.etag(self.listado))
+        self.autor.apellido = "Garro Navarro"
+        self.autor.save()
+        vistos.add(self.etag(self.listado))
+        Libro.objects.filter(isbn="9786071600844").delete()
+        vistos.add(self.etag(self.listado))
+        vistos.add(self.etag(self.listado, fields='id,titulo'))
+        self.assertEqual(len(vistos), 5)
+
+    def test_listado_sin_last_modified(self):
+        # Un borrado no deja fecha: con If-Modified-Since el cliente se quedaría con el libro borrado
+        resp = self.client.get(self.listado)
+        self.assertNotIn('Last-Modified', resp)
+        Libro.objects.filter(isbn="9786071600844").delete()
+        despues = self.client.get(self.listado, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(despues.status_code, 200)
+        self.assertEqual(len(despues.json()['results']), 1)
+
+    def test_detalle_condicional(self):
+        resp = self.client.get(self.detalle)
+        self.assertEqual(self.client.get(self.detalle, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.detalle, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']).status_code, 304)
+        self.autor.bibliografia = "Premio Xavier Villaurrutia"
+        self.autor.save()
+        cambiado = self.client.get(self.detalle, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(cambiado.status_code, 200)
+        self.assertEqual(cambiado.json()['autor_detalle']['bibliografia'], "Premio Xavier Villaurrutia")
+
+    def test_edicion_desde_el_formulario(self):
+        resp = self.client.get(self.detalle)
+        editor = self.client_class()
+        editor.force_login(self.bodega)
+        editor.post(reverse('libro_editar', args=[self.libro.pk]), {
+            'titulo': "Los recuerdos del porvenir (2.ª ed.)", 'autor': self.autor.pk,
+            'descripcion': '', 'cantidad_total': 3,
+        })
+        cambiado = self.client.get(self.detalle, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(cambiado.status_code, 200)
+        self.assertEqual(cambiado.json()['titulo'], "Los recuerdos del porvenir (2.ª ed.)")
+
+    def test_autores(self):
+        url = reverse('autores-api-detail', args=[self.autor.pk])
+        resp = self.client.get(url)
+        self.assertNotIn('actualizado', resp.json())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag']).status_code, 304)
+        etag = self.etag(reverse('autores-api-list'))
+        self.assertEqual(self.client.get(reverse('autores-api-list'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from Gestion import openlibrary
+from Gestion.models import Autor, Libro, RespuestaOpenLibrary
+from Gestion.roles import BODEGA
+from Gestion.test.servidor_fixture import ServidorOpenLibraryAsincrono
+
+
+def libro_ol(titulo, autor, ol_id):
+    return {'title': titulo, 'notes': 'Nota.',
+            'authors': [{'name': autor, 'url': f'https://openlibrary.org/authors/{ol_id}/x'}]}
+
+
+LIBROS = {f'978000000010{i}': libro_ol(f'Obra {i}', f'Autora{i} Lenta', f'OL{i}A') for i in range(4)}
+AUTORES = {f'OL{i}A': {'bio': {'type': '/type/text', 'value': f'Bio {i}.'}} for i in range(4)}
+
+
+def servidor(retraso=0):
+    return ServidorOpenLibraryAsincrono(libros=LIBROS, autores=AUTORES, retraso=retraso)
+
+
+class ClienteAsincronoTest(TestCase):
+    async def test_libro_biografia_y_cache(self):
+        async with servidor() as ol:
+            cliente = openlibrary.ClienteAsincrono(URL_BASE=ol.url)
+            self.assertEqual((await cliente.libro('9780000000101'))['title'], 'Obra 1')
+            self.assertEqual((await cliente.libro('9780000000101'))['title'], 'Obra 1')
+            self.assertEqual(await cliente.biografia('OL1A'), 'Bio 1.')
+            self.assertIsNone(await cliente.libro('9789999999999'))
+        # La segunda consulta del libro salió de la caché en BD, que comparte con el cliente síncrono
+        self.assertEqual(len(ol.pedidas), 3)
+        self.assertEqual(cliente.estadisticas()['aciertos'], 1)
+        self.assertEqual(await RespuestaOpenLibrary.objects.acount(), 2)
+        # El ISBN desconocido va a la caché negativa y no vuelve a salir a la red
+        self.assertIsNone(await cliente.libro('9789999999999'))
+        self.assertEqual(len(ol.pedidas), 3)
+        self.assertEqual(cliente.estadisticas()['negativos'], 1)
+
+    async def test_transporte_segun_httpx(self):
+        cliente = openlibrary.ClienteAsincrono()
+        esperado = openlibrary.TransporteHttpx if openlibrary.httpx else openlibrary.TransporteEnHilo
+        self.assertIsInstance(cliente.transporte, esperado)
+        # Uno por bucle de eventos, reutilizado dentro del mismo
+        self.assertIs(openlibrary.obtener_cliente_asincrono(), openlibrary.obtener_cliente_asincrono())
+
+
+class LibroOpenLibraryApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='api_async', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+
+    async def pedir(self, isbn, **extra):
+        return await self.async_client.get(reverse('openlibrary-api', args=[isbn]), **extra)
+
+    async def test_importa_y_despues_sirve_del_catalogo(self):
+        await self.async_client.aforce_login(self.user)
+        async with servidor() as ol:
+            with override_settings(OPENLIBRARY={'URL_BASE': ol.url}):
+                resp = await self.pedir('9780000000102')
+                self.assertEqual(resp.status_code, 201)
+                self.assertEqual(resp.json()['autor_detalle']['bibliografia'], 'Bio 2.')
+                self.assertEqual((await self.pedir('9780000000102')).status_code, 200)
+                self.assertEqual((await self.pedir('9789999999999')).status_code, 404)
+        libro = await Libro.objects.select_related('autor').aget(isbn='9780000000102')
+        self.assertEqual((libro.titulo, libro.autor.apellido, libro.ejemplares_disponibles), ('Obra 2', 'Lenta', 1))
+
+    async def test_autor_conocido_no_pide_biografia(self):
+        await Autor.objects.acreate(nombre='autora3', apellido='LENTA')
+        await self.async_client.aforce_login(self.user)
+        async with servidor() as ol:
+            with override_settings(OPENLIBRARY={'URL_BASE': ol.url}):
+                self.assertEqual((await self.pedir('9780000000103')).status_code, 201)
+        self.assertEqual([ruta for ruta in ol.pedidas if ruta.startswith('/authors/')], [])
+        self.assertEqual(await Autor.objects.acount(), 1)
+
+    async def test_autenticacion(self):
+        self.assertEqual((await self.pedir('9780000000100')).status_code, 401)
+        async with servidor() as ol:
+            with override_settings(OPENLIBRARY={'URL_BASE': ol.url}):
+                resp = await self.pedir('9780000000100', headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(resp.status_code, 201)
+
+    async def test_open_library_lenta_no_bloquea(self):
+        await self.async_client.aforce_login(self.user)
+        autor = await Autor.objects.acreate(nombre='Ya', apellido='Catalogado')
+        await Libro.objects.acreate(titulo='En casa', isbn='9780000000999', autor=autor)
+        # En las pruebas las peticiones comparten conexión y cada registro SQL ve las consultas
+        # de las demás: el aviso de N+1 que saldría aquí no es real
+        async with servidor(retraso=0.4) as ol:
+            with override_settings(OPENLIBRARY={'URL_BASE': ol.url}), self.assertLogs('Gestion.sql', 'INFO'):
+                inicio = time.perf_counter()
+                importaciones = [asyncio.create_task(self.pedir(isbn)) for isbn in LIBROS]
+                await asyncio.sleep(0.05)
+                # Un libro del catálogo se sirve mientras las importaciones esperan a Open Library
+                self.assertEqual((await self.pedir('9780000000999')).status_code, 200)
+                self.assertFalse(any(tarea.done() for tarea in importaciones))
+                respuestas = await asyncio.gather(*importaciones)
+                transcurrido = time.perf_counter() - inicio
+
+        self.assertEqual([r.status_code for r in respuestas], [201] * 4)
+        # 4 libros x (libro + autor) en fila serían 3,2 s; en paralelo, poco más de dos esperas
+        self.assertLess(transcurrido, 1.6)
+        self.assertGreaterEqual(ol.max_simultaneas, 4)
+
+
+class BuscarOpenLibraryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bodega = User.objects.create_user(username='bodega_async', password='password123')
+        cls.bodega.groups.add(Group.objects.create(name=BODEGA))
+        cls.socio = User.objects.create_user(username='socio_async', password='password123')
+
+    async def buscar(self, isbn):
+        return await self.async_client.get(reverse('buscar_openlibrary'), {'isbn': isbn})
+
+    async def test_rellena_el_formulario(self):
+        await self.async_client.aforce_login(self.bodega)
+        async with servidor() as ol:
+            with override_settings(OPENLIBRARY={'URL_BASE': ol.url}):
+                resp = await self.buscar('978-0000000101')
+                self.assertEqual((await self.buscar('9789999999999')).status_code, 404)
+        datos = resp.json()
+        autor = await Autor.objects.aget(apellido='Lenta')
+        self.assertEqual((datos['titulo'], datos['isbn'], datos['autor_id'], datos['autor_creado']),
+                         ('Obra 1', '9780000000101', autor.pk, True))
+        self.assertTrue(datos['portada_url'].endswith('/b/isbn/9780000000101-L.jpg'))
+        self.assertEqual((await self.buscar('123')).status_code, 400)
+        self.assertFalse(await Libro.objects.aexists())
+
+    async def test_solo_personal_de_bodega(self):
+        self.assertEqual((await self.buscar('9780000000101')).status_code, 302)
+        await self.async_client.aforce_login(self.socio)
+        self.assertEqual((await self.buscar('9780000000101')).status_code, 302)
+
+    def test_formulario_incluye_la_busqueda_asincrona(self):
+        self.client.force_login(self.bodega)
+        resp = self.client.get(reverse('crear_libro'))
+        self.assertContains(resp, f'data-url="{reverse("buscar_openlibrary")}"')
+
+
+@override_settings(SQL_SERVER_TIMING=True)
+class InstrumentacionAsincronaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='medido', password='password123')
+        autor = Autor.objects.create(nombre='Ya', apellido='Catalogado')
+        Libro.objects.create(titulo='En casa', isbn='9780000000999', autor=autor)
+
+    async def test_cuenta_las_consultas_de_una_vista_asincrona(self):
+        await self.async_client.aforce_login(self.user)
+        with self.assertLogs('Gestion.sql', 'INFO') as logs:
+            resp = await self.async_client.get(reverse('openlibrary-api', args=['9780000000999']))
+        self.assertEqual(resp.status_code, 200)
+        # Sesión, usuario y libro: el ORM asíncrono consulta en otro hilo y aun así se cuenta
+        self.assertGreaterEqual(logs.records[0].sql['consultas'], 3)
+        self.assertIn('sql;dur=', resp['Server-Timing'])
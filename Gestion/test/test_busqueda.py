@@ -0,0 +1,56 @@
+from django.core.cache import caches
+from django.core.management import call_command
+from django.urls import reverse
+from django.test import TestCase
+from django.contrib.auth.models import User
+from Gestion import busqueda
+from Gestion.models import Autor, Libro
+
+
+class BusquedaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buscador', password='password123')
+        cls.cervantes = Autor.objects.create(nombre="Miguel", apellido="de Cervantes", bibliografia="Novelista español.")
+        cls.garcia = Autor.objects.create(nombre="Gabriel", apellido="García Márquez")
+        cls.quijote = Libro.objects.create(titulo="Don Quijote de la Mancha", isbn="8401498961", autor=cls.cervantes,
+                                           descripcion="Un hidalgo que enloquece leyendo.")
+        cls.soledad = Libro.objects.create(titulo="Cien años de soledad", isbn="8401499844", autor=cls.garcia,
+                                           descripcion="Inspirada en el Quijote según algunos críticos.")
+
+    def test_titulo_pesa_mas_que_descripcion(self):
+        self.assertEqual(busqueda.ids_libros("quijote"), [self.quijote.id, self.soledad.id])
+
+    def test_busca_por_autor_prefijo_y_sin_tildes(self):
+        self.assertEqual(busqueda.ids_libros("garcia marq"), [self.soledad.id])
+
+    def test_indice_sigue_las_escrituras(self):
+        self.garcia.apellido = "Márquez"
+        self.garcia.save()
+        self.assertEqual(busqueda.ids_libros("garcia"), [])
+        self.assertEqual(busqueda.ids_autores("marquez"), [self.garcia.id])
+
+        self.quijote.delete()
+        self.assertEqual(busqueda.ids_libros("hidalgo"), [])
+
+    def test_entrada_con_sintaxis_fts(self):
+        self.assertEqual(busqueda.ids_libros('quijote" (mancha*'), [self.quijote.id])
+        self.assertEqual(busqueda.ids_libros('***'), [])
+
+    def test_lista_html_y_api(self):
+        caches['paginas'].clear()
+        self.client.login(username='buscador', password='password123')
+        resp = self.client.get(reverse('libro_list'), {'q': 'soledad'})
+        self.assertEqual([l.id for l in resp.context['libros']], [self.soledad.id])
+
+        resp = self.client.get(reverse('libros-api-list'), {'q': 'quijote'})
+        self.assertEqual([l['isbn'] for l in resp.json()], ["8401498961", "8401499844"])
+
+        resp = self.client.get(reverse('lista_autores'), {'q': 'cervantes'})
+        self.assertEqual([a.id for a in resp.context['autores']], [self.cervantes.id])
+
+    def test_comando_reindexar(self):
+        Libro.objects.filter(pk=self.quijote.pk).update(titulo="El Ingenioso Hidalgo")
+        busqueda.reconstruir_indices()
+        call_command('reindexar_busqueda', stdout=open('/dev/null', 'w'))
+        self.assertEqual(busqueda.ids_libros("ingenioso"), [self.quijote.id])
@@ -0,0 +1,94 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from Gestion import cache_paginas, stock
+from Gestion.models import Autor, Libro, Prestamos
+from Gestion.roles import BODEGA, CLIENTE
+
+
+class CachePaginasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        bodega = Group.objects.create(name=BODEGA)
+        bodega.permissions.set(Permission.objects.filter(codename__in=['add_libro', 'change_libro', 'delete_libro']))
+        cls.bodega = User.objects.create_user(username='bodega', password='password123')
+        cls.bodega.groups.add(bodega)
+        cls.socio = User.objects.create_user(username='socio', password='password123')
+        cls.socio.groups.add(Group.objects.create(name=CLIENTE))
+        cls.autor = Autor.objects.create(nombre="Mario", apellido="Benedetti")
+        cls.libro = Libro.objects.create(titulo="La tregua", isbn="9788466333269", autor=cls.autor, cantidad_total=3)
+
+    def setUp(self):
+        caches['paginas'].clear()
+        self.client.login(username='socio', password='password123')
+
+    def consultas_catalogo(self, url, tabla):
+        with CaptureQueriesContext(connection) as capturadas:
+            resp = self.client.get(url)
+        self.assertContains(resp, "Benedetti")
+        return [q['sql'] for q in capturadas.captured_queries if f'"{tabla}"' in q['sql']]
+
+    def test_segunda_visita_sin_consultar_el_catalogo(self):
+        paginas = [
+            (reverse('libro_list'), 'Gestion_libro'),
+            (reverse('libro_detalle', args=[self.libro.pk]), 'Gestion_libro'),
+            (reverse('lista_autores'), 'Gestion_autor'),
+        ]
+        for url, tabla in paginas:
+            self.assertNotEqual(self.consultas_catalogo(url, tabla), [])
+            self.assertEqual(self.consultas_catalogo(url, tabla), [])
+
+    def test_cambio_de_stock_invalida_listado_y_detalle(self):
+        self.assertContains(self.client.get(reverse('libro_list')), "3 en estante")
+        self.assertContains(self.client.get(reverse('libro_detalle', args=[self.libro.pk])), "3 de 3 disponibles")
+        stock.prestar(self.libro.pk)
+        self.assertContains(self.client.get(reverse('libro_list')), "2 en estante")
+        self.assertContains(self.client.get(reverse('libro_detalle', args=[self.libro.pk])), "2 de 3 disponibles")
+
+    def test_invalidacion_precisa(self):
+        otro = Libro.objects.create(titulo="Gracias por el fuego", isbn="9788466333276", autor=self.autor)
+        version = cache_paginas.versiones(f'libro:{self.libro.pk}')
+        otro.titulo = "Gracias por el fuego (bolsillo)"
+        otro.save()
+        self.assertEqual(cache_paginas.versiones(f'libro:{self.libro.pk}'), version)
+        Prestamos.objects.create(libro=self.libro, usuario=self.socio, estado='s')
+        self.assertNotEqual(cache_paginas.versiones(f'libro:{self.libro.pk}'), version)
+
+    def test_renombrar_autor(self):
+        self.client.get(reverse('libro_list'))
+        self.client.get(reverse('libro_detalle', args=[self.libro.pk]))
+        self.autor.nombre = "Mario Orlando"
+        self.autor.save()
+        self.assertContains(self.client.get(reverse('libro_list')), "Mario Orlando")
+        self.assertContains(self.client.get(reverse('libro_detalle', args=[self.libro.pk])), "Mario Orlando")
+
+    def test_variantes_por_rol(self):
+        editar = reverse('libro_editar', args=[self.libro.pk])
+        self.client.login(username='bodega', password='password123')
+        self.assertContains(self.client.get(reverse('libro_list')), editar)
+        self.client.login(username='socio', password='password123')
+        self.assertNotContains(self.client.get(reverse('libro_list')), editar)
+
+        # Cambiar los permisos de un grupo cambia lo que ven sus miembros
+        Group.objects.get(name=CLIENTE).permissions.add(Permission.objects.get(codename='change_libro'))
+        self.assertContains(self.client.get(reverse('libro_list')), editar)
+
+    def test_variantes_por_permiso_del_usuario(self):
+        editar = reverse('libro_editar', args=[self.libro.pk])
+        self.assertNotContains(self.client.get(reverse('libro_list')), editar)
+        # Mismo rol que 'socio', pero con el permiso asignado a él y no al grupo
+        editor = User.objects.create_user(username='editor', password='password123')
+        editor.groups.add(Group.objects.get(name=CLIENTE))
+        editor.user_permissions.add(Permission.objects.get(codename='change_libro'))
+        self.client.login(username='editor', password='password123')
+        self.assertContains(self.client.get(reverse('libro_list')), editar)
+        self.assertContains(self.client.get(reverse('libro_detalle', args=[self.libro.pk])), editar)
+        self.client.login(username='socio', password='password123')
+        self.assertNotContains(self.client.get(reverse('libro_detalle', args=[self.libro.pk])), editar)
+
+    def test_libro_inexistente_no_se_cachea(self):
+        self.assertEqual(self.client.get(reverse('libro_detalle', args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('libro_detalle', args=[999])).status_code, 404)
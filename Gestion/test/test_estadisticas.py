@@ -0,0 +1,116 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from Gestion import estadisticas
+from Gestion.models import Autor, EstadisticaLibroDia, EstadisticaMultasDia, Libro, Multa, Prestamos
+from Gestion.roles import BIBLIOTECARIO
+
+
+class EstadisticasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='biblio', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.socio = User.objects.create_user(username='socio', password='password123')
+        autor = Autor.objects.create(nombre="Leopoldo", apellido="Alas")
+        cls.libro = Libro.objects.create(titulo="La Regenta", isbn="9788437600000", autor=autor, cantidad_total=50)
+        cls.otro = Libro.objects.create(titulo="Su único hijo", isbn="9788437600001", autor=autor, cantidad_total=50)
+        cls.hoy = timezone.now().date()
+
+    def setUp(self):
+        self.client.login(username='biblio', password='password123')
+
+    def cubo(self, libro, fecha):
+        return EstadisticaLibroDia.objects.filter(libro=libro, fecha=fecha).values_list('prestamos', 'devoluciones').first()
+
+    def prestar(self, libro, dias_atras=0, **extra):
+        datos = {'estado': 'p', 'fecha_prestamo': self.hoy - timedelta(days=dias_atras)}
+        datos.update(extra)
+        return Prestamos.objects.create(libro=libro, usuario=self.socio, **datos)
+
+    def test_circulacion_incremental(self):
+        self.prestar(self.libro)
+        solicitud = self.prestar(self.libro, estado='s')
+        self.assertEqual(self.cubo(self.libro, self.hoy), (1, 0))
+
+        self.client.post(reverse('aprobar_prestamo', args=[solicitud.pk]), {'accion': 'aprobar'})
+        self.assertEqual(self.cubo(self.libro, self.hoy), (2, 0))
+
+        self.client.get(reverse('devolver_libro', args=[solicitud.pk]))
+        self.assertEqual(self.cubo(self.libro, self.hoy), (2, 1))
+
+    def test_cambio_de_fecha_y_borrado(self):
+        p = self.prestar(self.libro, dias_atras=3)
+        p.fecha_prestamo = self.hoy - timedelta(days=1)
+        p.save()
+        self.assertIsNone(self.cubo(self.libro, self.hoy - timedelta(days=3)))
+        self.assertEqual(self.cubo(self.libro, self.hoy - timedelta(days=1)), (1, 0))
+        p.delete()
+        self.assertFalse(EstadisticaLibroDia.objects.exists())
+
+    def test_multas_y_pagos(self):
+        p = self.prestar(self.libro, dias_atras=20, fecha_max=self.hoy - timedelta(days=6))
+        multa = Multa.objects.create(prestamo=p, tipo_multa='deterioro', monto=Decimal('5.00'), fecha=self.hoy)
+        call_command('generar_multas', stdout=StringIO())  # retraso: 6 * 0.50, vía bulk_create
+        dia = EstadisticaMultasDia.objects.get(fecha=self.hoy)
+        self.assertEqual((dia.cantidad, dia.monto, dia.monto_pagado), (2, Decimal('8.00'), Decimal('0.00')))
+
+        self.client.get(reverse('pagar_multa', args=[multa.pk]))
+        dia.refresh_from_db()
+        self.assertEqual(dia.monto_pagado, Decimal('5.00'))
+        self.assertEqual(estadisticas.resumen(dias=7)['multas_pendientes'], Decimal('3.00'))
+
+    def test_reconstruir_coincide_con_lo_incremental(self):
+        for i in range(12):
+            p = self.prestar(self.libro if i % 3 else self.otro, dias_atras=i % 5)
+            if i % 2:
+                p.estado, p.fecha_devolucion = 'd', self.hoy - timedelta(days=i % 3)
+                p.save()
+            if i % 4 == 0:
+                Multa.objects.create(prestamo=p, tipo_multa='deterioro', monto=Decimal('5.00'),
+                                     fecha=self.hoy - timedelta(days=i % 2), pagada=bool(i % 8))
+        filas = lambda: (
+            sorted(EstadisticaLibroDia.objects.values_list('libro_id', 'fecha', 'prestamos', 'devoluciones')),
+            sorted(EstadisticaMultasDia.objects.values_list('fecha', 'cantidad', 'monto', 'monto_pagado')),
+        )
+        incremental = filas()
+        EstadisticaLibroDia.objects.all().delete()
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+        self.assertEqual(filas(), incremental)
+
+    def test_endpoint_y_panel(self):
+        for i in range(3):
+            self.prestar(self.libro)
+        self.prestar(self.otro, dias_atras=1)
+        datos = self.client.get(reverse('estadisticas_json'), {'dias': 7}).json()
+        self.assertEqual(len(datos['por_dia']), 7)
+        self.assertEqual(datos['por_dia'][-1], {'fecha': self.hoy.isoformat(), 'prestamos': 3, 'devoluciones': 0,
+                                                'multas': 0, 'monto_multas': '0'})
+        self.assertEqual([(l['titulo'], l['prestamos']) for l in datos['mas_prestados']],
+                         [('La Regenta', 3), ('Su único hijo', 1)])
+        self.assertContains(self.client.get(reverse('estadisticas')), 'La Regenta')
+
+        self.client.login(username='socio', password='password123')
+        self.assertEqual(self.client.get(reverse('estadisticas_json')).status_code, 302)
+
+    def test_coste_no_crece_con_el_historial(self):
+        self.prestar(self.libro)
+        with CaptureQueriesContext(connection) as antes:
+            self.client.get(reverse('estadisticas_json'))
+        Prestamos.objects.bulk_create([
+            Prestamos(libro=self.libro, usuario=self.socio, estado='d', fecha_prestamo=self.hoy - timedelta(days=400 + i))
+            for i in range(300)
+        ])
+        estadisticas.reconstruir()
+        with CaptureQueriesContext(connection) as despues:
+            self.client.get(reverse('estadisticas_json'))
+        self.assertEqual(len(antes), len(despues))
+        self.assertFalse(any('gestion_prestamos' in q['sql'].lower() for q in despues.captured_queries))
@@ -0,0 +1,140 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from Gestion import exportacion
+from Gestion.models import Autor, Libro, Multa, Prestamos
+from Gestion.roles import BIBLIOTECARIO, BODEGA
+
+
+class ExportacionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='auditora', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.bodega = User.objects.create_user(username='almacen', password='password123')
+        cls.bodega.groups.add(Group.objects.create(name=BODEGA))
+        cls.socio = User.objects.create_user(username='lector', password='password123')
+        autor = Autor.objects.create(nombre="Emilia", apellido="Pardo Bazán")
+        cls.libro = Libro.objects.create(titulo="Los pazos de Ulloa", isbn="9788437600100", autor=autor,
+                                         cantidad_total=10)
+        cls.agotado = Libro.objects.create(titulo="La Tribuna, \"edición\"", isbn="9788437600101", autor=autor,
+                                           cantidad_total=1)
+        Libro.objects.filter(pk=cls.agotado.pk).update(ejemplares_disponibles=0, disponible=False)
+        cls.hoy = timezone.now().date()
+        cls.antiguo = Prestamos.objects.create(libro=cls.libro, usuario=cls.socio, estado='d',
+                                               fecha_prestamo=cls.hoy - timedelta(days=40))
+        cls.reciente = Prestamos.objects.create(libro=cls.libro, usuario=cls.socio, estado='p',
+                                                fecha_prestamo=cls.hoy - timedelta(days=2))
+        Multa.objects.create(prestamo=cls.antiguo, tipo_multa='deterioro', monto=Decimal('4.50'), pagada=True,
+                             fecha=cls.hoy - timedelta(days=30))
+        Multa.objects.create(prestamo=cls.reciente, tipo_multa='perdida', monto=Decimal('12.00'), fecha=cls.hoy)
+
+    def setUp(self):
+        self.client.login(username='auditora', password='password123')
+
+    def descargar(self, tipo, **params):
+        resp = self.client.get(reverse('exportar', args=[tipo]), params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return resp, b''.join(resp.streaming_content)
+
+    def test_csv_de_prestamos(self):
+        resp, cuerpo = self.descargar('prestamos')
+        self.assertEqual(resp['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="prestamos.csv"', resp['Content-Disposition'])
+        filas = list(csv.DictReader(StringIO(cuerpo.decode())))
+        self.assertEqual([int(f['id']) for f in filas], [self.antiguo.pk, self.reciente.pk])
+        self.assertEqual((filas[1]['isbn'], filas[1]['usuario'], filas[1]['estado']), ('9788437600100', 'lector', 'p'))
+
+    def test_filtros_de_fecha_y_estado(self):
+        _, cuerpo = self.descargar('prestamos', desde=self.hoy - timedelta(days=7), formato='jsonl')
+        self.assertEqual([json.loads(l)['id'] for l in cuerpo.splitlines()], [self.reciente.pk])
+        _, cuerpo = self.descargar('multas', estado='pagada', formato='jsonl')
+        multas = [json.loads(l) for l in cuerpo.splitlines()]
+        self.assertEqual([(m['tipo_multa'], m['monto'], m['usuario']) for m in multas], [('deterioro', '4.50', 'lector')])
+        # Igual que en los listados, los valores incorrectos se ignoran
+        _, cuerpo = self.descargar('multas', estado='xx', hasta='2024-02-31', formato='jsonl')
+        self.assertEqual(len(cuerpo.splitlines()), 2)
+
+    def test_gzip(self):
+        resp, cuerpo = self.descargar('libros', estado='agotado', gzip='1')
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        self.assertIn('filename="libros_agotado.csv.gz"', resp['Content-Disposition'])
+        filas = list(csv.DictReader(StringIO(gzip.decompress(cuerpo).decode())))
+        self.assertEqual([(f['titulo'], f['disponible']) for f in filas], [('La Tribuna, "edición"', 'False')])
+
+    def test_lee_por_lotes_sin_cargar_la_tabla(self):
+        with mock.patch.object(exportacion, 'TAMANO_TROZO', 1):
+            _, cuerpo = self.descargar('libros', formato='jsonl')
+            self.assertEqual(len(cuerpo.splitlines()), 2)
+            # Una línea por trozo: la respuesta no se acumula entera antes de enviarse
+            self.assertEqual(len(list(exportacion.generar('libros', 'jsonl'))), 2)
+        with mock.patch.object(exportacion.Exportacion, 'consulta') as consulta:
+            list(exportacion.generar('multas'))
+        consulta.return_value.iterator.assert_called_once_with(chunk_size=exportacion.TAMANO_LOTE)
+
+    async def test_asgi_envia_trozo_a_trozo(self):
+        # Con ASGI, un iterador síncrono lo leería Django entero (sync_to_async(list)) antes de enviar
+        pedidos = []
+        generar = exportacion.generar
+
+        def generar_vigilado(*args, **kwargs):
+            for trozo in generar(*args, **kwargs):
+                pedidos.append(trozo)
+                yield trozo
+
+        await self.async_client.aforce_login(self.staff)
+        with mock.patch.object(exportacion, 'TAMANO_TROZO', 1), \
+                mock.patch.object(exportacion, 'generar', side_effect=generar_vigilado):
+            resp = await self.async_client.get(reverse('exportar', args=['prestamos']), {'formato': 'jsonl'})
+            self.assertTrue(resp.is_async)
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')  # el aviso de "must consume synchronous iterators"
+                contenido = aiter(resp)
+                primero = await anext(contenido)
+                self.assertEqual(len(pedidos), 1)
+                resto = [trozo async for trozo in contenido]
+        filas = [json.loads(linea) for linea in b''.join([primero, *resto]).splitlines()]
+        self.assertEqual([f['id'] for f in filas], [self.antiguo.pk, self.reciente.pk])
+
+    def test_permisos(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('exportar', args=['prestamos'])).status_code, 302)
+        self.client.login(username='lector', password='password123')
+        self.assertEqual(self.client.get(reverse('exportar', args=['prestamos'])).status_code, 403)
+        self.client.login(username='almacen', password='password123')
+        self.assertEqual(self.client.get(reverse('exportar', args=['multas'])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('exportar', args=['libros'])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('exportar', args=['usuarios'])).status_code, 404)
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, 'multas.jsonl.gz')
+            salida = StringIO()
+            call_command('exportar', 'multas', '--formato', 'jsonl', '--estado', 'pendiente', '--salida', ruta,
+                         stdout=salida)
+            with gzip.open(ruta, 'rt') as archivo:
+                multas = [json.loads(l) for l in archivo]
+        self.assertEqual([m['tipo_multa'] for m in multas], ['perdida'])
+        self.assertIn('bytes escritos', salida.getvalue())
+
+        salida = StringIO()
+        call_command('exportar', 'prestamos', '--hasta', str(self.hoy - timedelta(days=10)), stdout=salida)
+        self.assertEqual(len(salida.getvalue().splitlines()), 2)  # cabecera + préstamo antiguo
+        with self.assertRaises(CommandError):
+            call_command('exportar', 'libros', '--estado', 'pagada', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('exportar', 'libros', '--desde', 'ayer', stdout=StringIO())
@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from Gestion.management.commands.generar_multas import Command
+from Gestion.models import Autor, Libro, Multa, Prestamos
+
+HOY = date(2024, 3, 1)
+
+
+class GenerarMultasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='socio', password='password123')
+        autor = Autor.objects.create(nombre="Rosalía", apellido="de Castro")
+        cls.libro = Libro.objects.create(titulo="Follas novas", isbn="9788491210000", autor=autor, cantidad_total=100)
+
+    def prestamo(self, dias_vencido, **extra):
+        datos = {'estado': 'p', 'fecha_prestamo': HOY - timedelta(days=30), 'fecha_max': HOY - timedelta(days=dias_vencido)}
+        datos.update(extra)
+        return Prestamos.objects.create(libro=self.libro, usuario=self.user, **datos)
+
+    def generar(self, **opciones):
+        call_command('generar_multas', fecha=HOY.isoformat(), stdout=StringIO(), **opciones)
+
+    def test_calcula_el_monto_en_sql(self):
+        p = self.prestamo(10, multa_fija=Decimal('1.25'))
+        self.generar()
+        multa = Multa.objects.get(prestamo=p)
+        self.assertEqual(multa.tipo_multa, 'retraso')
+        self.assertEqual(multa.monto, Decimal('6.25'))  # 10 días * 0.50 + 1.25
+        self.assertEqual(multa.fecha, HOY)
+        # Coincide con la propiedad que se usa en las vistas (evaluada "hoy")
+        self.assertEqual(multa.monto, Decimal(10) * Decimal('0.50') + p.multa_fija)
+
+    def test_solo_prestamos_vencidos_y_en_curso(self):
+        self.prestamo(-3)                                    # aún en plazo
+        self.prestamo(0)                                     # vence hoy
+        self.prestamo(5, estado='d', fecha_devolucion=HOY)   # devuelto
+        self.prestamo(5, estado='s')                         # solicitud
+        vencido = self.prestamo(1)
+        self.generar()
+        self.assertEqual(list(Multa.objects.values_list('prestamo_id', flat=True)), [vencido.pk])
+
+    def test_idempotente_y_actualiza_el_monto(self):
+        p = self.prestamo(4)
+        self.generar()
+        self.generar()
+        self.assertEqual(Multa.objects.count(), 1)
+        call_command('generar_multas', fecha=(HOY + timedelta(days=2)).isoformat(), stdout=StringIO())
+        multa = Multa.objects.get(prestamo=p)
+        self.assertEqual(multa.monto, Decimal('3.00'))
+        self.assertEqual(multa.fecha, HOY)  # la fecha de la multa es la de su creación
+
+    def test_no_toca_multas_pagadas_ni_otros_tipos(self):
+        pagada = self.prestamo(8)
+        Multa.objects.create(prestamo=pagada, tipo_multa='retraso', monto=Decimal('1.00'), pagada=True)
+        deteriorado = self.prestamo(2)
+        Multa.objects.create(prestamo=deteriorado, tipo_multa='deterioro', monto=Decimal('5.00'))
+        self.generar()
+        self.assertEqual(Multa.objects.get(prestamo=pagada).monto, Decimal('1.00'))
+        self.assertEqual(
+            dict(Multa.objects.filter(prestamo=deteriorado).values_list('tipo_multa', 'monto')),
+            {'deterioro': Decimal('5.00'), 'retraso': Decimal('1.00')},
+        )
+
+    def test_consultas_por_lote_no_por_prestamo(self):
+        for dias in range(1, 31):
+            self.prestamo(dias)
+        with CaptureQueriesContext(connection) as consultas:
+            self.generar(lote=10)
+        self.assertEqual(Multa.objects.count(), 30)
+        # 3 lotes x (SELECT + montos anteriores + upsert + multas resultantes + 3 del saldo)
+        # + SELECT final vacío + recalcular el único día de multas (agregado + upsert),
+        # sin contar SAVEPOINTs
+        sin_savepoints = [q for q in consultas.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(sin_savepoints), 24)
+
+    def test_lotes_en_el_orden_del_indice(self):
+        for dias in (3, 1, 2, 3, 1):
+            self.prestamo(dias)
+        self.generar(lote=2)
+        self.assertEqual(Multa.objects.count(), 5)
+        # Cada lote sigue en el índice (estado, fecha_max) donde acabó el anterior, sin ordenar
+        sql, params = Command.vencidos(HOY, (HOY - timedelta(days=2), 1))[:2].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = ' '.join(str(fila) for fila in cursor.fetchall())
+        self.assertIn("prestamo_estado_fmax_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from Gestion import cache_paginas
+from Gestion.management.commands import import_isbns
+from Gestion.models import Autor, Libro
+from Gestion.test.servidor_fixture import ServidorOpenLibrary
+
+
+def libro_ol(titulo, autor):
+    return {'title': titulo, 'authors': [{'name': autor}]}
+
+
+class ImportIsbnsTest(TestCase):
+    def setUp(self):
+        self.libros = {f'97800000000{i:02d}': libro_ol(f'Obra {i}', f'Autor{i % 3} Apellido') for i in range(12)}
+        directorio = tempfile.mkdtemp()
+        self.archivo = os.path.join(directorio, 'envio.csv')
+        with open(self.archivo, 'w') as f:
+            f.write('isbn,cantidad\n')
+            for i, isbn in enumerate(self.libros):
+                f.write(f'{isbn},{i % 2 + 1}\n')
+            f.write('123,1\n')              # ISBN inválido
+            f.write('9781111111111,2\n')    # Open Library no lo conoce
+
+    def importar(self, servidor, *args):
+        with override_settings(OPENLIBRARY={'URL_BASE': servidor.url}):
+            call_command('import_isbns', self.archivo, '--workers', '4', '--lote', '5', *args,
+                         stdout=StringIO(), stderr=StringIO())
+
+    def test_importa_todo_el_archivo(self):
+        Autor.objects.create(nombre='Autor0', apellido='Apellido')
+        with ServidorOpenLibrary(libros=self.libros) as servidor:
+            self.importar(servidor)
+
+        self.assertEqual(Libro.objects.count(), 12)
+        self.assertEqual(Autor.objects.count(), 3)
+        libro = Libro.objects.get(isbn='9780000000001')
+        self.assertEqual((libro.titulo, libro.cantidad_total, libro.ejemplares_disponibles), ('Obra 1', 2, 2))
+
+    def test_reanuda_tras_interrupcion(self):
+        original = import_isbns.Command.crear_libros
+        llamadas = []
+
+        def falla_en_el_tercer_lote(comando, pendientes):
+            llamadas.append(1)
+            if len(llamadas) == 3:
+                raise RuntimeError('corte de luz')
+            return original(comando, pendientes)
+
+        with ServidorOpenLibrary(libros=self.libros) as servidor:
+            with mock.patch.object(import_isbns.Command, 'crear_libros', falla_en_el_tercer_lote):
+                with self.assertRaises(RuntimeError):
+                    self.importar(servidor)
+            self.assertEqual(Libro.objects.count(), 10)
+
+            self.importar(servidor)
+            # Solo se vuelven a consultar los ISBNs del lote que no llegó a guardarse
+            self.assertEqual(len(servidor.pedidas), 10 + 3 + 3)
+
+        self.assertEqual(Libro.objects.count(), 12)
+        self.assertEqual(sum(Libro.objects.values_list('cantidad_total', flat=True)), 18)
+
+    def test_reimportar_suma_ejemplares(self):
+        with ServidorOpenLibrary(libros=self.libros) as servidor:
+            self.importar(servidor)
+            self.importar(servidor, '--reiniciar')
+        self.assertEqual(Libro.objects.count(), 12)
+        self.assertEqual(Libro.objects.get(isbn='9780000000001').ejemplares_disponibles, 4)
+
+    def test_reutiliza_autor_aunque_cambien_las_mayusculas(self):
+        existente = Autor.objects.create(nombre='autor1', apellido='APELLIDO')
+        with ServidorOpenLibrary(libros=self.libros) as servidor:
+            self.importar(servidor)
+        self.assertEqual(Autor.objects.count(), 3)
+        self.assertEqual(existente.libros.count(), 4)
+        self.assertTrue(all(a.clave for a in Autor.objects.all()))
+
+    def test_invalida_la_cache_del_catalogo(self):
+        antes = cache_paginas.versiones('libros', 'autores')
+        with ServidorOpenLibrary(libros=self.libros) as servidor:
+            with self.captureOnCommitCallbacks(execute=True) as confirmados:
+                self.importar(servidor)
+        self.assertTrue(confirmados)
+        despues = cache_paginas.versiones('libros', 'autores')
+        self.assertNotEqual(despues[0], antes[0])
+        self.assertNotEqual(despues[1], antes[1])
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from Gestion import importacion, openlibrary
+from Gestion.models import Autor, CandadoImportacion, Libro
+from Gestion.test.servidor_fixture import ServidorOpenLibraryAsincrono
+from Gestion.test.test_openlibrary import AUTOR_OL, LIBRO_OL, TransporteStub
+
+ISBN = '0451524934'
+
+
+class TransporteLento(TransporteStub):
+    """Tarda un poco en responder, para que las peticiones simultáneas se solapen."""
+
+    def get(self, url, timeout=None):
+        time.sleep(0.3)
+        return super().get(url, timeout=timeout)
+
+
+def en_hilos(n, funcion):
+    resultados, errores = [], []
+
+    def trabajo():
+        try:
+            resultados.append(funcion())
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()  # cada hilo abre su propia conexión
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, errores
+
+
+class VueloUnicoTest(SimpleTestCase):
+    def test_una_sola_ejecucion_por_clave(self):
+        vuelos, llamadas = importacion.VueloUnico(), []
+
+        def lenta():
+            llamadas.append(1)
+            time.sleep(0.2)
+            return object()
+
+        resultados, errores = en_hilos(6, lambda: vuelos.hacer('x', lenta))
+        self.assertEqual((len(llamadas), errores), (1, []))
+        self.assertEqual(len({id(r) for r in resultados}), 1)
+        # Terminado el vuelo, la siguiente llamada vuelve a ejecutar
+        vuelos.hacer('x', lenta)
+        self.assertEqual(len(llamadas), 2)
+
+    def test_el_error_llega_a_todos(self):
+        vuelos = importacion.VueloUnico()
+
+        def falla():
+            time.sleep(0.2)
+            raise ConnectionError('Open Library caída')
+
+        resultados, errores = en_hilos(4, lambda: vuelos.hacer('x', falla))
+        self.assertEqual(resultados, [])
+        self.assertEqual([str(e) for e in errores], ['Open Library caída'] * 4)
+
+    def test_asincrono(self):
+        vuelos, llamadas = importacion.VueloUnicoAsincrono(), []
+
+        async def lenta():
+            llamadas.append(1)
+            await asyncio.sleep(0.1)
+            return len(llamadas)
+
+        async def varias():
+            return await asyncio.gather(*(vuelos.hacer('x', lenta) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(varias()), [1] * 5)
+
+
+class ImportacionConcurrenteTest(TransactionTestCase):
+    def test_un_solo_viaje_por_isbn(self):
+        transporte = TransporteLento({'ISBN:0451524934': LIBRO_OL, '/authors/OL118077A': AUTOR_OL})
+        cliente = openlibrary.ClienteOpenLibrary(transporte=transporte)
+        resultados, errores = en_hilos(8, lambda: importacion.importar(ISBN, cliente))
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len([url for url in transporte.pedidas if 'ISBN:' in url]), 1)
+        self.assertEqual(len(transporte.pedidas), 2)  # el libro y la biografía, una vez
+        self.assertEqual(Libro.objects.filter(isbn=ISBN).count(), 1)
+        self.assertEqual({libro.pk for libro, _ in resultados}, {Libro.objects.get().pk})
+
+    def test_el_candado_lo_ven_las_demas_conexiones(self):
+        # Mientras un worker consulta Open Library, otro (otra conexión, sin compartir memoria)
+        # no puede tomar el candado del mismo ISBN
+        intentos = []
+
+        def otro_worker():
+            intentos.append(importacion._tomar_candado(ISBN, 'otro-worker', 30))
+            connection.close()
+
+        class TransporteVigilado(TransporteStub):
+            def get(self, url, timeout=None):
+                if 'ISBN:' in url:
+                    hilo = threading.Thread(target=otro_worker)
+                    hilo.start()
+                    hilo.join()
+                return super().get(url, timeout=timeout)
+
+        transporte = TransporteVigilado({'ISBN:0451524934': LIBRO_OL, '/authors/OL118077A': AUTOR_OL})
+        libro, creado = importacion.importar(ISBN, openlibrary.ClienteOpenLibrary(transporte=transporte))
+        self.assertTrue(creado)
+        self.assertEqual(intentos, [False])
+        self.assertFalse(CandadoImportacion.objects.exists())  # soltado al terminar
+
+
+class CandadoEntreProcesosTest(TestCase):
+    def setUp(self):
+        self.transporte = TransporteStub({'ISBN:0451524934': LIBRO_OL, '/authors/OL118077A': AUTOR_OL})
+        self.cliente = openlibrary.ClienteOpenLibrary(transporte=self.transporte)
+        # Otro worker tiene el candado de este ISBN
+        self.ajeno = CandadoImportacion.objects.create(isbn=ISBN, ficha='otro-proceso',
+                                                       expira=timezone.now() + timedelta(seconds=30))
+
+    def test_espera_al_libro_del_otro_proceso(self):
+        def el_otro_termina(segundos):
+            autor = Autor.objects.create(nombre='George', apellido='Orwell')
+            Libro.objects.create(titulo='1984', isbn=ISBN, autor=autor)
+            self.ajeno.delete()
+
+        with mock.patch.object(importacion.time, 'sleep', side_effect=el_otro_termina) as espera:
+            libro, creado = importacion.importar(ISBN, self.cliente)
+        self.assertEqual((libro.titulo, creado, espera.call_count), ('1984', False, 1))
+        self.assertEqual(self.transporte.pedidas, [])
+
+    def test_si_se_suelta_sin_libro_importa_el_mismo(self):
+        with mock.patch.object(importacion.time, 'sleep', side_effect=lambda s: self.ajeno.delete()):
+            libro, creado = importacion.importar(ISBN, self.cliente)
+        self.assertTrue(creado)
+        self.assertEqual(len(self.transporte.pedidas), 2)
+        self.assertFalse(CandadoImportacion.objects.exists())
+
+    def test_candado_abandonado(self):
+        cliente = openlibrary.ClienteOpenLibrary(transporte=self.transporte, PLAZO_IMPORTACION=0)
+        libro, creado = importacion.importar(ISBN, cliente)
+        self.assertTrue(creado)
+        # El candado era de otro y aún no caducó: no se toca
+        self.assertEqual(CandadoImportacion.objects.get().ficha, 'otro-proceso')
+
+    def test_candado_caducado_se_reclama(self):
+        CandadoImportacion.objects.filter(pk=ISBN).update(expira=timezone.now() - timedelta(seconds=1))
+        with mock.patch.object(importacion.time, 'sleep') as espera:
+            libro, creado = importacion.importar(ISBN, self.cliente)
+        self.assertTrue(creado)
+        self.assertEqual(espera.call_count, 0)
+        self.assertFalse(CandadoImportacion.objects.exists())
+
+
+class ApiConcurrenteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='concurrente', password='password123')
+
+    async def test_peticiones_simultaneas_comparten_la_importacion(self):
+        await self.async_client.aforce_login(self.user)
+        async with ServidorOpenLibraryAsincrono(libros={ISBN: LIBRO_OL['ISBN:0451524934']},
+                                                autores={'OL118077A': AUTOR_OL}, retraso=0.2) as ol:
+            with override_settings(OPENLIBRARY={'URL_BASE': ol.url}), self.assertLogs('Gestion.sql', 'INFO'):
+                respuestas = await asyncio.gather(
+                    *(self.async_client.get(reverse('openlibrary-api', args=[ISBN])) for _ in range(6))
+                )
+
+        self.assertEqual([r.status_code for r in respuestas], [201] * 6)
+        self.assertEqual(len({r.json()['id'] for r in respuestas}), 1)
+        self.assertEqual(sorted(ol.pedidas), sorted([f'/api/books?bibkeys=ISBN:{ISBN}&format=json&jscmd=data',
+                                                     '/authors/OL118077A.json']))
+        self.assertEqual(await Libro.objects.filter(isbn=ISBN).acount(), 1)
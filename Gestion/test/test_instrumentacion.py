@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from Gestion.instrumentacion import InstrumentacionSQLMiddleware, huella
+from Gestion.models import Autor, Libro, Multa, Prestamos
+from Gestion.roles import BIBLIOTECARIO
+from Gestion.test.presupuesto import PresupuestoConsultasMixin
+
+
+class HuellaTest(SimpleTestCase):
+    def test_quita_valores(self):
+        self.assertEqual(
+            huella('SELECT "a"."id" FROM "a" WHERE "a"."id" = 15 AND "a"."nombre" = \'Ana\''),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" = ? AND "a"."nombre" = ?',
+        )
+
+    def test_listas_in_de_cualquier_longitud(self):
+        self.assertEqual(huella('SELECT 1 FROM t WHERE id IN (%s, %s)'), huella('SELECT 1 FROM t WHERE id IN (%s)'))
+
+
+@override_settings(SQL_SERVER_TIMING=True)
+class MiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        autor = Autor.objects.create(nombre="Clarice", apellido="Lispector")
+        cls.libros = [Libro.objects.create(titulo=f"Libro {i}", isbn=f"{9782000000000 + i}", autor=autor)
+                      for i in range(6)]
+
+    def procesar(self, vista):
+        request = RequestFactory().get('/prueba/')
+        return InstrumentacionSQLMiddleware(vista)(request)
+
+    def test_server_timing_y_log(self):
+        def vista(request):
+            list(Libro.objects.all())
+            return HttpResponse('ok')
+
+        with self.assertLogs('Gestion.sql', 'INFO') as logs:
+            resp = self.procesar(vista)
+        self.assertRegex(resp['Server-Timing'], r'^sql;dur=[\d.]+;desc="1 consultas, 0 repetidas", total;dur=[\d.]+$')
+        datos = logs.records[0].sql
+        self.assertEqual((datos['ruta'], datos['consultas'], datos['repetidas'], datos['n_mas_1']),
+                         ('/prueba/', 1, 0, []))
+
+    def test_detecta_n_mas_1(self):
+        def vista(request):
+            # El autor de cada libro por separado: el patrón típico de una plantilla sin select_related
+            for libro in Libro.objects.all():
+                libro.autor.nombre
+            return HttpResponse('ok')
+
+        with self.assertLogs('Gestion.sql', 'WARNING') as logs:
+            resp = self.procesar(vista)
+        datos = logs.records[0].sql
+        self.assertEqual(datos['consultas'], 7)
+        self.assertEqual(datos['repetidas'], 5)
+        self.assertEqual(datos['n_mas_1'][0]['veces'], 6)
+        self.assertIn('"Gestion_autor"', datos['n_mas_1'][0]['huella'])
+        self.assertIn('7 consultas, 5 repetidas', resp['Server-Timing'])
+
+    @override_settings(SQL_SERVER_TIMING=False)
+    def test_sin_cabecera_si_se_desactiva(self):
+        with self.assertLogs('Gestion.sql', 'INFO'):
+            resp = self.procesar(lambda request: HttpResponse('ok'))
+        self.assertFalse(resp.has_header('Server-Timing'))
+
+    def test_instalado_en_settings(self):
+        with self.assertLogs('Gestion.sql', 'INFO'):
+            resp = self.client.get(reverse('login'))
+        self.assertIn('sql;dur=', resp['Server-Timing'])
+
+
+class PresupuestoVistasTest(PresupuestoConsultasMixin, TestCase):
+    """Las consultas de los listados no dependen de cuántas filas se muestran."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='biblio', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.autores = [Autor.objects.create(nombre=f"Autor {i}", apellido="Presupuesto") for i in range(4)]
+
+    def setUp(self):
+        caches['paginas'].clear()
+        self.client.force_login(self.staff)
+
+    def poblar(self, n):
+        socios = [User.objects.create_user(username=f'socio{n}_{i}') for i in range(3)]
+        for i in range(n):
+            libro = Libro.objects.create(titulo=f"Presupuesto {i}", isbn=f"{9783000000000 + Libro.objects.count()}",
+                                         autor=self.autores[i % 4], cantidad_total=5)
+            p = Prestamos.objects.create(libro=libro, usuario=socios[i % 3], estado='p',
+                                         fecha_prestamo=date(2024, 1, 1) + timedelta(days=i % 20),
+                                         fecha_max=date(2024, 1, 15))
+            Multa.objects.create(prestamo=p, tipo_multa='deterioro', monto=3, fecha=date(2024, 2, 1))
+
+    def comprobar(self, presupuestos):
+        for filas in (2, 20):
+            self.poblar(filas)
+            for nombre, maximo in presupuestos.items():
+                with self.subTest(vista=nombre, filas=filas):
+                    caches['paginas'].clear()
+                    with self.assertPresupuestoConsultas(maximo):
+                        self.assertEqual(self.client.get(reverse(nombre)).status_code, 200)
+
+    def test_listados(self):
+        # libro_list y lista_autores leen además los permisos del usuario (botones de la
+        # tabla y variante de la caché de fragmentos)
+        self.comprobar({'lista_prestamos': 5, 'lista_multas': 5, 'libro_list': 6, 'lista_autores': 6})
+
+    def test_api(self):
+        self.comprobar({'libros-api-list': 5, 'prestamos-api-list': 5})
+
+    def test_el_fallo_agrupa_por_huella(self):
+        self.poblar(3)
+        with self.assertRaisesMessage(AssertionError, 'el presupuesto es 1') as error:
+            with self.assertPresupuestoConsultas(1):
+                for libro in Libro.objects.all():
+                    libro.autor.nombre
+        self.assertIn('3 x SELECT', str(error.exception))
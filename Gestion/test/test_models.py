@@ -1,3 +1,7 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 from Gestion.models import Autor, Libro, Prestamos, Multa
 from django.contrib.auth.models import User
@@ -71,4 +75,41 @@ class VistasPrivadasTest(TestCase):
         # El admin sí debe poder entrar
         self.client.login(username='admin_test', password='adminpassword')
         response = self.client.get(reverse('lista_multas'))
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+
+class AutorClaveTest(TestCase):
+    def test_clave_normalizada(self):
+        autor = Autor.objects.create(nombre="  Ursula K.", apellido="Le  Guin ")
+        self.assertEqual(autor.clave, "ursula k.|le guin")
+        self.assertEqual(Autor.objects.por_nombre("URSULA K.", "le guin").get(), autor)
+
+    def test_duplicado_por_mayusculas(self):
+        Autor.objects.create(nombre="Rosalía", apellido="de Castro")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Autor.objects.create(nombre="ROSALÍA", apellido="De Castro")
+        autor, creado = Autor.objects.obtener_o_crear("rosalía", "DE CASTRO")
+        self.assertFalse(creado)
+        self.assertEqual(autor.nombre, "Rosalía")
+
+    def test_busqueda_usa_el_indice(self):
+        sql, params = Autor.objects.por_nombre("a", "b").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = ' '.join(str(fila) for fila in cursor.fetchall())
+        self.assertIn("USING INDEX", plan)
+        self.assertNotIn("SCAN", plan)
+
+    def test_migracion_fusiona_duplicados(self):
+        autor = Autor.objects.create(nombre="Emilia", apellido="Pardo Bazán")
+        copia = Autor.objects.create(nombre="EMILIA", apellido="pardo bazán x", bibliografia="Los pazos de Ulloa")
+        Autor.objects.filter(pk=copia.pk).update(apellido="pardo bazán", clave="antigua")
+        libro = Libro.objects.create(titulo="La Tribuna", isbn="9788437601113", autor=copia)
+
+        import_module('Gestion.migrations.0035_autor_clave').fusionar_duplicados(apps, None)
+
+        self.assertFalse(Autor.objects.filter(pk=copia.pk).exists())
+        libro.refresh_from_db()
+        autor.refresh_from_db()
+        self.assertEqual(libro.autor_id, autor.pk)
+        self.assertEqual(autor.bibliografia, "Los pazos de Ulloa")
@@ -0,0 +1,163 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth.models import Group, User
+from Gestion import openlibrary
+from Gestion.models import Autor, IsbnDesconocido, Libro, RespuestaOpenLibrary
+from Gestion.roles import BODEGA
+
+LIBRO_OL = {
+    "ISBN:0451524934": {
+        "title": "1984",
+        "notes": "Distopía clásica.",
+        "authors": [{"name": "George Orwell", "url": "https://openlibrary.org/authors/OL118077A/George_Orwell"}],
+    }
+}
+AUTOR_OL = {"bio": {"type": "/type/text", "value": "Escritor británico."}}
+
+
+class RespuestaStub:
+    def __init__(self, status_code, datos=None, content=b''):
+        self.status_code = status_code
+        self._datos = datos
+        self.content = content
+
+    def json(self):
+        return self._datos
+
+
+class TransporteStub:
+    """Hace de Open Library: responde desde un diccionario y anota cada URL pedida."""
+
+    def __init__(self, rutas):
+        self.rutas = rutas
+        self.pedidas = []
+
+    def get(self, url, timeout=None):
+        self.pedidas.append(url)
+        for fragmento, datos in self.rutas.items():
+            if fragmento in url:
+                return RespuestaStub(200, datos)
+        return RespuestaStub(404)
+
+
+class ClienteOpenLibraryTest(TestCase):
+    def setUp(self):
+        self.transporte = TransporteStub({'ISBN:0451524934': LIBRO_OL, '/authors/OL118077A': AUTOR_OL})
+        self.cliente = openlibrary.ClienteOpenLibrary(transporte=self.transporte, URL_BASE='http://ol.local')
+
+    def test_segunda_consulta_sale_de_cache(self):
+        self.assertEqual(self.cliente.libro('0451524934')['title'], '1984')
+        self.assertEqual(self.cliente.libro('0451524934')['title'], '1984')
+        self.assertEqual(len(self.transporte.pedidas), 1)
+        self.assertEqual(self.cliente.estadisticas()['aciertos'], 1)
+        self.assertEqual(self.cliente.estadisticas()['fallos'], 1)
+
+    def test_entrada_expirada_se_vuelve_a_pedir(self):
+        self.cliente.libro('0451524934')
+        RespuestaOpenLibrary.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        self.cliente.libro('0451524934')
+        self.assertEqual(len(self.transporte.pedidas), 2)
+
+    def test_tope_de_entradas(self):
+        cliente = openlibrary.ClienteOpenLibrary(transporte=self.transporte, MAX_ENTRADAS=3)
+        for i in range(6):
+            cliente._guardar_cache(f"http://ol.local/x/{i}", {'i': i})
+        cliente.purgar_cache()
+        self.assertEqual(RespuestaOpenLibrary.objects.count(), 3)
+
+    def test_biografia_y_nombre(self):
+        self.assertEqual(self.cliente.biografia('OL118077A'), 'Escritor británico.')
+        autor = LIBRO_OL['ISBN:0451524934']['authors'][0]
+        self.assertEqual(openlibrary.ol_id_autor(autor), 'OL118077A')
+        self.assertEqual(openlibrary.separar_nombre('Platón'), ('Platón', '.'))
+
+
+class LibroApiOpenLibraryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='api_user', password='password123')
+
+    def test_retrieve_importa_desde_open_library(self):
+        transporte = TransporteStub({'ISBN:0451524934': LIBRO_OL, '/authors/OL118077A': AUTOR_OL})
+        cliente = openlibrary.ClienteOpenLibrary(transporte=transporte)
+        self.client.login(username='api_user', password='password123')
+        with mock.patch.object(openlibrary, '_cliente', cliente):
+            resp = self.client.get(reverse('libros-api-detail', args=['0451524934']))
+            self.assertEqual(resp.status_code, 201)
+            resp = self.client.get(reverse('libros-api-detail', args=['9999999999']))
+            self.assertEqual(resp.status_code, 404)
+
+        libro = Libro.objects.get(isbn='0451524934')
+        self.assertEqual(libro.autor.apellido, 'Orwell')
+        self.assertEqual(Autor.objects.get(apellido='Orwell').bibliografia, 'Escritor británico.')
+
+
+class CacheNegativaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='escaner', password='password123')
+        cls.user.groups.add(Group.objects.create(name=BODEGA))
+
+    def setUp(self):
+        # Open Library responde 200 con {} a los ISBN que no conoce
+        self.transporte = TransporteStub({'ISBN:0451524934': LIBRO_OL, 'ISBN:9999999999': {}})
+        self.cliente = openlibrary.ClienteOpenLibrary(transporte=self.transporte, URL_BASE='http://ol.local')
+
+    def test_isbn_desconocido_se_responde_sin_red(self):
+        for _ in range(3):
+            self.assertIsNone(self.cliente.libro('9999999999'))
+        self.assertEqual(len(self.transporte.pedidas), 1)
+        self.assertEqual(IsbnDesconocido.objects.get().consultas, 2)
+        self.assertEqual(self.cliente.estadisticas()['negativos'], 2)
+        # La respuesta vacía no ocupa sitio en la caché de respuestas
+        self.assertFalse(RespuestaOpenLibrary.objects.exists())
+
+    def test_un_error_no_se_recuerda(self):
+        self.assertIsNone(self.cliente.libro('1111111111'))  # 404 del stub: no sabemos nada
+        self.assertFalse(IsbnDesconocido.objects.exists())
+
+    def test_ttl_propio(self):
+        cliente = openlibrary.ClienteOpenLibrary(transporte=self.transporte, TTL_NEGATIVO=60)
+        cliente.libro('9999999999')
+        entrada = IsbnDesconocido.objects.get()
+        self.assertAlmostEqual((entrada.expira - entrada.creado).total_seconds(), 60, delta=1)
+        IsbnDesconocido.objects.update(expira=timezone.now() - timedelta(seconds=1))
+        cliente.libro('9999999999')
+        self.assertEqual(len(self.transporte.pedidas), 2)
+
+    def test_tope_lru(self):
+        cliente = openlibrary.ClienteOpenLibrary(transporte=TransporteStub({'ISBN:': {}}), MAX_NEGATIVOS=2)
+        for isbn in ('1000000001', '1000000002', '1000000003'):
+            cliente.libro(isbn)
+        IsbnDesconocido.objects.filter(isbn='1000000001').update(ultimo_acceso=timezone.now() - timedelta(hours=1))
+        cliente.libro('1000000002')  # consultado ahora: es el último en irse
+        IsbnDesconocido.objects.filter(isbn='1000000003').update(ultimo_acceso=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(cliente.purgar_cache(), {'respuestas': 0, 'negativos': 1})
+        self.assertEqual(set(IsbnDesconocido.objects.values_list('isbn', flat=True)), {'1000000002', '1000000003'})
+
+    def test_retrieve_y_crear_libro_comparten_la_cache(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(openlibrary, '_cliente', self.cliente):
+            for _ in range(2):
+                self.assertEqual(self.client.get(reverse('libros-api-detail', args=['9999999999'])).status_code, 404)
+                resp = self.client.post(reverse('crear_libro'), {'buscar_api': '', 'isbn': '9999999999'})
+                self.assertContains(resp, 'no devolvió resultados')
+        self.assertEqual(len(self.transporte.pedidas), 1)
+        self.assertEqual(IsbnDesconocido.objects.get().consultas, 3)
+
+    def test_comando_purgar(self):
+        for isbn in ('9999999999', '8888888888'):
+            openlibrary.ClienteOpenLibrary(transporte=TransporteStub({'ISBN:': {}})).libro(isbn)
+        IsbnDesconocido.objects.filter(isbn='8888888888').update(expira=timezone.now())
+        salida = StringIO()
+        call_command('purgar_openlibrary', stdout=salida)
+        self.assertEqual(list(IsbnDesconocido.objects.values_list('isbn', flat=True)), ['9999999999'])
+        call_command('purgar_openlibrary', '--isbn', '9999999999', stdout=salida)
+        self.assertFalse(IsbnDesconocido.objects.exists())
+        self.assertIn('1 ISBN desconocidos borrados', salida.getvalue())
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from Gestion import portadas
+from Gestion.models import Autor, Libro
+
+MEDIA_PRUEBAS = tempfile.mkdtemp()
+
+
+def imagen(color, tamano=(800, 1200)):
+    buffer = BytesIO()
+    Image.new('RGB', tamano, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_PRUEBAS, PORTADAS_ASINCRONO=False)
+class PortadasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        autor = Autor.objects.create(nombre="Julio", apellido="Verne")
+        cls.libro_a = Libro.objects.create(titulo="Veinte mil leguas", isbn="8435015742", autor=autor)
+        cls.libro_b = Libro.objects.create(titulo="La vuelta al mundo", isbn="8401499976", autor=autor)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_PRUEBAS, ignore_errors=True)
+        super().tearDownClass()
+
+    def archivos(self):
+        return sorted(os.listdir(os.path.join(MEDIA_PRUEBAS, 'portadas')))
+
+    def test_renditions_y_tamanos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            portadas.encolar(self.libro_a.pk, contenido=imagen('red'))
+        self.libro_a.refresh_from_db()
+
+        self.assertEqual(len(self.libro_a.portada_hash), 64)
+        for rendicion, (ancho, alto) in portadas.RENDICIONES.items():
+            for formato in portadas.FORMATOS:
+                ruta = portadas.nombre_archivo(self.libro_a.portada_hash, rendicion, formato)
+                with default_storage.open(ruta) as f:
+                    self.assertEqual(Image.open(f).size, (ancho, alto))
+        self.assertTrue(self.libro_a.portadas['miniatura']['webp'].endswith('_miniatura.webp'))
+        # La portada sale en la API: cambia la versión de su ETag
+        self.assertGreater(self.libro_a.actualizado, self.libro_b.actualizado)
+
+    def test_portada_repetida_se_guarda_una_vez(self):
+        contenido = imagen('blue')
+        portadas.asignar_portada(self.libro_a.pk, contenido)
+        antes = self.archivos()
+        portadas.asignar_portada(self.libro_b.pk, contenido)
+        self.assertEqual(self.archivos(), antes)
+        self.assertEqual(
+            Libro.objects.get(pk=self.libro_a.pk).portada_hash,
+            Libro.objects.get(pk=self.libro_b.pk).portada_hash,
+        )
+
+    def test_comando_procesa_portadas_antiguas(self):
+        ruta = default_storage.save('portadas/portada_8401499976.jpg', ContentFile(imagen('green')))
+        Libro.objects.filter(pk=self.libro_b.pk).update(portada=ruta)
+        call_command('procesar_portadas', stdout=open(os.devnull, 'w'))
+        self.libro_b.refresh_from_db()
+        self.assertNotEqual(self.libro_b.portada_hash, '')
+
+    def test_un_solo_ejecutor_con_hilos_simultaneos(self):
+        def pool_lento(**opciones):
+            time.sleep(0.05)  # ensancha la ventana entre comprobar y asignar
+            return mock.Mock()
+
+        barrera = threading.Barrier(8)
+        vistos = []
+
+        def pedir():
+            barrera.wait()
+            vistos.append(portadas._obtener_ejecutor())
+
+        with mock.patch.object(portadas, '_ejecutor', None), \
+                mock.patch.object(portadas, 'ThreadPoolExecutor', side_effect=pool_lento) as creado:
+            hilos = [threading.Thread(target=pedir) for _ in range(8)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        self.assertEqual(creado.call_count, 1)
+        self.assertEqual(len({id(ejecutor) for ejecutor in vistos}), 1)
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from Gestion import views
+from Gestion.models import Autor, Libro, Prestamos
+from Gestion.roles import BIBLIOTECARIO
+
+HOY = date(2024, 6, 15)
+
+
+class PrestamosQuerySetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='biblio', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.socio = User.objects.create_user(username='socio', password='password123')
+        autor = Autor.objects.create(nombre="Emilia", apellido="Pardo Bazán")
+        libro = Libro.objects.create(titulo="Los pazos de Ulloa", isbn="9788437603100", autor=autor, cantidad_total=10)
+        casos = [
+            # (fecha_max, fecha_devolucion, multa_fija, usuario)
+            (HOY - timedelta(days=7), None, Decimal('0'), cls.socio),                          # 7 días y contando
+            (HOY - timedelta(days=20), HOY - timedelta(days=15), Decimal('2'), cls.socio),     # devuelto con 5 días
+            (HOY - timedelta(days=3), HOY - timedelta(days=10), Decimal('0'), cls.staff),      # devuelto a tiempo
+            (HOY + timedelta(days=4), None, Decimal('0'), cls.staff),                          # en plazo
+            (None, None, Decimal('1.5'), cls.staff),                                           # solicitud sin fecha
+            (HOY - timedelta(days=2), None, Decimal('0'), cls.staff),
+        ]
+        cls.prestamos = [
+            Prestamos.objects.create(libro=libro, usuario=u, fecha_prestamo=HOY - timedelta(days=30),
+                                     fecha_max=fmax, fecha_devolucion=fdev, multa_fija=fija)
+            for fmax, fdev, fija, u in casos
+        ]
+
+    def test_coincide_con_las_propiedades(self):
+        hoy = timezone.now().date()
+        for p in Prestamos.objects.with_multa(hoy):
+            self.assertEqual(p.retraso, p.dias_retraso, p.pk)
+            self.assertEqual(p.multa_acumulada, p.multa_total, p.pk)
+
+    def test_filtra_y_ordena_en_sql(self):
+        qs = Prestamos.objects.with_multa(HOY).filter(retraso__gt=0).order_by('-retraso')
+        self.assertEqual([p.retraso for p in qs], [7, 5, 2])
+        self.assertEqual([p.multa_acumulada for p in qs], [Decimal('3.50'), Decimal('4.50'), Decimal('1.00')])
+        self.assertEqual(Prestamos.objects.with_multa(HOY).order_by('-multa_acumulada').first().pk, self.prestamos[1].pk)
+
+    def test_atrasados_sin_calcular_el_retraso(self):
+        atrasados = Prestamos.objects.atrasados(HOY)
+        self.assertNotIn('retraso', atrasados.query.annotations)
+        self.assertEqual(set(atrasados), set(Prestamos.objects.with_retraso(HOY).filter(retraso__gt=0)))
+
+    def hoy_fijo(self):
+        return mock.patch('django.utils.timezone.now', return_value=timezone.make_aware(timezone.datetime(2024, 6, 15, 12)))
+
+    def test_listado_ordenado_por_multa_paginado(self):
+        self.client.login(username='biblio', password='password123')
+        # Una fila por página para que el cursor viaje con la multa anotada
+        with self.hoy_fijo(), mock.patch.object(views._pagina_keyset, '__defaults__', (1,)):
+            vistos, params = [], {'orden': 'multa', 'atrasados': '1'}
+            while True:
+                resp = self.client.get(reverse('lista_prestamos'), params)
+                vistos += [p.multa_acumulada for p in resp.context['prestamos']]
+                if not resp.context['page_obj'].has_next():
+                    break
+                params['despues'] = resp.context['page_obj'].cursor_siguiente
+        self.assertEqual(vistos, [Decimal('4.50'), Decimal('3.50'), Decimal('1.00')])
+        self.assertContains(resp, 'de retraso')
+
+    def test_admin_ordena_por_retraso(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password123')
+        self.client.force_login(admin)
+        with self.hoy_fijo():
+            resp = self.client.get(reverse('admin:Gestion_prestamos_changelist'), {'con_retraso': 'si', 'o': '-6'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([p.retraso for p in resp.context['cl'].result_list], [7, 5, 2])
+
+    def test_api_filtra_ordena_y_respeta_al_socio(self):
+        self.client.login(username='socio', password='password123')
+        with self.hoy_fijo():
+            resp = self.client.get('/api/prestamos-api/', {'ordering': '-multa'})
+        self.assertEqual([p['retraso'] for p in resp.json()['results']], [5, 7])
+
+        self.client.login(username='biblio', password='password123')
+        with self.hoy_fijo():
+            resp = self.client.get('/api/prestamos-api/', {'retraso_min': '3', 'ordering': 'retraso'})
+        datos = resp.json()['results']
+        self.assertEqual([(p['retraso'], p['multa_acumulada']) for p in datos], [(5, '4.50'), (7, '3.50')])
+
+    def test_api_pagina_con_cursores(self):
+        self.client.login(username='biblio', password='password123')
+        vistos, url = [], '/api/prestamos-api/?ordering=-retraso&page_size=2'
+        with self.hoy_fijo():
+            while url:
+                datos = self.client.get(url).json()
+                self.assertNotIn('count', datos)
+                vistos += [(p['id'], p['retraso']) for p in datos['results']]
+                anterior, url = datos['previous'], datos['next']
+            # Los empates (retraso 0) se deshacen por id dentro del cursor, sin OFFSET
+            self.assertEqual([r for _, r in vistos], [7, 5, 2, 0, 0, 0])
+            self.assertEqual(len({pk for pk, _ in vistos}), 6)
+            self.assertEqual([(p['id'], p['retraso']) for p in self.client.get(anterior).json()['results']],
+                             vistos[2:4])
+            self.assertEqual(self.client.get('/api/prestamos-api/', {'despues': 'roto'}).status_code, 404)
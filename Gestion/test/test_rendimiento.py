@@ -0,0 +1,106 @@
+from datetime import date
+
+from django.contrib.auth.models import Group, User
+from django.db.models import Count, Q, Sum
+from django.test import SimpleTestCase, TestCase
+from Gestion import datos_sinteticos, rendimiento
+from Gestion.models import Autor, EstadisticaLibroDia, Libro, Multa, Prestamos, SaldoUsuario
+from Gestion.roles import BIBLIOTECARIO
+
+HOY = date(2024, 6, 1)
+TAMANOS = {'autores': 10, 'libros': 40, 'usuarios': 15, 'prestamos': 600, 'multas': 30}
+
+
+class DatosSinteticosTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cantidades = datos_sinteticos.generar(**TAMANOS, semilla=7, lote=100, hoy=HOY)
+
+    def test_cantidades(self):
+        self.assertEqual(self.cantidades, TAMANOS)
+        self.assertEqual(Autor.objects.count(), 10)
+        self.assertEqual(Libro.objects.count(), 40)
+        self.assertEqual(Prestamos.objects.count(), 600)
+        self.assertEqual(Multa.objects.count(), 30)
+
+    def test_stock_coherente_con_los_prestamos(self):
+        libros = Libro.objects.annotate(en_curso=Count('prestamos', filter=Q(prestamos__estado='p')))
+        for libro in libros:
+            self.assertGreaterEqual(libro.ejemplares_disponibles, 0)
+            self.assertEqual(libro.ejemplares_disponibles, libro.cantidad_total - libro.en_curso)
+            self.assertEqual(libro.disponible, libro.ejemplares_disponibles > 0)
+
+    def test_estados_y_fechas(self):
+        self.assertFalse(Prestamos.objects.filter(fecha_prestamo__gt=HOY).exists())
+        self.assertFalse(Prestamos.objects.filter(fecha_devolucion__gt=HOY).exists())
+        # Devueltos tarde quedan en 'm'; en plazo, en 'd'
+        for p in Prestamos.objects.filter(estado__in=('d', 'm')):
+            self.assertEqual(p.estado == 'm', p.fecha_devolucion > p.fecha_max)
+        self.assertFalse(Prestamos.objects.filter(estado='p', fecha_devolucion__isnull=False).exists())
+
+    def test_multas_de_prestamos_con_retraso_y_saldos(self):
+        for multa in Multa.objects.select_related('prestamo'):
+            self.assertEqual(multa.tipo_multa, 'retraso')
+            self.assertIn(multa.prestamo.estado, ('m', 'p'))
+            self.assertGreater(multa.monto, 0)
+            if multa.prestamo.estado == 'm':
+                self.assertEqual(multa.monto, multa.prestamo.multa_total)
+        pendiente = Multa.objects.filter(pagada=False).aggregate(t=Sum('monto'))['t'] or 0
+        self.assertEqual(SaldoUsuario.objects.aggregate(t=Sum('saldo'))['t'] or 0, pendiente)
+        self.assertTrue(EstadisticaLibroDia.objects.exists())
+
+    def test_determinista(self):
+        def secuencia():
+            generador = datos_sinteticos.Generador(semilla=7, sesgo=1.0, hoy=HOY)
+            generador.usuarios = list(range(1, 16))
+            generador.stock = dict.fromkeys(range(1, 41), 2)
+            generador.popularidad(range(1, 41))
+            return [(p.libro_id, p.usuario_id, p.estado, p.fecha_prestamo, p.fecha_devolucion)
+                    for p in generador.lote_prestamos(200)]
+        self.assertEqual(secuencia(), secuencia())
+
+
+class MedirTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        datos_sinteticos.generar(**TAMANOS, semilla=1, lote=100)
+        cls.personal = User.objects.create_user('bibliotecaria')
+        cls.personal.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.socio = User.objects.create_user('socio_sin_multas')
+
+    def test_recorre_todos_los_escenarios(self):
+        self.client.force_login(self.personal)
+        en_curso = Prestamos.objects.filter(estado='p').count()
+        resultados = rendimiento.medir(self.client, rendimiento.escenarios(self.socio.pk), repeticiones=3, calentamiento=1)
+        self.assertEqual(set(resultados), {
+            'libro_list', 'libro_list_profunda', 'libro_detalle', 'lista_prestamos', 'lista_prestamos_atrasados',
+            'lista_multas', 'api_libros_lista', 'api_libros_detalle', 'crear_prestamo', 'devolver_libro',
+        })
+        for r in resultados.values():
+            self.assertGreater(r['consultas'], 0)
+            self.assertLessEqual(r['p50_ms'], r['p95_ms'])
+            self.assertLessEqual(r['p95_ms'], r['max_ms'])
+        # Cuatro préstamos y cuatro devoluciones: queda lo mismo en curso
+        self.assertEqual(Prestamos.objects.filter(estado='p').count(), en_curso)
+        self.assertEqual(Prestamos.objects.filter(usuario=self.socio, estado='d').count(), 4)
+
+    def test_estado_inesperado(self):
+        # Sin sesión las vistas redirigen al login
+        with self.assertRaisesMessage(AssertionError, 'libro_list'):
+            rendimiento.medir(self.client, rendimiento.escenarios(self.socio.pk)[:1], repeticiones=1)
+
+
+class CompararTest(SimpleTestCase):
+    BASE = {'libro_list': {'p95_ms': 20.0, 'consultas': 5}}
+
+    def test_dentro_del_umbral(self):
+        self.assertEqual(rendimiento.comparar({'libro_list': {'p95_ms': 34.0, 'consultas': 5}}, self.BASE), [])
+
+    def test_latencia_y_consultas(self):
+        regresiones = rendimiento.comparar({'libro_list': {'p95_ms': 36.0, 'consultas': 6}}, self.BASE)
+        self.assertEqual(len(regresiones), 2)
+        self.assertIn('p95', regresiones[0])
+        self.assertIn('6 consultas', regresiones[1])
+
+    def test_escenarios_nuevos_no_se_comparan(self):
+        self.assertEqual(rendimiento.comparar({'nuevo': {'p95_ms': 999.0, 'consultas': 99}}, self.BASE), [])
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from Gestion import roles
+
+
+class RolesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bibliotecario = Group.objects.create(name=roles.BIBLIOTECARIO)
+        cls.bodega = Group.objects.create(name=roles.BODEGA)
+        cls.user = User.objects.create_user(username='ana', password='password123')
+        cls.user.groups.add(cls.bibliotecario)
+
+    def consultas_de_grupos(self, consultas):
+        return [q for q in consultas.captured_queries if 'auth_user_groups' in q['sql']]
+
+    def test_una_sola_consulta_de_grupos_por_peticion(self):
+        self.client.login(username='ana', password='password123')
+        for nombre in ('lista_multas', 'lista_prestamos', 'index'):
+            with CaptureQueriesContext(connection) as consultas:
+                resp = self.client.get(reverse(nombre))
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(len(self.consultas_de_grupos(consultas)), 1, nombre)
+
+    def test_memoriza_en_el_usuario(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(roles.tiene_rol(user, roles.BIBLIOTECARIO))
+            self.assertFalse(roles.tiene_rol(user, roles.BODEGA))
+
+    @override_settings(ROLES_CACHE_TIMEOUT=300)
+    def test_cache_entre_peticiones_se_invalida(self):
+        roles.invalidar(self.user.pk)
+        self.assertEqual(roles.roles_de(User.objects.get(pk=self.user.pk)), {roles.BIBLIOTECARIO})
+        with self.assertNumQueries(1):  # solo la del usuario; los grupos salen de la caché
+            roles.roles_de(User.objects.get(pk=self.user.pk))
+
+        self.user.groups.add(self.bodega)
+        self.assertEqual(roles.roles_de(User.objects.get(pk=self.user.pk)), {roles.BIBLIOTECARIO, roles.BODEGA})
+
+        self.bodega.user_set.remove(self.user)
+        self.assertEqual(roles.roles_de(User.objects.get(pk=self.user.pk)), {roles.BIBLIOTECARIO})
+
+        self.bibliotecario.delete()
+        self.assertEqual(roles.roles_de(User.objects.get(pk=self.user.pk)), frozenset())
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from Gestion import saldos
+from Gestion.models import Autor, Libro, MovimientoMulta, Multa, Prestamos, SaldoUsuario
+from Gestion.roles import BIBLIOTECARIO
+
+
+class SaldosTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='biblio', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.socio = User.objects.create_user(username='socio', password='password123')
+        autor = Autor.objects.create(nombre="Miguel", apellido="Delibes")
+        cls.libro = Libro.objects.create(titulo="El camino", isbn="9788423300000", autor=autor, cantidad_total=5)
+
+    def setUp(self):
+        self.client.login(username='biblio', password='password123')
+        self.prestamo = Prestamos.objects.create(libro=self.libro, usuario=self.socio, estado='p')
+
+    def libro_mayor(self):
+        return list(MovimientoMulta.objects.filter(usuario=self.socio).order_by('id')
+                    .values_list('tipo', 'monto', 'saldo_resultante'))
+
+    def test_cargo_ajuste_y_pago(self):
+        multa = Multa.objects.create(prestamo=self.prestamo, tipo_multa='deterioro', monto=Decimal('5.00'))
+        multa.monto = Decimal('7.00')
+        multa.save()
+        self.client.get(reverse('pagar_multa', args=[multa.pk]))
+        self.client.get(reverse('pagar_multa', args=[multa.pk]))  # doble clic: no cobra dos veces
+        self.assertEqual(self.libro_mayor(), [
+            ('cargo', Decimal('5.00'), Decimal('5.00')),
+            ('ajuste', Decimal('2.00'), Decimal('7.00')),
+            ('pago', Decimal('-7.00'), Decimal('0.00')),
+        ])
+        self.assertEqual(saldos.saldo(self.socio.pk), Decimal('0.00'))
+
+    def test_saldo_es_una_sola_fila(self):
+        for tipo in ('deterioro', 'perdida'):
+            Multa.objects.create(prestamo=self.prestamo, tipo_multa=tipo, monto=Decimal('4.00'))
+        with self.assertNumQueries(1):
+            self.assertEqual(saldos.saldo(self.socio.pk), Decimal('8.00'))
+        self.assertEqual(saldos.saldo(self.staff.pk), Decimal('0.00'))
+
+    def test_borrar_multa_pendiente(self):
+        multa = Multa.objects.create(prestamo=self.prestamo, tipo_multa='deterioro', monto=Decimal('5.00'))
+        multa.delete()
+        self.assertEqual(self.libro_mayor()[-1], ('ajuste', Decimal('-5.00'), Decimal('0.00')))
+        self.assertEqual(MovimientoMulta.objects.filter(multa__isnull=False).count(), 0)
+
+    def test_generar_multas_apunta_en_el_libro_mayor(self):
+        Prestamos.objects.filter(pk=self.prestamo.pk).update(fecha_max=timezone.now().date() - timedelta(days=4))
+        call_command('generar_multas', stdout=StringIO())
+        hoy = timezone.now().date()
+        call_command('generar_multas', stdout=StringIO(), fecha=(hoy + timedelta(days=2)).isoformat())
+        self.assertEqual(self.libro_mayor(), [
+            ('cargo', Decimal('2.00'), Decimal('2.00')),
+            ('ajuste', Decimal('1.00'), Decimal('3.00')),
+        ])
+
+    @override_settings(LIMITE_DEUDA_PRESTAMOS='6.00')
+    def test_bloquea_prestamos_por_encima_del_limite(self):
+        datos = {'libro': self.libro.pk, 'usuario': self.socio.pk}
+        Multa.objects.create(prestamo=self.prestamo, tipo_multa='deterioro', monto=Decimal('5.00'))
+        self.client.post(reverse('crear_prestamo'), datos)
+        self.assertEqual(Prestamos.objects.count(), 2)
+
+        Multa.objects.create(prestamo=self.prestamo, tipo_multa='perdida', monto=Decimal('9.00'))
+        resp = self.client.post(reverse('crear_prestamo'), datos)
+        self.assertRedirects(resp, reverse('lista_multas'))
+        self.assertEqual(Prestamos.objects.count(), 2)
+
+    def test_reconstruir_corrige_con_un_ajuste(self):
+        Multa.objects.create(prestamo=self.prestamo, tipo_multa='deterioro', monto=Decimal('5.00'))
+        SaldoUsuario.objects.filter(usuario=self.socio).update(saldo=Decimal('1.00'))  # descuadre
+        out = StringIO()
+        call_command('reconstruir_saldos', stdout=out)
+        self.assertIn('1 saldos corregidos', out.getvalue())
+        self.assertEqual(saldos.saldo(self.socio.pk), Decimal('5.00'))
+        self.assertEqual(saldos.reconstruir(), 0)
+
+    def test_socio_ve_su_saldo(self):
+        Multa.objects.create(prestamo=self.prestamo, tipo_multa='deterioro', monto=Decimal('5.00'))
+        self.client.login(username='socio', password='password123')
+        self.assertContains(self.client.get(reverse('lista_multas')), '<strong>$5,00</strong>', html=True)
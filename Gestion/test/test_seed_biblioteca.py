@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Q
+from django.test import TestCase
+from Gestion.models import (Autor, EstadisticaMultasDia, Libro, MovimientoMulta, Multa,
+                            Prestamos, SaldoUsuario)
+
+
+class SeedBibliotecaTest(TestCase):
+    def sembrar(self, *argumentos):
+        salida = StringIO()
+        call_command('seed_biblioteca', '--books', '200', '--loans', '4000', '--lote', '500', *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_volumenes_y_estados(self):
+        salida = self.sembrar()
+        self.assertIn('4000 prestamos', salida)
+        self.assertEqual(Libro.objects.count(), 200)
+        self.assertEqual(Autor.objects.count(), 40)
+        self.assertEqual(Prestamos.objects.count(), 4000)
+        self.assertEqual(set(Prestamos.objects.values_list('estado', flat=True)), {'p', 's', 'm', 'd', 'r'})
+        # Cada devolución tardía tiene su multa, como en devolver_libro
+        self.assertFalse(Prestamos.objects.filter(estado='m', multas__isnull=True).exists())
+        # Una parte de los préstamos en curso está vencida y ya tiene su multa pendiente
+        hoy = Prestamos.objects.order_by('-fecha_prestamo').values_list('fecha_prestamo', flat=True).first()
+        en_curso = Prestamos.objects.filter(estado='p')
+        vencidos = en_curso.filter(fecha_max__lt=hoy)
+        self.assertAlmostEqual(vencidos.count() / en_curso.count(), 0.25, delta=0.1)
+        self.assertEqual(Multa.objects.filter(prestamo__in=vencidos, pagada=False).count(), vencidos.count())
+
+    def test_stock_cuadra(self):
+        self.sembrar()
+        for libro in Libro.objects.annotate(en_curso=Count('prestamos', filter=Q(prestamos__estado='p'))):
+            self.assertEqual(libro.ejemplares_disponibles, libro.cantidad_total - libro.en_curso)
+            self.assertGreaterEqual(libro.ejemplares_disponibles, 0)
+
+    def test_titulos_populares(self):
+        self.sembrar('--sesgo', '1.0')
+        por_libro = sorted(Libro.objects.annotate(n=Count('prestamos')).values_list('n', flat=True), reverse=True)
+        # Con Zipf (s=1) el 10 % de los títulos se lleva bastante más de la mitad de la circulación
+        self.assertGreater(sum(por_libro[:20]), 0.5 * sum(por_libro))
+
+    def test_misma_semilla_mismos_datos(self):
+        def prestamos():
+            return list(Prestamos.objects.order_by('id').values_list('estado', 'fecha_prestamo', 'libro__isbn',
+                                                                     'usuario__username'))
+        self.sembrar('--seed', '3')
+        primeros = prestamos()
+        with self.assertRaisesMessage(CommandError, 'semilla 3'):
+            self.sembrar('--seed', '3')
+        # Borrar multas apunta movimientos de saldo (señales): el libro mayor va después
+        for modelo in (Multa, Prestamos, Libro, Autor, EstadisticaMultasDia, MovimientoMulta, SaldoUsuario, User):
+            modelo.objects.all().delete()
+        self.sembrar('--seed', '3')
+        self.assertEqual(prestamos(), primeros)
+
+    def test_opciones_invalidas(self):
+        with self.assertRaises(CommandError):
+            self.sembrar('--vencidos', '1.5')
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from Gestion.rendimiento import percentil
+
+
+class PerfilSqliteTest(TestCase):
+    def pragma(self, nombre):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {nombre}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_en_cada_conexion(self):
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -20000)
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class BenchmarkSqliteTest(SimpleTestCase):
+    def test_percentil(self):
+        valores = list(range(1, 101))
+        self.assertEqual(percentil(valores, 50), 50)
+        self.assertEqual(percentil(valores, 99), 99)
+        self.assertEqual(percentil([7], 99), 7)
+        self.assertEqual(percentil([], 99), 0.0)
+
+    def test_compara_los_dos_perfiles(self):
+        ruta = os.path.join(tempfile.mkdtemp(), 'resultado.json')
+        salida = StringIO()
+        call_command('benchmark_sqlite', '--workers', '4', '--operaciones', '30', '--json', ruta, stdout=salida)
+        with open(ruta) as f:
+            resultados = {r['perfil']: r for r in json.load(f)}
+        self.assertEqual(set(resultados), {'por_defecto', 'produccion'})
+        produccion = resultados['produccion']
+        self.assertEqual((produccion['ok'], produccion['errores']), (120, 0))
+        self.assertLessEqual(produccion['p50_ms'], produccion['p99_ms'])
+        self.assertEqual(sum(r['ok'] + r['errores'] for r in resultados.values()), 240)
+        self.assertIn('produccion', salida.getvalue())
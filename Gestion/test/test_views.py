@@ -1,7 +1,22 @@
+from django.core.cache import caches
 from django.urls import reverse
 from django.test import TestCase
-from django.contrib.auth.models import User
-from Gestion.models import Autor, Libro
+from datetime import date, timedelta
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from Gestion.models import Autor, Libro, Multa, Prestamos
+from Gestion.paginacion import KeysetPaginator
+from Gestion.views import LibroListView, ORDENES_PRESTAMOS
+from Gestion.roles import BIBLIOTECARIO
+
+def plan_de_busqueda(paginator, **cursor):
+    """EXPLAIN QUERY PLAN de la página, con los parámetros enlazados como al ejecutarla."""
+    sql, params = paginator.consulta(**cursor)[:paginator.per_page + 1].query.sql_with_params()
+    with connection.cursor() as cursor_bd:
+        cursor_bd.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return ' '.join(str(fila) for fila in cursor_bd.fetchall())
+
 
 class ListaAutorViewTest(TestCase):
     @classmethod
@@ -11,6 +26,9 @@ class ListaAutorViewTest(TestCase):
         for i in range(5):
             Autor.objects.create(nombre=f"Nombre {i}", apellido=f"Apellido {i}")
 
+    def setUp(self):
+        caches['paginas'].clear()
+
     def test_url_autores_existencias(self):
         self.client.login(username='user_autor', password='password123')
         resp = self.client.get(reverse('lista_autores')) # Asegúrate que este sea el nombre en tu urls.py
@@ -19,3 +37,167 @@ class ListaAutorViewTest(TestCase):
         self.assertEqual(len(resp.context['autores']), 5)
 
 
+
+class LibroListKeysetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='lector', password='password123')
+        autores = [Autor.objects.create(nombre=f"Autor {i}", apellido=f"Apellido {i}") for i in range(3)]
+        for i in range(23):
+            Libro.objects.create(titulo=f"Libro {i:02d}", isbn=f"{9780000000000 + i}", autor=autores[i % 3])
+
+    def recorrer(self):
+        caches['paginas'].clear()  # necesitamos el contexto de cada página, no el HTML cacheado
+        paginas, params = [], {}
+        while True:
+            resp = self.client.get(reverse('libro_list'), params)
+            paginas.append(resp)
+            if not resp.context['page_obj'].has_next():
+                return paginas
+            params = {'despues': resp.context['page_obj'].cursor_siguiente}
+
+    def test_recorre_todo_el_catalogo_en_orden(self):
+        self.client.login(username='lector', password='password123')
+        paginas = self.recorrer()
+        titulos = [l.titulo for p in paginas for l in p.context['libros']]
+        self.assertEqual(titulos, [f"Libro {i:02d}" for i in range(23)])
+        self.assertEqual(len(paginas), 5)
+
+    def test_volver_a_la_pagina_anterior(self):
+        self.client.login(username='lector', password='password123')
+        paginas = self.recorrer()
+        resp = self.client.get(reverse('libro_list'), {'antes': paginas[2].context['page_obj'].cursor_anterior})
+        self.assertEqual(list(resp.context['libros']), list(paginas[1].context['libros']))
+
+    def test_paginas_profundas_mismas_consultas(self):
+        self.client.login(username='lector', password='password123')
+        with CaptureQueriesContext(connection) as primera:
+            self.client.get(reverse('libro_list'))
+        cursor = self.recorrer()[-2].context['page_obj'].cursor_siguiente
+        caches['paginas'].clear()  # medimos la consulta, no la caché de fragmentos
+        with CaptureQueriesContext(connection) as profunda:
+            self.client.get(reverse('libro_list'), {'despues': cursor})
+        self.assertEqual(len(primera), len(profunda))
+        self.assertFalse(any('COUNT(' in q['sql'] for q in profunda.captured_queries))
+
+    def test_pagina_profunda_busca_en_el_indice(self):
+        # (titulo, id) > (x, y): el índice empieza en el cursor, sin leer ni ordenar lo que queda detrás
+        paginator = KeysetPaginator(Libro.objects.select_related('autor'), 5, ordering=LibroListView.ordering)
+        cursor = paginator.codificar(Libro.objects.get(titulo="Libro 10"))
+        for direccion in ('despues', 'antes'):
+            plan = plan_de_busqueda(paginator, **{direccion: cursor})
+            self.assertIn('SEARCH Gestion_libro USING INDEX libro_titulo_id_idx', plan, direccion)
+            self.assertNotIn('TEMP B-TREE', plan, direccion)
+            self.assertNotIn('MULTI-INDEX OR', plan, direccion)
+
+    def test_orden_con_sentidos_mezclados(self):
+        # Sin comparación de filas posible: la versión en OR debe recorrer lo mismo que el ORDER BY
+        queryset = Libro.objects.all()
+        paginator = KeysetPaginator(queryset, 4, ordering=('autor_id', '-id'))
+        vistos, pagina = [], paginator.page()
+        while True:
+            vistos += [libro.pk for libro in pagina]
+            if not pagina.has_next():
+                break
+            pagina = paginator.page(despues=pagina.cursor_siguiente)
+        self.assertEqual(vistos, list(queryset.order_by('autor_id', '-id').values_list('pk', flat=True)))
+
+    def test_cursor_invalido(self):
+        self.client.login(username='lector', password='password123')
+        resp = self.client.get(reverse('libro_list'), {'despues': '%%%'})
+        self.assertEqual(resp.status_code, 404)
+
+
+class ListadosPrestamosMultasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='biblio', password='password123')
+        cls.staff.groups.add(Group.objects.create(name=BIBLIOTECARIO))
+        cls.socio = User.objects.create_user(username='socio', password='password123')
+        autor = Autor.objects.create(nombre="Julio", apellido="Cortázar")
+        libros = [Libro.objects.create(titulo=f"Libro {i}", isbn=f"{9781000000000 + i}", autor=autor, cantidad_total=50)
+                  for i in range(5)]
+        inicio = date(2024, 1, 1)
+        for i in range(45):
+            p = Prestamos.objects.create(
+                libro=libros[i % 5], usuario=cls.staff if i % 3 else cls.socio,
+                fecha_prestamo=inicio + timedelta(days=i), estado='d' if i % 2 else 'p',
+            )
+            Multa.objects.create(prestamo=p, tipo_multa='deterioro', monto=5, pagada=bool(i % 2),
+                                 fecha=inicio + timedelta(days=i))
+
+    def recorrer(self, nombre, clave, params=None):
+        filas, params = [], dict(params or {})
+        while True:
+            resp = self.client.get(reverse(nombre), params)
+            self.assertEqual(resp.status_code, 200)
+            filas += list(resp.context[clave])
+            if not resp.context['page_obj'].has_next():
+                return filas
+            params['despues'] = resp.context['page_obj'].cursor_siguiente
+
+    def test_prestamos_recientes_primero_sin_repetir(self):
+        self.client.login(username='biblio', password='password123')
+        prestamos = self.recorrer('lista_prestamos', 'prestamos')
+        self.assertEqual(len(prestamos), 45)
+        fechas = [p.fecha_prestamo for p in prestamos]
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+    def test_filtros_se_conservan_al_paginar(self):
+        self.client.login(username='biblio', password='password123')
+        params = {'estado': 'p', 'desde': '2024-01-05'}
+        prestamos = self.recorrer('lista_prestamos', 'prestamos', params)
+        self.assertEqual(len(prestamos), 21)
+        self.assertTrue(all(p.estado == 'p' and p.fecha_prestamo >= date(2024, 1, 5) for p in prestamos))
+        resp = self.client.get(reverse('lista_prestamos'), params)
+        self.assertContains(resp, '?estado=p&amp;desde=2024-01-05&despues=')
+
+    def test_socio_solo_ve_lo_suyo(self):
+        self.client.login(username='socio', password='password123')
+        prestamos = self.recorrer('lista_prestamos', 'prestamos')
+        self.assertEqual(len(prestamos), 15)
+        self.assertTrue(all(p.usuario_id == self.socio.pk for p in prestamos))
+        multas = self.recorrer('lista_multas', 'multas', {'estado': 'pendiente'})
+        self.assertTrue(multas)
+        self.assertTrue(all(not m.pagada and m.prestamo.usuario_id == self.socio.pk for m in multas))
+
+    def test_multas_filtradas_por_fecha(self):
+        self.client.login(username='biblio', password='password123')
+        multas = self.recorrer('lista_multas', 'multas', {'hasta': '2024-01-10', 'estado': 'pagada'})
+        self.assertEqual([m.fecha.day for m in multas], [10, 8, 6, 4, 2])
+
+    def test_consultas_no_crecen_con_la_pagina(self):
+        self.client.login(username='biblio', password='password123')
+        for nombre in ('lista_prestamos', 'lista_multas'):
+            with CaptureQueriesContext(connection) as primera:
+                resp = self.client.get(reverse(nombre))
+            with CaptureQueriesContext(connection) as segunda:
+                self.client.get(reverse(nombre), {'despues': resp.context['page_obj'].cursor_siguiente})
+            self.assertEqual(len(primera), len(segunda), nombre)
+            self.assertLess(len(primera), 10, nombre)
+
+    def test_cursor_con_fecha_imposible(self):
+        self.client.login(username='biblio', password='password123')
+        paginator = KeysetPaginator(Prestamos.objects.all(), 20, ordering=ORDENES_PRESTAMOS['recientes'])
+        falso = paginator.codificar(Prestamos(fecha_prestamo='2024-02-31', id=1))
+        self.assertEqual(self.client.get(reverse('lista_prestamos'), {'despues': falso}).status_code, 404)
+
+    def test_pagina_siguiente_busca_en_el_indice(self):
+        for queryset, orden, indice in (
+            (Prestamos.objects.select_related('libro__autor', 'usuario'), ORDENES_PRESTAMOS['recientes'],
+             'prestamo_fecha_id_idx'),
+            (Multa.objects.select_related('prestamo__libro'), ('-fecha', '-id'), 'multa_fecha_id_idx'),
+        ):
+            paginator = KeysetPaginator(queryset, 20, ordering=orden)
+            plan = plan_de_busqueda(paginator, despues=paginator.codificar(queryset.order_by(*orden)[10]))
+            self.assertIn(indice, plan, indice)
+            self.assertNotIn('TEMP B-TREE', plan, indice)
+
+    def test_valores_invalidos(self):
+        self.client.login(username='biblio', password='password123')
+        resp = self.client.get(reverse('lista_prestamos'), {'estado': 'x', 'desde': '2024-02-31', 'orden': 'titulo'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['filtros'],
+                         {'estado': '', 'desde': None, 'hasta': None, 'atrasados': '', 'orden': ''})
+        resp = self.client.get(reverse('lista_multas'), {'despues': 'WyJubyJd'})
+        self.assertEqual(resp.status_code, 404)
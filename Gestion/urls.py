@@ -3,15 +3,18 @@ from .views import *
 from django.contrib.auth import views as auth_views
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from .api_views import LibroViewSet, AutorViewSet
+from .api_views import LibroViewSet, AutorViewSet, PrestamoViewSet
+from .async_views import libro_openlibrary_api, buscar_openlibrary
 
 router = DefaultRouter()
 router.register(r'libros-api', LibroViewSet, basename='libros-api')
 router.register(r'autores-api', AutorViewSet, basename='autores-api')
+router.register(r'prestamos-api', PrestamoViewSet, basename='prestamos-api')
 
 urlpatterns = [
     path('', index, name ='index'),
 
+    path('api/openlibrary/<str:isbn>/', libro_openlibrary_api, name='openlibrary-api'),
     path('api/', include(router.urls)),
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
 
@@ -21,6 +24,7 @@ urlpatterns = [
     path('libros/<int:pk>/editar/', LibroUpdateView.as_view(), name='libro_editar'),
     path('libros/<int:pk>/eliminar/', LibroDeleteView.as_view(), name='libro_eliminar'),
     path('libros/nuevo/', crear_libro, name='crear_libro'),
+    path('libros/nuevo/openlibrary/', buscar_openlibrary, name='buscar_openlibrary'),
 
     # Usuarios y Autenticación
     path('login/', auth_views.LoginView.as_view(), name='login'),
@@ -46,4 +50,11 @@ urlpatterns = [
     path('multas/', lista_multa, name='lista_multas'),
     path('multas/nuevo/<int:prestamo_id>/', crear_multa, name='crear_multa'),
     path('multas/pagar/<int:multa_id>/', pagar_multa, name='pagar_multa'),
+
+    # Estadísticas
+    path('estadisticas/', panel_estadisticas, name='estadisticas'),
+    path('estadisticas/datos/', estadisticas_json, name='estadisticas_json'),
+
+    # Exportaciones (CSV / JSON Lines en streaming)
+    path('exportar/<str:tipo>/', exportar, name='exportar'),
 ]
\ No newline at end of file
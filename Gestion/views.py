@@ -1,36 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseForbidden, Http404, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, UpdateView, DeleteView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
+from django.utils.dateparse import parse_date
+from urllib.parse import urlencode
 from django.db.models import ProtectedError
 from .models import Autor, Libro, Prestamos, Multa
 from .forms import CrearEmpleadoForm
-import requests
-from io import BytesIO
-from PIL import Image
-from django.core.files.base import ContentFile
+from .paginacion import KeysetPaginator, CursorInvalido
+from . import busqueda, cache_paginas, estadisticas, exportacion, openlibrary, portadas, saldos, stock
+from .roles import tiene_rol, roles_de, ADMINISTRADOR, BIBLIOTECARIO, BODEGA, CLIENTE
+from django.core.paginator import Paginator
 from datetime import timedelta, date
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 import re
 
 
 # --- FUNCIONES DE CHEQUEO DE GRUPOS ---
+# Los grupos se resuelven una vez por petición (ver Gestion/roles.py)
 def es_admin_o_bodega(user):
-    return user.is_superuser or user.groups.filter(name__in=['Administrador', 'Bodega']).exists()
+    return tiene_rol(user, ADMINISTRADOR, BODEGA)
 
 def es_gestion_prestamos(user):
     # Admin y Bibliotecario pueden gestionar préstamos y multas
-    return user.is_superuser or user.groups.filter(name__in=['Administrador', 'Bibliotecario']).exists()
+    return tiene_rol(user, ADMINISTRADOR, BIBLIOTECARIO)
 
 def es_admin(user):
-    return user.is_superuser or user.groups.filter(name='Administrador').exists()
+    return tiene_rol(user, ADMINISTRADOR)
 
 # --- VISTAS ---
 
@@ -48,23 +53,18 @@ def crear_libro(request):
         # --- BLOQUE 1: BUSQUEDA EN API ---
         if 'buscar_api' in request.POST:
             isbn = request.POST.get('isbn', '').strip()
-            url = f"https://openlibrary.org/api/books?bibkeys=ISBN:{isbn}&format=json&jscmd=data"
+            cliente = openlibrary.obtener_cliente()
             try:
-                response = requests.get(url, timeout=10)
-                data = response.json()
-                key = f"ISBN:{isbn}"
-                if key in data:
-                    libro_info = data[key]
+                libro_info = cliente.libro(isbn)
+                if libro_info:
                     autores_api = libro_info.get('authors', [])
                     autor_id_final = None
                     
                     if autores_api:
                         nombre_completo = autores_api[0].get('name')
-                        partes = nombre_completo.split(' ', 1)
-                        nom = partes[0]
-                        ape = partes[1] if len(partes) > 1 else "."
+                        nom, ape = openlibrary.separar_nombre(nombre_completo)
                         # Buscamos o creamos al autor para tener el ID listo
-                        autor_obj, creado = Autor.objects.get_or_create(nombre=nom, apellido=ape)
+                        autor_obj, creado = Autor.objects.obtener_o_crear(nom, ape)
                         autor_id_final = autor_obj.id
                         if creado:
                             messages.info(request, f"Nuevo autor registrado: {nombre_completo}")
@@ -74,7 +74,7 @@ def crear_libro(request):
                         'descripcion': libro_info.get('notes') or libro_info.get('description') or "Sin sinopsis.",
                         'isbn': isbn,
                         'autor_id': autor_id_final,
-                        'portada_url': f"https://covers.openlibrary.org/b/isbn/{isbn}-L.jpg"
+                        'portada_url': cliente.url_portada(isbn)
                     }
                 else:
                     messages.error(request, "El ISBN no devolvió resultados en Open Library.")
@@ -119,20 +119,13 @@ def crear_libro(request):
                         disponible=True
                     )
                     
-                    # Manejo de imagen de portada
-                    if url_imagen:
-                        try:
-                            res = requests.get(url_imagen, timeout=10)
-                            if res.status_code == 200:
-                                img = Image.open(BytesIO(res.content))
-                                if img.mode != 'RGB': img = img.convert('RGB')
-                                buffer = BytesIO()
-                                img.save(buffer, format='JPEG', quality=85)
-                                libro_instancia.portada.save(f"portada_{isbn_final}.jpg", ContentFile(buffer.getvalue()), save=False)
-                        except Exception: pass
-
                     # GUARDADO FINAL
                     libro_instancia.save()
+
+                    # La portada se descarga y redimensiona en segundo plano
+                    if url_imagen:
+                        portadas.encolar(libro_instancia.pk, url=url_imagen)
+
                     messages.success(request, "¡Libro guardado con éxito!")
                     return redirect('libro_list')
 
@@ -145,8 +138,18 @@ def crear_libro(request):
 
 
 def lista_autores(request):
-    autores = Autor.objects.all()
-    return render(request, 'Gestion/templates/autores.html', {'autores': autores})
+    q = request.GET.get('q', '').strip()
+
+    def generar():
+        if q:
+            autores = busqueda.en_orden(Autor.objects.all(), busqueda.ids_autores(q))
+        else:
+            autores = Autor.objects.all()
+        return render_to_string('Gestion/templates/fragmentos/tabla_autores.html', {'autores': autores, 'q': q}, request)
+
+    # La tabla se cachea por rol y búsqueda; las señales de Autor la invalidan
+    tabla = cache_paginas.fragmento(request, 'autores', ('autores',), (q,), generar)
+    return render(request, 'Gestion/templates/autores.html', {'tabla': tabla, 'q': q})
 
 @login_required
 @user_passes_test(es_admin_o_bodega)
@@ -168,7 +171,7 @@ def crear_autor(request, id=None):
         try:
             if autor is None:
                 # Verificamos manualmente antes de crear para dar un mensaje amigable
-                if Autor.objects.filter(nombre__iexact=nombre, apellido__iexact=apellido).exists():
+                if Autor.objects.por_nombre(nombre, apellido).exists():
                     messages.error(request, f"El autor '{nombre} {apellido}' ya existe.")
                 else:
                     Autor.objects.create(nombre=nombre, apellido=apellido, bibliografia=bibliografia)
@@ -196,23 +199,127 @@ def crear_autor(request, id=None):
     
     return render(request, 'Gestion/templates/templates_crear/crear_autor.html', context)
 
+def _fecha_o_none(valor):
+    try:
+        return parse_date(valor or '')
+    except ValueError:  # formato correcto pero fecha imposible (ej. 2024-02-31)
+        return None
+
+def _filtros_listado(request, estados_validos):
+    """Lee ?estado=, ?desde= y ?hasta= ignorando los valores incorrectos."""
+    estado = request.GET.get('estado', '')
+    return {
+        'estado': estado if estado in estados_validos else '',
+        'desde': _fecha_o_none(request.GET.get('desde')),
+        'hasta': _fecha_o_none(request.GET.get('hasta')),
+    }
+
+def _pagina_keyset(request, queryset, ordering, por_pagina=20):
+    paginator = KeysetPaginator(queryset, por_pagina, ordering=ordering)
+    try:
+        return paginator.page(despues=request.GET.get('despues'), antes=request.GET.get('antes'))
+    except CursorInvalido:
+        raise Http404("Cursor de paginación inválido.")
+
+def _querystring_filtros(filtros):
+    # Para que los enlaces de paginación conserven los filtros aplicados
+    return urlencode({k: v for k, v in filtros.items() if v})
+
+# ?orden= del listado de préstamos -> orden del keyset (siempre terminando en id)
+ORDENES_PRESTAMOS = {
+    'recientes': ('-fecha_prestamo', '-id'),
+    'retraso': ('-retraso', '-id'),
+    'multa': ('-multa_acumulada', '-id'),
+}
+
 @login_required
 def lista_prestamos(request):
     # Variable 'es_gestion' para usar en el HTML y mostrar botones
-    es_gestion = request.user.is_superuser or request.user.groups.filter(name__in=['Administrador', 'Bibliotecario']).exists()
+    es_gestion = es_gestion_prestamos(request.user)
     
-    if es_gestion:
-        prestamos = Prestamos.objects.all().order_by('-fecha_prestamo')
-    else:
-        prestamos = Prestamos.objects.filter(usuario=request.user).order_by('-fecha_prestamo')
+    # Retraso y multa se calculan en SQL para poder filtrar y ordenar por ellos
+    prestamos = Prestamos.objects.select_related('libro__autor', 'usuario').with_multa()
+    if not es_gestion:
+        prestamos = prestamos.filter(usuario=request.user)
+
+    filtros = _filtros_listado(request, dict(Prestamos.ESTADOS))
+    filtros['atrasados'] = '1' if request.GET.get('atrasados') else ''
+    filtros['orden'] = request.GET.get('orden') if request.GET.get('orden') in ORDENES_PRESTAMOS else ''
+    if filtros['estado']:
+        prestamos = prestamos.filter(estado=filtros['estado'])
+    if filtros['desde']:
+        prestamos = prestamos.filter(fecha_prestamo__gte=filtros['desde'])
+    if filtros['hasta']:
+        prestamos = prestamos.filter(fecha_prestamo__lte=filtros['hasta'])
+    if filtros['atrasados']:
+        prestamos = prestamos.atrasados()
+
+    page_obj = _pagina_keyset(request, prestamos, ORDENES_PRESTAMOS[filtros['orden'] or 'recientes'])
         
-    return render(request, 'Gestion/templates/prestamos.html', {'prestamos': prestamos, 'es_gestion': es_gestion})
+    return render(request, 'Gestion/templates/prestamos.html', {
+        'prestamos': page_obj.object_list,
+        'page_obj': page_obj,
+        'es_gestion': es_gestion,
+        'filtros': filtros,
+        'filtros_qs': _querystring_filtros(filtros),
+        'estados': Prestamos.ESTADOS,
+    })
+
+def _dias_solicitados(request):
+    try:
+        return min(max(int(request.GET.get('dias', 30)), 1), 365)
+    except ValueError:
+        return 30
+
+@login_required
+@user_passes_test(es_gestion_prestamos)
+def panel_estadisticas(request):
+    # Lee solo de las tablas de resumen: el coste no crece con el historial
+    datos = estadisticas.resumen(dias=_dias_solicitados(request))
+    maximo = max([d['prestamos'] for d in datos['por_dia']] + [1])
+    return render(request, 'Gestion/templates/estadisticas.html', {**datos, 'maximo': maximo})
+
+@login_required
+@user_passes_test(es_gestion_prestamos)
+def estadisticas_json(request):
+    return JsonResponse(estadisticas.resumen(dias=_dias_solicitados(request)))
+
+@login_required
+def exportar(request, tipo):
+    """
+    Descarga en streaming de prestamos, multas o libros (ver exportacion.py):
+    ?formato=csv|jsonl, ?gzip=1 y los mismos ?estado=, ?desde= y ?hasta= que
+    los listados. Se envía a medida que se lee de la base de datos, así que
+    sirve igual para mil filas que para millones.
+    """
+    definicion = exportacion.EXPORTACIONES.get(tipo)
+    if definicion is None:
+        raise Http404("Exportación desconocida.")
+    if not tiene_rol(request.user, *definicion.roles):
+        return HttpResponseForbidden("No tienes permiso para esta exportación.")
+
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        formato = 'csv'
+    comprimir = request.GET.get('gzip') in ('1', 'true', 'si')
+    filtros = _filtros_listado(request, definicion.estados)
+
+    trozos = exportacion.generar(tipo, formato, comprimir, **filtros)
+    if isinstance(request, ASGIRequest):
+        trozos = exportacion.en_asincrono(trozos)
+    respuesta = StreamingHttpResponse(
+        trozos,
+        content_type='application/gzip' if comprimir else exportacion.FORMATOS[formato],
+    )
+    nombre = exportacion.nombre_archivo(tipo, formato, comprimir, **filtros)
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
 
 @login_required
 def crear_prestamo(request):
     # Definimos quién es el usuario
-    es_bibliotecario = request.user.is_superuser or request.user.groups.filter(name__in=['Administrador', 'Bibliotecario']).exists()
-    es_cliente = request.user.groups.filter(name='Cliente').exists()
+    es_bibliotecario = es_gestion_prestamos(request.user)
+    es_cliente = CLIENTE in roles_de(request.user)
     
     if not (es_bibliotecario or es_cliente):
         return HttpResponseForbidden("No tienes permiso para solicitar préstamos.")
@@ -237,28 +344,31 @@ def crear_prestamo(request):
             estado_inicial = 's'  # Solicitado (No resta stock todavía)
             fecha_p = timezone.now().date()
 
+        # Socios con demasiadas multas sin pagar no pueden llevarse más libros (una sola fila)
+        if not saldos.puede_pedir_prestamo(usuario_obj.pk):
+            messages.error(request, f"{usuario_obj.username} tiene ${saldos.saldo(usuario_obj.pk)} en multas pendientes. "
+                                    "Debe pagarlas antes de un nuevo préstamo.")
+            return redirect('lista_multas')
+
         try:
-            # 3. Crear el objeto préstamo
-            prestamo = Prestamos.objects.create(
-                libro=libro_obj,
-                usuario=usuario_obj,
-                fecha_prestamo=fecha_p,
-                estado=estado_inicial
-            )
+            with transaction.atomic():
+                # 3. Lógica de Stock: Solo si el bibliotecario lo crea (Estado 'p').
+                # El UPDATE condicional es quien decide si queda ejemplar, no la lectura de arriba.
+                if estado_inicial == 'p' and not stock.prestar(libro_obj.pk):
+                    messages.error(request, f"Lo sentimos, el libro '{libro_obj.titulo}' no tiene stock disponible.")
+                    return redirect('libro_list')
+
+                # 4. Crear el objeto préstamo (con 14 días de plazo si ya sale prestado)
+                fecha_p_date = date.fromisoformat(str(fecha_p)) if isinstance(fecha_p, str) else fecha_p
+                Prestamos.objects.create(
+                    libro=libro_obj,
+                    usuario=usuario_obj,
+                    fecha_prestamo=fecha_p_date,
+                    fecha_max=fecha_p_date + timedelta(days=14) if estado_inicial == 'p' else None,
+                    estado=estado_inicial
+                )
             
-            # 4. Lógica de Stock: Solo si el bibliotecario lo crea (Estado 'p')
             if estado_inicial == 'p':
-                # Restamos el ejemplar
-                libro_obj.ejemplares_disponibles -= 1
-                if libro_obj.ejemplares_disponibles == 0:
-                    libro_obj.disponible = False
-                libro_obj.save()
-                
-                # Calcular fecha de vencimiento (14 días después)
-                fecha_p_date = date.fromisoformat(str(fecha_p)) if isinstance(fecha_p, str) else fecha_p
-                prestamo.fecha_max = fecha_p_date + timedelta(days=14)
-                prestamo.save()
-                
                 messages.success(request, f"Préstamo registrado y stock actualizado. Entrega a: {usuario_obj.username}.")
             else:
                 # Si es cliente, solo confirmamos la solicitud sin tocar el stock
@@ -281,43 +391,39 @@ def crear_prestamo(request):
     }
     return render(request, 'templates_crear/crear_prestamo.html', context)
 
-from django.db import transaction # Importante para la seguridad de los datos
-
 @login_required
 @user_passes_test(es_gestion_prestamos)
 def aprobar_prestamo(request, prestamo_id):
     # Buscamos el préstamo asegurándonos que esté en estado 's' (solicitado)
-    prestamo = get_object_or_404(Prestamos, id=prestamo_id, estado='s')
+    prestamo = get_object_or_404(Prestamos.objects.select_related('libro', 'usuario'), id=prestamo_id, estado='s')
 
     if request.method == 'POST':
         accion = request.POST.get('accion')
         
         if accion == 'aprobar':
-            # Usamos atomic para que si falla el save del prestamo, no se reste el libro (o viceversa)
+            # Usamos atomic para que si no queda stock, el préstamo vuelva a 'Solicitado'
             with transaction.atomic():
-                libro = prestamo.libro
-                if libro.ejemplares_disponibles > 0:
-                    # 1. Actualizar el Préstamo
-                    prestamo.estado = 'p'
-                    prestamo.fecha_aprobacion = timezone.now().date()
+                # Solo una aprobación gana aunque dos bibliotecarios pulsen a la vez
+                aprobado = Prestamos.objects.filter(pk=prestamo.pk, estado='s').update(
+                    estado='p',
                     # Sincronizamos con tu otra función: 14 días de plazo
-                    prestamo.fecha_max = timezone.now().date() + timedelta(days=14)
-                    prestamo.save()
-
-                    # 2. Actualizar el Libro (Stock)
-                    libro.ejemplares_disponibles -= 1
-                    if libro.ejemplares_disponibles == 0:
-                        libro.disponible = False
-                    libro.save()
-
-                    messages.success(request, f"Préstamo aprobado para {prestamo.usuario.username}. Stock restante: {libro.ejemplares_disponibles}")
+                    fecha_max=timezone.now().date() + timedelta(days=14),
+                )
+                if not aprobado:
+                    messages.info(request, "Esta solicitud ya fue gestionada por otra persona.")
+                elif stock.prestar(prestamo.libro_id):
+                    # update() no dispara señales: actualizamos el resumen a mano
+                    estadisticas.recalcular_libro(prestamo.libro_id, prestamo.fecha_prestamo)
+                    messages.success(request, f"Préstamo aprobado para {prestamo.usuario.username}.")
                 else:
-                    messages.error(request, f"No se puede aprobar: El libro '{libro.titulo}' se acaba de agotar.")
+                    transaction.set_rollback(True)
+                    messages.error(request, f"No se puede aprobar: El libro '{prestamo.libro.titulo}' se acaba de agotar.")
         
         elif accion == 'rechazar':
-            prestamo.estado = 'r'
-            prestamo.save()
-            messages.info(request, "La solicitud ha sido rechazada.")
+            if Prestamos.objects.filter(pk=prestamo.pk, estado='s').update(estado='r'):
+                messages.info(request, "La solicitud ha sido rechazada.")
+            else:
+                messages.info(request, "Esta solicitud ya fue gestionada por otra persona.")
         
         return redirect('lista_prestamos')
 
@@ -329,57 +435,68 @@ def devolver_libro(request, prestamo_id):
     # Solo podemos devolver algo que esté marcado como 'Prestado'
     prestamo = get_object_or_404(Prestamos, id=prestamo_id, estado='p')
     
+    hoy = timezone.now().date()
+    prestamo.fecha_devolucion = hoy
+    # Usamos prestamo.dias_retraso (ya con la fecha de devolución puesta)
+    nuevo_estado = 'm' if prestamo.dias_retraso > 0 else 'd'
+    
     with transaction.atomic():
-        # 1. Registrar fecha de devolución real
-        prestamo.fecha_devolucion = timezone.now().date()
+        # 1. Registrar la devolución solo si sigue prestado (evita devolver dos veces el mismo ejemplar)
+        if not Prestamos.objects.filter(pk=prestamo.pk, estado='p').update(estado=nuevo_estado, fecha_devolucion=hoy):
+            messages.info(request, "Este préstamo ya fue devuelto.")
+            return redirect('lista_prestamos')
         
         # 2. Devolver stock al libro
-        libro = prestamo.libro
-        libro.ejemplares_disponibles += 1
-        libro.disponible = True  # Al sumar uno, siempre estará disponible
-        libro.save()
+        stock.devolver(prestamo.libro_id)
+        estadisticas.recalcular_libro(prestamo.libro_id, hoy)
         
         # 3. Lógica de Multas
-        # Usamos prestamo.dias_retraso (asegúrate de que este método exista en tu modelo)
-        if prestamo.dias_retraso > 0:
-            # Estado 'm' (Devuelto con multa pendiente)
-            prestamo.estado = 'm'
-            
+        if nuevo_estado == 'm':
             # Crear la multa en la base de datos
-            multa_obj, created = Multa.objects.get_or_create(
+            Multa.objects.get_or_create(
                 prestamo=prestamo,
                 tipo_multa='retraso',
                 defaults={
-                    'monto': prestamo.multa_total, # Asegúrate que multa_total sea un property o campo
-                    'fecha': timezone.now().date()
+                    'monto': prestamo.multa_total,
+                    'fecha': hoy
                 }
             )
             messages.warning(request, f"Devolución registrada con {prestamo.dias_retraso} días de retraso. Se ha generado una multa.")
         else:
-            # Estado 'd' (Devuelto a tiempo)
-            prestamo.estado = 'd'
-            messages.success(request, f"Libro '{libro.titulo}' devuelto correctamente y a tiempo.")
-            
-        prestamo.save()
+            messages.success(request, f"Libro '{prestamo.libro.titulo}' devuelto correctamente y a tiempo.")
         
     return redirect('lista_prestamos')
 
 @login_required
 def lista_multa(request):
-    es_staff = request.user.is_superuser or request.user.groups.filter(name__in=['Administrador', 'Bibliotecario']).exists()
+    es_staff = es_gestion_prestamos(request.user)
     
+    multas_registradas = Multa.objects.select_related('prestamo__libro', 'prestamo__usuario')
     if es_staff:
-        multas_registradas = Multa.objects.all()
         # Buscamos préstamos que estén en estado multa pero sin registro en tabla Multa
         prestamos_vencidos = Prestamos.objects.filter(estado='m', multas__isnull=True)
     else:
-        multas_registradas = Multa.objects.filter(prestamo__usuario=request.user)
+        multas_registradas = multas_registradas.filter(prestamo__usuario=request.user)
         prestamos_vencidos = []
+
+    filtros = _filtros_listado(request, {'pendiente': True, 'pagada': True})
+    if filtros['estado']:
+        multas_registradas = multas_registradas.filter(pagada=filtros['estado'] == 'pagada')
+    if filtros['desde']:
+        multas_registradas = multas_registradas.filter(fecha__gte=filtros['desde'])
+    if filtros['hasta']:
+        multas_registradas = multas_registradas.filter(fecha__lte=filtros['hasta'])
+
+    page_obj = _pagina_keyset(request, multas_registradas, ('-fecha', '-id'))
         
     return render(request, 'Gestion/templates/multas.html', {
-        'multas': multas_registradas,
+        'saldo': None if es_staff else saldos.saldo(request.user.pk),
+        'multas': page_obj.object_list,
+        'page_obj': page_obj,
         'pendientes': prestamos_vencidos,
-        'es_staff': es_staff
+        'es_staff': es_staff,
+        'filtros': filtros,
+        'filtros_qs': _querystring_filtros(filtros),
     })
 
 @login_required
@@ -394,28 +511,28 @@ def crear_multa(request, prestamo_id):
             montos_fijos = {'deterioro': 5.00, 'perdida': 9.00}
             monto_sancion = montos_fijos.get(tipo, 2.00)
             
-        multa, creada = Multa.objects.get_or_create(
-            prestamo=prestamo,
-            tipo_multa=tipo,
-            defaults={'monto': monto_sancion, 'fecha': timezone.now()}
-        )
-        
-        # Ajustar stock si es pérdida
-        if tipo == 'perdida':
-             if prestamo.libro.cantidad_total > 0:
-                 prestamo.libro.cantidad_total -= 1
-             prestamo.libro.save()
-             prestamo.estado = 'm'
-        
-        # Ajustar devolución si es deterioro/retraso y no se ha devuelto
-        elif tipo in ['deterioro', 'retraso'] and not prestamo.fecha_devolucion:
-             prestamo.libro.ejemplares_disponibles += 1
-             prestamo.libro.disponible = True
-             prestamo.libro.save()
-             prestamo.fecha_devolucion = timezone.now().date()
-             prestamo.estado = 'm'
-
-        prestamo.save()
+        with transaction.atomic():
+            multa, creada = Multa.objects.get_or_create(
+                prestamo=prestamo,
+                tipo_multa=tipo,
+                defaults={'monto': monto_sancion, 'fecha': timezone.now()}
+            )
+            
+            # Ajustar stock si es pérdida
+            if tipo == 'perdida':
+                if creada:
+                    stock.dar_de_baja(prestamo.libro_id)
+                Prestamos.objects.filter(pk=prestamo.pk).update(estado='m')
+            
+            # Ajustar devolución si es deterioro/retraso y no se ha devuelto
+            elif tipo in ['deterioro', 'retraso']:
+                hoy = timezone.now().date()
+                if Prestamos.objects.filter(pk=prestamo.pk, fecha_devolucion__isnull=True).update(fecha_devolucion=hoy, estado='m'):
+                    stock.devolver(prestamo.libro_id)
+                    estadisticas.recalcular_libro(prestamo.libro_id, hoy)
+                else:
+                    Prestamos.objects.filter(pk=prestamo.pk).update(estado='m')
+
         messages.success(request, f"Multa registrada: ${monto_sancion}")
         return redirect('lista_multas')
         
@@ -423,14 +540,16 @@ def crear_multa(request, prestamo_id):
 
 @user_passes_test(es_gestion_prestamos)
 def pagar_multa(request, multa_id):
-    multa = get_object_or_404(Multa, id=multa_id)
-    multa.pagada = True
-    multa.save()
-    
+    multa = get_object_or_404(Multa.objects.select_related('prestamo__usuario'), id=multa_id)
     prestamo = multa.prestamo
-    if not Multa.objects.filter(prestamo=prestamo, pagada=False).exists():
-        prestamo.estado = 'd' # Devuelto y pagado
-        prestamo.save()
+    
+    with transaction.atomic():
+        # Solo el primer clic cobra: un segundo no vuelve a apuntar el pago
+        if Multa.objects.filter(pk=multa.pk, pagada=False).update(pagada=True):
+            saldos.aplicar([(prestamo.usuario_id, multa.pk, 'pago', -multa.monto)])
+            estadisticas.recalcular_multas(multa.fecha)
+            if not prestamo.multas.filter(pagada=False).exists():
+                Prestamos.objects.filter(pk=prestamo.pk).update(estado='d') # Devuelto y pagado
         
     messages.success(request, f"Multa de {prestamo.usuario.username} pagada.")
     return redirect('lista_multas')
@@ -472,8 +591,7 @@ def crear_empleado(request):
 class StaffBodegaMixin(UserPassesTestMixin):
     """Permite acceso a Superusuario, Admin y Bodega para EDITAR LIBROS"""
     def test_func(self):
-        u = self.request.user
-        return u.is_superuser or u.groups.filter(name__in=['Administrador', 'Bodega']).exists()
+        return es_admin_o_bodega(self.request.user)
 
     def handle_no_permission(self):
         messages.error(self.request, "Acceso restringido a Bodega.")
@@ -482,18 +600,77 @@ class StaffBodegaMixin(UserPassesTestMixin):
 class PrestamoAdminMixin(UserPassesTestMixin):
     """Solo Admin puede eliminar historiales de prestamos"""
     def test_func(self):
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='Administrador').exists()
+        return es_admin(self.request.user)
 
 class LibroDetalleView(LoginRequiredMixin, DetailView):
     model = Libro
     template_name = 'Gestion/templates/detalle_libro.html'
+    template_fragmento = 'Gestion/templates/fragmentos/detalle_libro.html'
     context_object_name = 'libro'
 
+    def get(self, request, *args, **kwargs):
+        pk = kwargs['pk']
+
+        def generar():
+            self.object = self.get_object()
+            return render_to_string(self.template_fragmento, self.get_context_data(object=self.object), request)
+
+        # Si está en caché no se consulta la BD; un libro inexistente lanza 404 y no se cachea
+        detalle = cache_paginas.fragmento(request, 'libro', (f'libro:{pk}', 'autores'), (pk,), generar)
+        return self.render_to_response({'detalle': detalle})
+
 class LibroListView(LoginRequiredMixin, ListView):
     model = Libro
     template_name = 'Gestion/templates/libro_view.html'
     context_object_name = 'libros'
     paginate_by = 5
+    ordering = ('titulo', 'id')  # Respaldado por el índice libro_titulo_id_idx
+    template_fragmento = 'Gestion/templates/fragmentos/tabla_libros.html'
+
+    def get(self, request, *args, **kwargs):
+        q = request.GET.get('q', '').strip()
+        pagina = [request.GET.get(p, '') for p in ('despues', 'antes', 'page')]
+        self.object_list = self.get_queryset()  # perezoso: sin consulta si hay caché
+
+        def generar():
+            return render_to_string(self.template_fragmento, self.get_context_data(), request)
+
+        # Tabla y paginación se cachean por rol, búsqueda y página (ver cache_paginas)
+        tabla = cache_paginas.fragmento(request, 'libros', ('libros', 'autores'), (q, *pagina), generar)
+        return self.render_to_response({'tabla': tabla, 'q': q})
+
+    def get_queryset(self):
+        # El autor viene en el mismo JOIN y la descripción no se usa en el listado
+        return Libro.objects.select_related('autor').defer('descripcion')
+
+    def paginate_queryset(self, queryset, page_size):
+        q = self.request.GET.get('q', '').strip()
+        if q:
+            return self.paginar_busqueda(queryset, page_size, q)
+
+        # Paginación keyset: ?despues=<cursor> / ?antes=<cursor> en lugar de ?page=N
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.ordering)
+        try:
+            page = paginator.page(
+                despues=self.request.GET.get('despues'),
+                antes=self.request.GET.get('antes'),
+            )
+        except CursorInvalido:
+            raise Http404("Cursor de paginación inválido.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def paginar_busqueda(self, queryset, page_size, q):
+        # Los resultados vienen ordenados por relevancia desde el índice FTS;
+        # paginamos la lista de IDs y solo cargamos los libros de esta página.
+        paginator = Paginator(busqueda.ids_libros(q), page_size)
+        page = paginator.get_page(self.request.GET.get('page'))
+        page.object_list = busqueda.en_orden(queryset, list(page.object_list))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.request.GET.get('q', '').strip()
+        return context
 
 class LibroUpdateView(LoginRequiredMixin, StaffBodegaMixin, UpdateView):
     model = Libro
@@ -501,6 +678,15 @@ class LibroUpdateView(LoginRequiredMixin, StaffBodegaMixin, UpdateView):
     template_name = 'Gestion/templates/editar_libro.html'
     success_url = reverse_lazy('libro_list')
 
+    def form_valid(self, form):
+        # Guardamos solo los campos del formulario: el stock que leímos al abrir
+        # la edición puede haber cambiado por préstamos hechos mientras tanto.
+        # `actualizado` va también, o la API seguiría dando el ETag de antes.
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=[*form.Meta.fields, 'actualizado'])
+        stock.recortar(self.object.pk)
+        return redirect(self.get_success_url())
+
 class LibroDeleteView(LoginRequiredMixin, StaffBodegaMixin, DeleteView):
     model = Libro
     template_name = 'Gestion/templates/eliminar_libro.html'
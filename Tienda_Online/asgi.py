@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Las búsquedas en Open Library (Gestion/async_views.py) son vistas asíncronas:
+servidas desde aquí, p. ej. con ``uvicorn Tienda_Online.asgi:application``,
+esperan a Open Library sin ocupar un hilo del servidor.
 """
 
 import os
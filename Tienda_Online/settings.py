@@ -53,10 +53,13 @@ REST_FRAMEWORK = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Primero de los nuestros: así cuenta también las consultas de sesión y usuario
+    'Gestion.instrumentacion.InstrumentacionSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Gestion.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'Gestion.context_processors.roles',
             ],
         },
     },
@@ -84,10 +88,39 @@ WSGI_APPLICATION = 'Tienda_Online.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil de producción para SQLite con varios workers:
+# - WAL: los lectores no bloquean al escritor ni al revés. Queda guardado en el
+#   archivo y deja junto a él los -wal/-shm (por eso db.sqlite3 no se versiona).
+# - synchronous=NORMAL: con WAL no se corrompe la BD; solo se puede perder la última
+#   transacción ante un corte de luz (no ante un fallo del proceso).
+# - busy_timeout: un escritor espera hasta 5 s a que se libere el candado en vez de
+#   fallar en el acto con "database is locked".
+# - cache_size (en KiB si es negativo) y mmap_size: más páginas en memoria por conexión.
+# Se aplican en cada conexión nueva (init_command). Las transacciones empiezan con
+# BEGIN IMMEDIATE: toman el candado de escritura al principio, así una transacción
+# que lee y luego escribe no puede quedar en punto muerto con otra (ese caso SQLite
+# lo resuelve devolviendo "locked" sin esperar al busy_timeout).
+# CONN_MAX_AGE reutiliza la conexión entre peticiones del mismo worker.
+# `python manage.py benchmark_sqlite` compara este perfil con el de por defecto.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {nombre}={valor}' for nombre, valor in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -138,4 +171,75 @@ LOGOUT_REDIRECT_URL = 'login'
 
 import os
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Cliente de Open Library (Gestion/openlibrary.py)
+OPENLIBRARY = {
+    'URL_BASE': 'https://openlibrary.org',
+    'URL_PORTADAS': 'https://covers.openlibrary.org',
+    'TTL': 60 * 60 * 24 * 7,   # segundos que vive una respuesta en caché
+    'MAX_ENTRADAS': 20000,     # tope de respuestas guardadas
+    'TTL_NEGATIVO': 60 * 60 * 24,  # cuánto recordamos que Open Library no conoce un ISBN
+    'MAX_NEGATIVOS': 50000,    # tope de ISBN desconocidos (se olvidan los menos consultados últimamente)
+    # Segundos que se espera a otro proceso que está importando el mismo ISBN (el candado
+    # es una fila de CandadoImportacion, compartida por todos los workers)
+    'PLAZO_IMPORTACION': 30,
+    'TAMANO_POOL': 10,         # conexiones keep-alive por host
+}
+
+# Portadas (Gestion/portadas.py): las renditions se generan en hilos de fondo
+PORTADAS_ASINCRONO = True
+PORTADAS_WORKERS = 2
+
+# Cachés. 'paginas' guarda los fragmentos HTML del catálogo (Gestion/cache_paginas.py).
+# Memoria local sirve con un solo proceso; con varios workers debe ser un backend
+# compartido para que la invalidación llegue a todos, por ejemplo:
+#   'paginas': {
+#       'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#       'LOCATION': os.path.join(BASE_DIR, 'cache', 'paginas'),
+#   }
+# (o django.core.cache.backends.redis.RedisCache con 'LOCATION': 'redis://...').
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'paginas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'paginas',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+# Segundos que vive un fragmento cacheado (las versiones lo invalidan antes si cambia algo)
+PAGINAS_CACHE_TIMEOUT = 60 * 15
+
+# Segundos que se guardan los grupos de un usuario en la caché entre peticiones.
+# None = solo se memorizan durante la petición. Con varios procesos conviene
+# activarlo únicamente si CACHES apunta a un backend compartido.
+ROLES_CACHE_TIMEOUT = None
+
+# Deuda máxima en multas sin pagar con la que un socio todavía puede llevarse
+# un libro. None desactiva el bloqueo en crear_prestamo.
+LIMITE_DEUDA_PRESTAMOS = '10.00'
+
+# Instrumentación SQL por petición (Gestion/instrumentacion.py). La cabecera
+# Server-Timing muestra cuánto tarda la base de datos: solo en desarrollo.
+SQL_SERVER_TIMING = DEBUG
+# Repeticiones de una misma lectura en una petición a partir de las que se avisa de un N+1
+SQL_UMBRAL_N_MAS_1 = 5
+
+# El resumen SQL de cada petición va al logger 'Gestion.sql' (datos en record.sql)
+# con nivel INFO; los avisos de N+1, con WARNING. Baja el nivel a 'INFO' para ver
+# el resumen de todas las peticiones.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'Gestion.sql': {
+            'handlers': ['consola'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}